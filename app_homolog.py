@@ -3,15 +3,33 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from streamlit_gsheets import GSheetsConnection
+from gspread.utils import rowcol_to_a1
+from gspread.exceptions import WorksheetNotFound
+from google.auth.exceptions import TransportError as GoogleAuthTransportError
+import requests
 from datetime import datetime, timedelta, date
 import calendar
 import html as html_lib
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, astuple, replace
 from io import BytesIO
 import time
 import logging
 import uuid
+import queue
+import threading
+import atexit
+import json
+import random
+import functools
+import hashlib
+import weakref
+import sqlite3
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 
 # ==============================================================================
@@ -44,14 +62,46 @@ class Config:
     COLS_METAS: tuple = ("Id", "Nome", "ValorAlvo", "ValorAtual", "Prazo", "Responsavel", "Ativo")
     COLS_PASSIVOS: tuple = ("Item", "Valor", "Responsavel")
     COLS_LIXEIRA: tuple = ("Id", "Data", "Descricao", "Valor", "Categoria", "Tipo", "Responsavel", "Origem", "Tag", "DeletadoEm")
+    COLS_REVISAO: tuple = ("Planilha", "Revisao", "AtualizadoEm")
+    COLS_DERIVADAS: tuple = (
+        "cents", "period", "year", "month", "day", "weekday",
+        "is_income", "is_expense", "is_investment", "group",
+    )
+    GRUPOS_503020: tuple = ("necessidades", "desejos", "investido")
+    REVISION_SHEET: str = "_Revisoes"
+    ABAS_KEY: str = "_Abas"  # chave de cache da lista de abas (não é uma aba)
     META_NECESSIDADES: int = 50
     META_DESEJOS: int = 30
     META_INVESTIMENTO: int = 20
     AUTONOMIA_OK: int = 12
     AUTONOMIA_WARN: int = 6
     CACHE_TTL: int = 120
+    CACHE_MAX_STALE: int = 1800  # segundos servindo dado antigo enquanto recarrega
+    SNAPSHOT_DIR: str = ".snapshots"
+    SNAPSHOT_MAX_AGE: int = 86400  # snapshot em disco mais velho que isso é ignorado
+    PENDING_DIR: str = ".pending"
+    WAL_BACKOFF_BASE: float = 2.0
+    WAL_BACKOFF_MAX: float = 300.0
+    WAL_MAX_FAILURES: int = 8  # falhas não transitórias até a entrada ir para PENDING_DIR/dead
+    WAL_DRAIN_WAIT: float = 5.0  # espera máxima do script pelo replay antes de reescrever
     MAX_DESC_LENGTH: int = 200
     SAVE_RETRIES: int = 3
+    AUDIT_MAX_ROWS: int = 500
+    AUDIT_QUEUE_SIZE: int = 1000
+    AUDIT_BATCH_SIZE: int = 50
+    AUDIT_FLUSH_INTERVAL: float = 2.0
+    BOOT_WORKERS: int = 8
+    # Cota da Sheets API é 60 leituras e 60 escritas/min por usuário;
+    # burst + reposição por minuto ficam abaixo disso em qualquer janela.
+    QUOTA_READS_PER_MIN: int = 45
+    QUOTA_WRITES_PER_MIN: int = 45
+    QUOTA_BURST: int = 15
+    QUOTA_RESERVE: int = 5  # fichas que só chamadas interativas podem usar
+    QUOTA_MAX_WAIT: float = 20.0
+    BREAKER_FAILURES: int = 3  # falhas seguidas que abrem o circuito
+    BREAKER_COOLDOWN: float = 15.0  # intervalo inicial entre sondagens
+    BREAKER_COOLDOWN_MAX: float = 120.0
+    BREAKER_WINDOW: int = 200  # latências guardadas para os percentis
     MESES_EVOLUCAO: int = 6  # Usado em evolução, savings rate, consistência
     TIPO_ENTRADA: str = "Entrada"
     TIPO_SAIDA: str = "Saída"
@@ -188,6 +238,41 @@ class MonthMetrics:
     health: str = "neutral"
     budget_data: list = field(default_factory=list)
     user_config: UserConfig = field(default_factory=UserConfig)
+    memo_key: tuple | None = None  # chave no memo de métricas (score/alertas derivam dela)
+
+
+@dataclass
+class BatchResult:
+    """Relatório de uma gravação em lote (uma linha por entrada)."""
+    written: bool = False
+    report: list = field(default_factory=list)  # {"linha", "ok", "erro", "entry"}
+
+    @property
+    def n_ok(self) -> int:
+        return sum(1 for r in self.report if r["ok"])
+
+    @property
+    def n_fail(self) -> int:
+        return sum(1 for r in self.report if not r["ok"])
+
+    @property
+    def saved_entries(self) -> list[dict]:
+        return [r["entry"] for r in self.report if r["ok"]]
+
+
+@dataclass
+class DataBundle:
+    """Todas as worksheets carregadas no boot + latência de cada leitura (ms)."""
+    transacoes: pd.DataFrame
+    patrimonio: pd.DataFrame
+    recorrentes: pd.DataFrame
+    orcamentos: pd.DataFrame
+    config: pd.DataFrame
+    metas: pd.DataFrame
+    passivos: pd.DataFrame
+    lixeira: pd.DataFrame
+    latencias: dict = field(default_factory=dict)
+    wall_ms: float = 0.0
 
 
 logging.basicConfig(
@@ -253,6 +338,16 @@ def generate_id() -> str:
     return uuid.uuid4().hex[:12]
 
 
+def to_cents(valor: pd.Series) -> pd.Series:
+    """Converte valores em reais para centavos int64 (aritmética exata)."""
+    return (pd.to_numeric(valor, errors="coerce").fillna(0.0) * 100).round().astype("int64")
+
+
+def cents_to_brl(cents) -> float:
+    """Centavos (int) → reais; usado só na saída das agregações."""
+    return int(cents) / 100
+
+
 def fmt_brl(val: float) -> str:
     """Formata valor float para padrão BRL: R$ 1.234,56 / -R$ 1.234,56"""
     if val < 0:
@@ -455,7 +550,7 @@ def check_duplicate(df_month: pd.DataFrame, desc: str, valor: float, data_ref) -
             return False
         mask = (
             (df_month["Descricao"].str.strip().str.lower() == desc.strip().lower()) &
-            (df_month["Valor"].round(2) == round(float(valor), 2)) &
+            (to_cents(df_month["Valor"]) == round(float(valor) * 100)) &
             (df_month["Data"].dt.date == data_check)
         )
         return bool(mask.any())
@@ -463,6 +558,70 @@ def check_duplicate(df_month: pd.DataFrame, desc: str, valor: float, data_ref) -
         return False
 
 
+def validate_transactions_df(df: pd.DataFrame) -> pd.Series:
+    """Versão vetorizada de validate_transaction para um DataFrame inteiro.
+
+    Retorna Series alinhada ao índice com a mensagem de erro de cada
+    linha ("" quando válida). Aplica as mesmas regras, na mesma ordem.
+    """
+    errors = pd.Series("", index=df.index, dtype=object)
+    if df.empty:
+        return errors
+
+    def _col(name: str) -> pd.Series:
+        if name in df.columns:
+            return df[name]
+        return pd.Series(None, index=df.index, dtype=object)
+
+    def _flag(fail: pd.Series, msg) -> None:
+        nonlocal errors
+        errors = errors.mask((errors == "") & fail.fillna(True).astype(bool), msg)
+
+    desc = _col("Descricao").fillna("").astype(str)
+    valor = pd.to_numeric(_col("Valor"), errors="coerce")
+    tipo = _col("Tipo").fillna("").astype(str)
+    cat = _col("Categoria").fillna("").astype(str)
+    data = pd.to_datetime(_col("Data"), errors="coerce")
+
+    cats_saida = set(CFG.CATEGORIAS_SAIDA) | {CFG.CAT_INVESTIMENTO}
+    cat_ok = (
+        ((tipo == CFG.TIPO_SAIDA) & cat.isin(cats_saida)) |
+        ((tipo != CFG.TIPO_SAIDA) & cat.isin(CFG.CATEGORIAS_ENTRADA))
+    )
+
+    _flag(desc.str.strip() == "", "Descrição obrigatória")
+    _flag(desc.str.len() > CFG.MAX_DESC_LENGTH, f"Descrição muito longa (máx {CFG.MAX_DESC_LENGTH})")
+    _flag(~(valor > 0), "Valor deve ser maior que zero")
+    _flag(~tipo.isin(CFG.TIPOS), "Tipo inválido")
+    _flag(~cat_ok, "Categoria '" + cat + "' inválida para tipo '" + tipo + "'")
+    _flag(~_col("Responsavel").isin(CFG.RESPONSAVEIS), "Responsável inválido")
+    _flag(data.isna(), "Data obrigatória")
+    _flag(data > datetime.now() + timedelta(days=30), "Data muito distante no futuro")
+    _flag(data.dt.year < 2020, "Data muito antiga (anterior a 2020)")
+    return errors
+
+
+def _duplicate_keys(df: pd.DataFrame) -> pd.Series:
+    """Chave de duplicata (data + descrição + valor) com nº da ocorrência.
+
+    O contador de ocorrência permite importar legitimamente duas compras
+    iguais no mesmo dia quando o histórico só tem uma.
+    """
+    base = (
+        pd.to_datetime(df["Data"], errors="coerce").dt.strftime("%Y-%m-%d")
+        + "|" + df["Descricao"].astype(str).str.strip().str.lower()
+        + "|" + to_cents(df["Valor"]).astype(str)
+    )
+    return base + "#" + base.groupby(base).cumcount().astype(str)
+
+
+def find_duplicates(df_new: pd.DataFrame, df_hist: pd.DataFrame) -> pd.Series:
+    """Marca linhas de df_new que já existem no histórico (vetorizado)."""
+    if df_new.empty or df_hist.empty:
+        return pd.Series(False, index=df_new.index)
+    return _duplicate_keys(df_new).isin(set(_duplicate_keys(df_hist)))
+
+
 # ==============================================================================
 # 6. CAMADA DE DADOS
 # ==============================================================================
@@ -472,6 +631,1109 @@ def get_conn() -> GSheetsConnection:
     return st.connection("gsheets", type=GSheetsConnection)
 
 
+_quota_local = threading.local()
+
+
+@contextmanager
+def background_quota():
+    """Marca as chamadas do thread atual como de baixa prioridade."""
+    prev = getattr(_quota_local, "background", False)
+    _quota_local.background = True
+    try:
+        yield
+    finally:
+        _quota_local.background = prev
+
+
+class _QuotaGovernor:
+    """Token bucket do processo para a Sheets API (uma cota para todas as sessões).
+
+    Dois baldes, leitura e escrita, com QUOTA_BURST fichas repostas
+    continuamente. Chamadas em background (revalidação, audit log) não
+    consomem as últimas QUOTA_RESERVE fichas nem passam na frente de uma
+    chamada interativa esperando. Quem não consegue ficha em
+    QUOTA_MAX_WAIT segundos recebe TimeoutError (os chamadores já tratam
+    falha de rede com retry/backoff).
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._buckets = {
+            kind: {
+                "rate": per_min / 60.0,
+                "tokens": float(CFG.QUOTA_BURST),
+                "stamp": time.monotonic(),
+                "waiting": 0,  # chamadas interativas na fila
+                "granted": 0,
+                "throttled": 0,
+                "rejected": 0,
+                "wait_ms": 0.0,
+            }
+            for kind, per_min in (("read", CFG.QUOTA_READS_PER_MIN), ("write", CFG.QUOTA_WRITES_PER_MIN))
+        }
+
+    def _refill(self, bucket: dict) -> None:
+        now = time.monotonic()
+        bucket["tokens"] = min(float(CFG.QUOTA_BURST), bucket["tokens"] + (now - bucket["stamp"]) * bucket["rate"])
+        bucket["stamp"] = now
+
+    def acquire(self, kind: str, n: int = 1) -> None:
+        """Consome n fichas do balde kind ("read"/"write"), esperando se preciso."""
+        background = getattr(_quota_local, "background", False)
+        bucket = self._buckets[kind]
+        t0 = time.monotonic()
+        deadline = t0 + (CFG.QUOTA_MAX_WAIT * (3 if background else 1))
+        waited = False
+        with self._cond:
+            if not background:
+                bucket["waiting"] += 1
+            try:
+                while True:
+                    self._refill(bucket)
+                    floor = n + (CFG.QUOTA_RESERVE if background else 0)
+                    if bucket["tokens"] >= floor and not (background and bucket["waiting"]):
+                        bucket["tokens"] -= n
+                        bucket["granted"] += 1
+                        if waited:
+                            bucket["wait_ms"] += (time.monotonic() - t0) * 1000
+                        return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        bucket["rejected"] += 1
+                        raise TimeoutError(f"Cota da API esgotada ({kind})")
+                    if not waited:
+                        waited = True
+                        bucket["throttled"] += 1
+                    need = max(floor - bucket["tokens"], 0.0) / bucket["rate"]
+                    self._cond.wait(timeout=min(remaining, max(need, 0.05)))
+            finally:
+                if not background:
+                    bucket["waiting"] -= 1
+                    self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            out = {}
+            for kind, bucket in self._buckets.items():
+                self._refill(bucket)
+                out[kind] = {
+                    "budget": int(bucket["tokens"]),
+                    "per_min": round(bucket["rate"] * 60),
+                    "granted": bucket["granted"],
+                    "throttled": bucket["throttled"],
+                    "rejected": bucket["rejected"],
+                    "wait_ms": round(bucket["wait_ms"], 1),
+                }
+            return out
+
+
+@st.cache_resource(show_spinner=False)
+def _get_quota() -> _QuotaGovernor:
+    """Governador de cota único por processo (compartilhado entre sessões)."""
+    return _QuotaGovernor()
+
+
+def quota_stats() -> dict:
+    """Fichas disponíveis e contadores de espera por balde (read/write)."""
+    return _get_quota().stats()
+
+
+def _is_outage(error: Exception) -> bool:
+    """Erro de disponibilidade (rede, timeout, 5xx, 429), não de lógica.
+
+    Sem status HTTP, só erros de transporte contam: um bug (KeyError,
+    ValueError...) não pode abrir o circuito nem ser tratado como queda.
+    """
+    if isinstance(error, (WorksheetNotFound, TimeoutError)):
+        return False  # aba inexistente / cota local esgotada: a API respondeu
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status >= 500 or status == 429
+    return isinstance(error, (
+        ConnectionError,
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        GoogleAuthTransportError,
+    ))
+
+
+class _CircuitBreaker:
+    """Circuit breaker da conexão com o Google Sheets (um por processo).
+
+    Fechado, as chamadas passam e a latência entra na janela dos
+    percentis. BREAKER_FAILURES falhas de disponibilidade seguidas abrem o
+    circuito: toda chamada falha na hora, sem esperar timeout, e os
+    loaders servem o último frame bom (memória ou snapshot). Um thread
+    sonda a API com intervalo crescente e fecha o circuito na primeira
+    resposta.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.last_error = ""
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self._latencies: deque = deque(maxlen=CFG.BREAKER_WINDOW)
+        self._probe = None
+        self._prober: threading.Thread | None = None
+
+    def set_probe(self, probe) -> None:
+        """Chamada barata usada para testar a recuperação."""
+        self._probe = probe
+
+    def before(self) -> None:
+        with self._lock:
+            if self.state == "open":
+                self.rejected += 1
+                raise ConnectionError(f"Google Sheets indisponível: {self.last_error}")
+
+    def success(self, ms: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.failures = 0
+            self._latencies.append(ms)
+            if self.state == "open":
+                logger.info(f"Circuit breaker: Sheets respondeu — fechado após {time.time() - self.opened_at:.0f}s")
+                self.state, self.opened_at = "closed", None
+
+    def failure(self, error: Exception) -> None:
+        with self._lock:
+            self.calls += 1
+            self.errors += 1
+            self.failures += 1
+            self.last_error = str(error)[:200]
+            if self.state == "closed" and self.failures >= CFG.BREAKER_FAILURES:
+                self.state, self.opened_at = "open", time.time()
+                logger.warning(f"Circuit breaker aberto após {self.failures} falhas: {self.last_error}")
+                if self._prober is None or not self._prober.is_alive():
+                    self._prober = threading.Thread(target=self._probe_loop, name="breaker-probe", daemon=True)
+                    self._prober.start()
+
+    def _probe_loop(self) -> None:
+        delay = CFG.BREAKER_COOLDOWN
+        while True:
+            time.sleep(delay * random.uniform(0.8, 1.2))
+            with self._lock:
+                if self.state != "open":
+                    return
+            if self._probe is None:
+                continue
+            t0 = time.perf_counter()
+            try:
+                with background_quota():
+                    _get_quota().acquire("read")
+                self._probe()
+            except Exception as e:
+                if _is_outage(e):
+                    with self._lock:
+                        self.last_error = str(e)[:200]
+                    delay = min(delay * 2, CFG.BREAKER_COOLDOWN_MAX)
+                    continue
+            self.success((time.perf_counter() - t0) * 1000)
+            return
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = list(self._latencies)
+            out = {
+                "state": self.state,
+                "failures": self.failures,
+                "last_error": self.last_error,
+                "opened_at": self.opened_at,
+                "calls": self.calls,
+                "errors": self.errors,
+                "rejected": self.rejected,
+            }
+        p50, p95, p99 = (
+            pd.Series(latencies).quantile([0.5, 0.95, 0.99]).round(1).tolist()
+            if latencies else (None, None, None)
+        )
+        out.update(p50_ms=p50, p95_ms=p95, p99_ms=p99)
+        return out
+
+
+@st.cache_resource(show_spinner=False)
+def _get_breaker() -> _CircuitBreaker:
+    """Circuit breaker único por processo."""
+    return _CircuitBreaker()
+
+
+def connection_health() -> dict:
+    """Estado do circuito (closed/open), contadores e latência p50/p95/p99 (ms)."""
+    return _get_breaker().stats()
+
+
+def _api(kind: str, fn, *args, **kwargs):
+    """Executa uma chamada à Sheets API: circuito, cota e latência.
+
+    Com o circuito aberto falha na hora com ConnectionError.
+    """
+    breaker = _get_breaker()
+    breaker.before()
+    _get_quota().acquire(kind)
+    t0 = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as e:
+        if _is_outage(e):
+            breaker.failure(e)
+        else:
+            breaker.success((time.perf_counter() - t0) * 1000)
+        raise
+    breaker.success((time.perf_counter() - t0) * 1000)
+    return result
+
+
+class StorageBackend(ABC):
+    """Interface de armazenamento: uma "worksheet" por tabela/aba.
+
+    Implementações gravam o frame já serializado (_serialize_for_sheet) e
+    devolvem em read() o frame cru, com o cabeçalho original em
+    df.attrs["header"] (usado na validação de integridade).
+
+    Controle otimista de concorrência: cada worksheet de dados tem um
+    contador de revisão (REVISION_SHEET) incrementado a cada escrita.
+    read() anota a revisão lida em df.attrs["rev"] e replace_if() só grava
+    se ninguém escreveu desde então (compare-and-swap). No processo, um
+    lock por worksheet cobre escrita e incremento — e, no replace_if, a
+    checagem também.
+    """
+
+    name = "base"
+    UNVERSIONED = frozenset({"AuditLog", CFG.REVISION_SHEET})
+
+    def __init__(self) -> None:
+        self._locks: dict[str, threading.RLock] = {}
+        self._locks_guard = threading.Lock()
+        # Abas gravadas cuja revisão não conseguiu ser incrementada
+        self._unbumped: set[str] = set()
+
+    def _write_lock(self, worksheet: str) -> threading.RLock:
+        """Lock de escrita da worksheet (um por processo: o backend é único)."""
+        with self._locks_guard:
+            return self._locks.setdefault(worksheet, threading.RLock())
+
+    def read(self, worksheet: str) -> pd.DataFrame:
+        """Lê a worksheet inteira (sem linhas totalmente vazias)."""
+        # Revisão antes dos dados: se alguém gravar no meio, o CAS acusa
+        rev = self.revision(worksheet) if worksheet not in self.UNVERSIONED else None
+        df = self._read(worksheet).dropna(how="all")
+        # Cabeçalho original (antes do backfill de colunas) — usado na validação
+        df.attrs["header"] = list(df.columns)
+        if rev is not None:
+            df.attrs["rev"] = rev
+        return df
+
+    def revision(self, worksheet: str, fresh: bool = False) -> int:
+        """Revisão atual da worksheet (0 se nunca versionada)."""
+        return self._revisions(fresh).get(worksheet, 0)
+
+    def append(self, worksheet: str, df_rows: pd.DataFrame) -> None:
+        """Anexa linhas novas ao final da worksheet."""
+        if df_rows.empty:
+            return
+        with self._write_lock(worksheet):
+            self._append(worksheet, df_rows)
+            self._touch(worksheet)
+
+    def replace(self, worksheet: str, df: pd.DataFrame) -> None:
+        """Substitui o conteúdo inteiro da worksheet."""
+        with self._write_lock(worksheet):
+            self._replace(worksheet, df)
+            self._touch(worksheet)
+
+    def replace_if(self, worksheet: str, df: pd.DataFrame, expected_rev: int) -> bool:
+        """Substitui a worksheet só se a revisão ainda for expected_rev."""
+        with self._write_lock(worksheet):
+            if self._settle(worksheet) or self.revision(worksheet, fresh=True) != expected_rev:
+                return False
+            self.replace(worksheet, df)
+            return True
+
+    def update_by_id(self, worksheet: str, df_rows: pd.DataFrame) -> int:
+        """Atualiza as linhas cujo Id está em df_rows. Retorna quantas mudaram."""
+        if df_rows.empty:
+            return 0
+        with self._write_lock(worksheet):
+            n = self._update_by_id(worksheet, df_rows)
+            if n:
+                self._touch(worksheet)
+        return n
+
+    def delete_by_id(self, worksheet: str, ids) -> int:
+        """Remove as linhas com os Ids informados. Retorna quantas saíram."""
+        targets = set(_norm_ids(list(ids))) - {""}
+        if not targets:
+            return 0
+        with self._write_lock(worksheet):
+            n = self._delete_by_id(worksheet, targets)
+            if n:
+                self._touch(worksheet)
+        return n
+
+    def existing_ids(self, worksheet: str, ids) -> set[str]:
+        """Quais dos Ids informados já existem na worksheet."""
+        targets = set(_norm_ids(list(ids))) - {""}
+        if not targets:
+            return set()
+        return targets & set(_norm_ids(self.read(worksheet)["Id"]))
+
+    @abstractmethod
+    def worksheets(self) -> list[str]:
+        """Nomes das worksheets existentes."""
+
+    def _touch(self, worksheet: str) -> None:
+        """Incrementa a revisão após uma escrita.
+
+        Falha propaga: os dados foram gravados mas a revisão não andou. A
+        aba fica pendente e nenhum CAS nela passa até um incremento dar certo.
+        """
+        if worksheet in self.UNVERSIONED:
+            return
+        try:
+            self._bump(worksheet)
+        except Exception as e:
+            self._unbumped.add(worksheet)
+            logger.error(f"Revisão não incrementada [{worksheet}]: {e}")
+            raise
+        self._unbumped.discard(worksheet)
+
+    def _settle(self, worksheet: str) -> bool:
+        """Aplica o incremento pendente da aba (propaga falha).
+
+        True se havia um: qualquer revisão lida antes dele está obsoleta.
+        """
+        if worksheet not in self._unbumped:
+            return False
+        self._touch(worksheet)
+        return True
+
+    @abstractmethod
+    def headers(self, worksheet: str) -> list[str]:
+        """Retorna só o cabeçalho da worksheet."""
+
+    @abstractmethod
+    def _read(self, worksheet: str) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def _append(self, worksheet: str, df_rows: pd.DataFrame) -> None:
+        ...
+
+    @abstractmethod
+    def _replace(self, worksheet: str, df: pd.DataFrame) -> None:
+        ...
+
+    @abstractmethod
+    def _update_by_id(self, worksheet: str, df_rows: pd.DataFrame) -> int:
+        ...
+
+    @abstractmethod
+    def _delete_by_id(self, worksheet: str, targets: set) -> int:
+        ...
+
+    @abstractmethod
+    def _revisions(self, fresh: bool) -> dict[str, int]:
+        ...
+
+    @abstractmethod
+    def _bump(self, worksheet: str) -> None:
+        ...
+
+
+def _norm_ids(values) -> pd.Series:
+    """Normaliza Ids para comparação (string sem espaços)."""
+    return pd.Series(values, dtype=object).fillna("").astype(str).str.strip()
+
+
+class GSheetsBackend(StorageBackend):
+    """Backend Google Sheets (st-gsheets-connection).
+
+    Com o handle gspread (service account), append, update e delete por Id
+    gravam só as linhas afetadas — a localização usa apenas a coluna Id.
+    Sem ele (planilha pública), tudo vira leitura + reescrita da aba.
+    """
+
+    name = "gsheets"
+
+    def __init__(self, conn: GSheetsConnection) -> None:
+        super().__init__()
+        self.conn = conn
+        self._rev_lock = threading.Lock()
+        self._rev_memo: dict[str, int] | None = None
+        # Sondagem de recuperação: a menor aba (aba ausente também prova que a API responde)
+        _get_breaker().set_probe(lambda: conn.read(worksheet=CFG.REVISION_SHEET, ttl=0))
+
+    def _read(self, worksheet: str) -> pd.DataFrame:
+        # ttl=0: o cache fica a cargo de _cached_loader, não do conector
+        return _api("read", self.conn.read, worksheet=worksheet, ttl=0)
+
+    def headers(self, worksheet: str) -> list[str]:
+        layout = _get_worksheet_layout(self.conn, worksheet)
+        if layout is not None:
+            return list(layout[1])
+        return list(self.read(worksheet).columns)
+
+    def _append(self, worksheet: str, df_rows: pd.DataFrame) -> None:
+        try:
+            if not _append_rows(self.conn, worksheet, df_rows):
+                _rewrite_with_rows(self, worksheet, df_rows)
+        except WorksheetNotFound:
+            # Aba ainda não existe (ex.: primeira transação de um ano novo)
+            _get_worksheet_layout.clear()
+            _api("write", self.conn.create, worksheet=worksheet, data=_serialize_for_sheet(df_rows))
+        except Exception:
+            _get_worksheet_layout.clear()
+            raise
+
+    def _replace(self, worksheet: str, df: pd.DataFrame) -> None:
+        _api("write", self.conn.update, worksheet=worksheet, data=_serialize_for_sheet(df))
+        # Reescrita pode ter mudado colunas — cabeçalho em cache ficou obsoleto
+        _get_worksheet_layout.clear()
+
+    def worksheets(self) -> list[str]:
+        open_spreadsheet = getattr(getattr(self.conn, "client", None), "_open_spreadsheet", None)
+        if open_spreadsheet is None:
+            # Planilha pública não lista abas (e não aceita escrita): resta o índice de revisões
+            return list(self._rev_map(self._revision_frame(strict=True)))
+        spreadsheet = _api("read", open_spreadsheet)
+        return [ws.title for ws in _api("read", spreadsheet.worksheets)]
+
+    def _revision_frame(self, strict: bool) -> pd.DataFrame | None:
+        """Aba de revisões (vazia se ainda não existe).
+
+        Fora do modo strict, falha de leitura devolve None: só serve para
+        anotar revisão em leituras, e revisão 0 (menor que a real) só
+        provoca um conflito a mais. CAS e incremento usam strict.
+        """
+        try:
+            return _api("read", self.conn.read, worksheet=CFG.REVISION_SHEET, ttl=0).dropna(how="all")
+        except WorksheetNotFound:
+            return pd.DataFrame(columns=list(CFG.COLS_REVISAO))
+        except Exception as e:
+            if strict:
+                raise
+            logger.warning(f"Revisões não lidas: {e}")
+            return None
+
+    def _revisions(self, fresh: bool) -> dict[str, int]:
+        """Mapa de revisões; sem fresh, o último lido/gravado neste processo.
+
+        As revisões só crescem e o memo é sempre anterior aos dados lidos
+        depois dele: na pior hipótese anota uma revisão antiga, e o CAS
+        acusa conflito e relê. Assim read() não lê a aba de revisões a cada
+        chamada — só a primeira vez e quando o CAS pede a revisão atual.
+        """
+        with self._rev_lock:
+            if not fresh and self._rev_memo is not None:
+                return self._rev_memo
+            df = self._revision_frame(strict=fresh)
+            if df is None:
+                return {}  # fallback não entra no memo
+            self._rev_memo = self._rev_map(df)
+            return self._rev_memo
+
+    @staticmethod
+    def _rev_map(df: pd.DataFrame) -> dict[str, int]:
+        df = df.reindex(columns=list(CFG.COLS_REVISAO))
+        revs = pd.to_numeric(df["Revisao"], errors="coerce").fillna(0).astype(int)
+        return dict(zip(df["Planilha"].astype(str).str.strip(), revs))
+
+    def _bump(self, worksheet: str) -> None:
+        """Incrementa a revisão: lê a aba de revisões e grava só a linha da aba.
+
+        O Sheets não tem transação: entre processos há uma janela mínima
+        em que dois incrementos simultâneos podem colidir.
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._rev_lock:
+            try:
+                layout = _get_worksheet_layout(self.conn, CFG.REVISION_SHEET)
+            except WorksheetNotFound:
+                layout = None  # primeira revisão: a reescrita cria a aba
+            if layout is not None and {"Planilha", "Revisao"} <= set(layout[1]):
+                self._rev_memo = self._bump_row(*layout, worksheet, now)
+                return
+            self._rev_memo = self._bump_rewrite(worksheet, now)
+
+    def _bump_row(self, ws, header: list[str], worksheet: str, now: str) -> dict[str, int]:
+        """Incremento pelo handle gspread: uma leitura e uma escrita de linha."""
+        rows = _api("read", ws.get_all_values)
+        col = {c: header.index(c) for c in header}
+        revs: dict[str, int] = {}
+        row_n = None
+        for i, row in enumerate(rows[1:], start=2):
+            name = str(row[col["Planilha"]]).strip() if len(row) > col["Planilha"] else ""
+            if not name:
+                continue
+            raw = pd.to_numeric(row[col["Revisao"]] if len(row) > col["Revisao"] else "", errors="coerce")
+            revs[name] = 0 if pd.isna(raw) else int(raw)
+            if name == worksheet:
+                row_n = i
+        rev = revs.get(worksheet, 0) + 1
+        values = {"Planilha": worksheet, "Revisao": rev, "AtualizadoEm": now}
+        if row_n is None:
+            _api(
+                "write", ws.append_rows, [[values.get(c, "") for c in header]],
+                value_input_option="USER_ENTERED", table_range="A1",
+            )
+        else:
+            _api("write", ws.batch_update, [
+                {"range": rowcol_to_a1(row_n, col[c] + 1), "values": [[values[c]]]}
+                for c in ("Revisao", "AtualizadoEm") if c in col
+            ], value_input_option="USER_ENTERED")
+        revs[worksheet] = rev
+        return revs
+
+    def _bump_rewrite(self, worksheet: str, now: str) -> dict[str, int]:
+        """Incremento sem handle gspread: releitura e reescrita da aba."""
+        # strict: regravar a aba a partir de uma leitura falha apagaria as demais revisões
+        df = self._revision_frame(strict=True).reindex(columns=list(CFG.COLS_REVISAO))
+        mask = df["Planilha"].astype(str).str.strip() == worksheet
+        rev = self._rev_map(df).get(worksheet, 0) + 1
+        df = pd.concat([
+            df[~mask],
+            pd.DataFrame([{"Planilha": worksheet, "Revisao": rev, "AtualizadoEm": now}]),
+        ], ignore_index=True)
+        try:
+            _api("write", self.conn.update, worksheet=CFG.REVISION_SHEET, data=df)
+        except WorksheetNotFound:
+            _api("write", self.conn.create, worksheet=CFG.REVISION_SHEET, data=df)
+            _get_worksheet_layout.clear()
+        return self._rev_map(df)
+
+    def _row_index(self, worksheet: str, columns) -> tuple | None:
+        """(handle, cabeçalho, {Id: nº da linha}) lendo só a coluna Id.
+
+        None quando a escrita por linha não é possível (sem handle gspread,
+        sem coluna Id ou colunas fora do cabeçalho).
+        """
+        layout = _get_worksheet_layout(self.conn, worksheet)
+        if layout is None:
+            return None
+        ws, header = layout
+        if "Id" not in header or set(columns) - set(header):
+            return None
+        id_col = _api("read", ws.col_values, header.index("Id") + 1)
+        rows = {str(v).strip(): i + 1 for i, v in enumerate(id_col) if i > 0 and str(v).strip()}
+        return ws, header, rows
+
+    def existing_ids(self, worksheet: str, ids) -> set[str]:
+        try:
+            index = self._row_index(worksheet, ["Id"])
+        except WorksheetNotFound:
+            return set()
+        if index is None:
+            return super().existing_ids(worksheet, ids)
+        return (set(_norm_ids(list(ids))) - {""}) & set(index[2])
+
+    def _update_by_id(self, worksheet: str, df_rows: pd.DataFrame) -> int:
+        index = self._row_index(worksheet, df_rows.columns)
+        if index is None:
+            return self._update_by_id_rewrite(worksheet, df_rows)
+        ws, header, rows = index
+        df_out = _serialize_for_sheet(df_rows).assign(Id=_norm_ids(df_rows["Id"]).values)
+        cols = [c for c in df_out.columns if c != "Id"]
+        data, updated = [], 0
+        for rec in df_out.to_dict("records"):
+            row_n = rows.get(rec["Id"])
+            if row_n is None:
+                continue
+            updated += 1
+            for col in cols:
+                data.append({
+                    "range": rowcol_to_a1(row_n, header.index(col) + 1),
+                    "values": [[_cell_value(rec[col])]],
+                })
+        if data:
+            # Uma chamada batchUpdate só com as células das linhas afetadas
+            _api("write", ws.batch_update, data, value_input_option="USER_ENTERED")
+        return updated
+
+    def _delete_by_id(self, worksheet: str, targets: set) -> int:
+        """Remove por nº de linha, conferindo antes o Id de cada uma.
+
+        Remoção feita por outro processo entre a leitura do índice e a
+        nossa desloca as linhas: com Id divergente, o índice é relido.
+        """
+        for _ in range(CFG.SAVE_RETRIES):
+            index = self._row_index(worksheet, ["Id"])
+            if index is None:
+                return self._delete_by_id_rewrite(worksheet, targets)
+            ws, header, rows = index
+            # De baixo para cima: cada remoção não desloca as seguintes
+            hits = sorted(((rows[i], i) for i in targets if i in rows), reverse=True)
+            if not hits:
+                return 0
+            id_col = header.index("Id") + 1
+            cells = _api("read", ws.batch_get, [rowcol_to_a1(n, id_col) for n, _ in hits])
+            seen = [str(c[0][0]).strip() if c and c[0] else "" for c in cells]
+            if seen != [i for _, i in hits]:
+                logger.info(f"delete_by_id [{worksheet}]: linhas deslocadas — relendo o índice")
+                continue
+            _api("write", ws.spreadsheet.batch_update, {"requests": [
+                {"deleteDimension": {"range": {
+                    "sheetId": ws.id, "dimension": "ROWS",
+                    "startIndex": n - 1, "endIndex": n,
+                }}}
+                for n, _ in hits
+            ]})
+            return len(hits)
+        raise RuntimeError(f"linhas de {worksheet} mudaram durante a remoção")
+
+    def _update_by_id_rewrite(self, worksheet: str, df_rows: pd.DataFrame) -> int:
+        df = self.read(worksheet)
+        upd = df_rows.assign(Id=_norm_ids(df_rows["Id"]).values).drop_duplicates("Id", keep="last").set_index("Id")
+        keys = _norm_ids(df["Id"]).values
+        mask = pd.Series(keys, index=df.index).isin(upd.index)
+        if not mask.any():
+            return 0
+        for col in upd.columns:
+            if col not in df.columns:
+                df[col] = None
+            df[col] = df[col].astype(object)
+            df.loc[mask, col] = upd[col].reindex(keys[mask.values]).values
+        self._replace(worksheet, df)
+        return int(mask.sum())
+
+    def _delete_by_id_rewrite(self, worksheet: str, targets: set) -> int:
+        df = self.read(worksheet)
+        mask = _norm_ids(df["Id"]).isin(targets).values
+        if not mask.any():
+            return 0
+        self._replace(worksheet, df[~mask])
+        return int(mask.sum())
+
+
+class SQLiteBackend(StorageBackend):
+    """Backend SQLite local: uma tabela por worksheet, índice em Id.
+
+    Colunas sem tipo declarado (como as células do Sheets) — os loaders
+    fazem a coerção. Uma conexão por operação, em modo WAL.
+    """
+
+    name = "sqlite"
+
+    SCHEMAS: dict[str, tuple] = {
+        "Transacoes": CFG.COLS_TRANSACAO,
+        "Patrimonio": CFG.COLS_PATRIMONIO,
+        "Recorrentes": CFG.COLS_RECORRENTE,
+        "Orcamentos": CFG.COLS_ORCAMENTO,
+        "Configuracoes": CFG.COLS_CONFIG,
+        "AuditLog": CFG.COLS_AUDIT,
+        "Metas": CFG.COLS_METAS,
+        "Passivos": CFG.COLS_PASSIVOS,
+        "Lixeira": CFG.COLS_LIXEIRA,
+    }
+
+    def __init__(self, path: str | Path) -> None:
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            for worksheet, cols in self.SCHEMAS.items():
+                self._create_table(con, worksheet, list(cols))
+            con.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._q(CFG.REVISION_SHEET)} "
+                f"(Planilha TEXT PRIMARY KEY, Revisao INTEGER NOT NULL, AtualizadoEm TEXT)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Conexão curta: commit ao sair do bloco (rollback em erro) e fecha."""
+        con = sqlite3.connect(self.path, timeout=10)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def _q(name: str) -> str:
+        return '"' + str(name).replace('"', '""') + '"'
+
+    def _create_table(self, con: sqlite3.Connection, worksheet: str, cols: list[str]) -> None:
+        col_sql = ", ".join(self._q(c) for c in cols)
+        con.execute(f"CREATE TABLE IF NOT EXISTS {self._q(worksheet)} ({col_sql})")
+        if "Id" in cols:
+            con.execute(
+                f"CREATE INDEX IF NOT EXISTS {self._q('ix_' + worksheet + '_id')} "
+                f"ON {self._q(worksheet)} ({self._q('Id')})"
+            )
+
+    def _columns(self, con: sqlite3.Connection, worksheet: str) -> list[str]:
+        rows = con.execute(f"PRAGMA table_info({self._q(worksheet)})").fetchall()
+        if not rows:
+            raise KeyError(f"worksheet inexistente: {worksheet}")
+        return [r[1] for r in rows]
+
+    @staticmethod
+    def _values(df: pd.DataFrame) -> list[tuple]:
+        df_out = _serialize_for_sheet(df)
+        return [
+            tuple(None if v == "" else v for v in map(_cell_value, row))
+            for row in df_out.itertuples(index=False)
+        ]
+
+    def _insert(self, con: sqlite3.Connection, worksheet: str, df: pd.DataFrame) -> None:
+        cols = ", ".join(self._q(c) for c in df.columns)
+        marks = ", ".join("?" for _ in df.columns)
+        con.executemany(
+            f"INSERT INTO {self._q(worksheet)} ({cols}) VALUES ({marks})",
+            self._values(df),
+        )
+
+    def _read(self, worksheet: str) -> pd.DataFrame:
+        with self._connect() as con:
+            return self._select(con, worksheet)
+
+    def _select(self, con: sqlite3.Connection, worksheet: str) -> pd.DataFrame:
+        cols = self._columns(con, worksheet)
+        rows = con.execute(f"SELECT * FROM {self._q(worksheet)} ORDER BY rowid").fetchall()
+        return pd.DataFrame(rows, columns=cols)
+
+    def read(self, worksheet: str) -> pd.DataFrame:
+        """Lê dados e revisão na mesma transação (leitura consistente)."""
+        with self._connect() as con:
+            con.execute("BEGIN")
+            rev = self._rev(con, worksheet)
+            df = self._select(con, worksheet).dropna(how="all")
+        df.attrs["header"] = list(df.columns)
+        if worksheet not in self.UNVERSIONED:
+            df.attrs["rev"] = rev
+        return df
+
+    def _rev(self, con: sqlite3.Connection, worksheet: str) -> int:
+        row = con.execute(
+            f"SELECT Revisao FROM {self._q(CFG.REVISION_SHEET)} WHERE Planilha = ?", (worksheet,)
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def _revisions(self, fresh: bool) -> dict[str, int]:
+        with self._connect() as con:
+            rows = con.execute(f"SELECT Planilha, Revisao FROM {self._q(CFG.REVISION_SHEET)}").fetchall()
+        return {p: int(r) for p, r in rows}
+
+    def _bump_in(self, con: sqlite3.Connection, worksheet: str) -> None:
+        con.execute(
+            f"INSERT INTO {self._q(CFG.REVISION_SHEET)} (Planilha, Revisao, AtualizadoEm) VALUES (?, 1, ?) "
+            f"ON CONFLICT(Planilha) DO UPDATE SET Revisao = Revisao + 1, AtualizadoEm = excluded.AtualizadoEm",
+            (worksheet, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+
+    def _bump(self, worksheet: str) -> None:
+        with self._connect() as con:
+            self._bump_in(con, worksheet)
+
+    def replace_if(self, worksheet: str, df: pd.DataFrame, expected_rev: int) -> bool:
+        """CAS atômico: checagem, reescrita e incremento numa transação só."""
+        with self._write_lock(worksheet):
+            if self._settle(worksheet):
+                return False
+            with self._connect() as con:
+                con.execute("BEGIN IMMEDIATE")
+                if self._rev(con, worksheet) != expected_rev:
+                    return False
+                self._replace_in(con, worksheet, df)
+                self._bump_in(con, worksheet)
+        return True
+
+    def headers(self, worksheet: str) -> list[str]:
+        with self._connect() as con:
+            return self._columns(con, worksheet)
+
+    def worksheets(self) -> list[str]:
+        with self._connect() as con:
+            rows = con.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        return [r[0] for r in rows]
+
+    def _append(self, worksheet: str, df_rows: pd.DataFrame) -> None:
+        with self._connect() as con:
+            self._create_table(con, worksheet, list(df_rows.columns))
+            existing = set(self._columns(con, worksheet))
+            for col in df_rows.columns:
+                if col not in existing:
+                    con.execute(f"ALTER TABLE {self._q(worksheet)} ADD COLUMN {self._q(col)}")
+            self._insert(con, worksheet, df_rows)
+
+    def _replace(self, worksheet: str, df: pd.DataFrame) -> None:
+        with self._connect() as con:
+            con.execute("BEGIN")
+            self._replace_in(con, worksheet, df)
+
+    def _replace_in(self, con: sqlite3.Connection, worksheet: str, df: pd.DataFrame) -> None:
+        con.execute(f"DROP TABLE IF EXISTS {self._q(worksheet)}")
+        self._create_table(con, worksheet, list(df.columns))
+        self._insert(con, worksheet, df)
+
+    def _update_by_id(self, worksheet: str, df_rows: pd.DataFrame) -> int:
+        cols = [c for c in df_rows.columns if c != "Id"]
+        sets = ", ".join(f"{self._q(c)} = ?" for c in cols)
+        df_ordered = df_rows[cols + ["Id"]].assign(Id=_norm_ids(df_rows["Id"]).values)
+        with self._connect() as con:
+            cur = con.executemany(
+                f"UPDATE {self._q(worksheet)} SET {sets} WHERE TRIM({self._q('Id')}) = ?",
+                self._values(df_ordered),
+            )
+            return cur.rowcount
+
+    def existing_ids(self, worksheet: str, ids) -> set[str]:
+        targets = sorted(set(_norm_ids(list(ids))) - {""})
+        if not targets:
+            return set()
+        marks = ", ".join("?" for _ in targets)
+        with self._connect() as con:
+            try:
+                self._columns(con, worksheet)
+            except KeyError:
+                return set()  # tabela ainda não criada
+            rows = con.execute(
+                f"SELECT TRIM({self._q('Id')}) FROM {self._q(worksheet)} WHERE TRIM({self._q('Id')}) IN ({marks})",
+                targets,
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def _delete_by_id(self, worksheet: str, targets: set) -> int:
+        with self._connect() as con:
+            cur = con.executemany(
+                f"DELETE FROM {self._q(worksheet)} WHERE TRIM({self._q('Id')}) = ?",
+                [(i,) for i in sorted(targets)],
+            )
+            return cur.rowcount
+
+
+@st.cache_resource(show_spinner=False)
+def get_backend() -> StorageBackend:
+    """Backend de armazenamento definido em secrets.toml ([storage] backend)."""
+    try:
+        storage = st.secrets.get("storage", {})
+    except Exception:
+        storage = {}  # sem secrets.toml
+    kind = str(storage.get("backend", "gsheets")).strip().lower()
+    if kind == "sqlite":
+        path = Path(storage.get("path", "ll_finance.db"))
+        if not path.is_absolute():
+            path = Path(__file__).parent / path
+        logger.info(f"Storage: SQLite ({path})")
+        return SQLiteBackend(path)
+    if kind != "gsheets":
+        logger.warning(f"Storage backend desconhecido '{kind}' — usando gsheets")
+    return GSheetsBackend(get_conn())
+
+
+# Loaders em cache por worksheet — escrita invalida só o que tocou
+_CACHE_REGISTRY: dict[str, list] = {}
+
+
+class _SWRStore:
+    """Cache stale-while-revalidate compartilhado entre sessões.
+
+    Até CACHE_TTL o frame é servido como fresco; até CACHE_MAX_STALE é
+    servido na hora e recarregado em background (uma recarga por chave);
+    além disso a leitura volta a ser síncrona.
+
+    Cada leitura boa é gravada em Parquet (SNAPSHOT_DIR). No primeiro acesso
+    após um restart o snapshot é servido como stale e reconciliado com o
+    Sheets em background — o cold start custa uma leitura de disco.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple] = {}  # key -> (valor, carregado_em)
+        self._generation: dict[str, int] = {}
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._inflight: set[str] = set()
+        self._from_snapshot: set[str] = set()
+        self._snapshot_tried: set[str] = set()
+        self._snapshot_dir = Path(__file__).parent / CFG.SNAPSHOT_DIR
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key: str, fetch, permanent: bool = False) -> pd.DataFrame:
+        """Frame da chave; permanent=True nunca expira (só invalidate)."""
+        entry = self._entries.get(key)
+        if entry is None and key not in self._snapshot_tried:
+            entry = self._load_snapshot(key)
+        if entry is not None and key in self._from_snapshot:
+            self._revalidate(key, fetch)
+            return entry[0]
+        if entry is not None:
+            age = time.time() - entry[1]
+            if age < CFG.CACHE_TTL or permanent:
+                return entry[0]
+            if age < CFG.CACHE_MAX_STALE:
+                self._revalidate(key, fetch)
+                return entry[0]
+        with self._key_lock(key):
+            # Outra sessão pode ter carregado enquanto esperávamos
+            entry = self._entries.get(key)
+            if entry is not None and (permanent or time.time() - entry[1] < CFG.CACHE_TTL):
+                return entry[0]
+            gen = self._generation.get(key, 0)
+            value = fetch()
+            if "header" not in value.attrs:
+                # Leitura falhou (ex.: circuito aberto): último frame bom, de
+                # qualquer idade, vale mais que um dashboard vazio
+                fallback = entry or self._load_snapshot(key, any_age=True)
+                if fallback is not None:
+                    return fallback[0]
+            self._store(key, value, gen, keep_stale=False)
+            return value
+
+    def _store(self, key: str, value, gen: int, keep_stale: bool) -> None:
+        good = "header" in value.attrs
+        with self._lock:
+            if self._generation.get(key, 0) != gen:
+                return  # invalidado durante a leitura — descarta
+            if keep_stale and key in self._entries and not good:
+                # Leitura falhou (frame de fallback) — mantém o último frame bom
+                return
+            self._entries[key] = (value, time.time())
+            self._from_snapshot.discard(key)
+        if good:
+            self._write_snapshot(key, value)
+
+    def _snapshot_path(self, key: str) -> Path:
+        return self._snapshot_dir / f"{key}.parquet"
+
+    def _load_snapshot(self, key: str, any_age: bool = False) -> tuple | None:
+        """Carrega o snapshot em disco (uma tentativa por processo).
+
+        any_age ignora SNAPSHOT_MAX_AGE (fallback com o backend fora do ar).
+        """
+        with self._lock:
+            self._snapshot_tried.add(key)
+        path = self._snapshot_path(key)
+        try:
+            mtime = path.stat().st_mtime
+            if not any_age and time.time() - mtime > CFG.SNAPSHOT_MAX_AGE:
+                return None
+            value = pd.read_parquet(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Snapshot ilegível [{key}]: {e}")
+            return None
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            self._entries[key] = (value, mtime)
+            self._from_snapshot.add(key)
+        logger.info(f"Snapshot carregado [{key}]: {len(value)} linhas")
+        return self._entries[key]
+
+    def _write_snapshot(self, key: str, value: pd.DataFrame) -> None:
+        """Grava o frame em Parquet de forma atômica (tmp + rename)."""
+        path = self._snapshot_path(key)
+        tmp = path.with_suffix(f".{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            self._snapshot_dir.mkdir(exist_ok=True)
+            value.to_parquet(tmp)
+            tmp.replace(path)
+        except Exception as e:
+            logger.warning(f"Snapshot não gravado [{key}]: {e}")
+            tmp.unlink(missing_ok=True)
+
+    def _revalidate(self, key: str, fetch) -> None:
+        with self._lock:
+            if key in self._inflight:
+                return
+            self._inflight.add(key)
+            gen = self._generation.get(key, 0)
+        ctx = get_script_run_ctx()
+
+        def _run() -> None:
+            try:
+                with background_quota():
+                    self._store(key, fetch(), gen, keep_stale=True)
+            except Exception as e:
+                logger.warning(f"SWR refresh failed [{key}]: {e}")
+            finally:
+                with self._lock:
+                    self._inflight.discard(key)
+
+        thread = threading.Thread(target=_run, name=f"swr-{key}", daemon=True)
+        if ctx is not None:
+            add_script_run_ctx(thread, ctx)
+        thread.start()
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._from_snapshot.discard(key)
+            self._snapshot_tried.add(key)
+            self._generation[key] = self._generation.get(key, 0) + 1
+        # Snapshot ficou anterior à escrita — não deve sobreviver a um restart
+        try:
+            self._snapshot_path(key).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Snapshot não removido [{key}]: {e}")
+
+    def loaded_at(self, key: str) -> float | None:
+        entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+
+@st.cache_resource(show_spinner=False)
+def _get_swr_store() -> _SWRStore:
+    """Store SWR único por processo."""
+    return _SWRStore()
+
+
+def _cached_loader(*worksheets: str):
+    """Envolve o loader no cache SWR e o registra nas worksheets que ele lê.
+
+    O frame em cache é compartilhado: cada chamada recebe uma cópia.
+    """
+    def decorator(fn):
+        key = fn.__name__
+
+        @functools.wraps(fn)
+        def cached() -> pd.DataFrame:
+            return _get_swr_store().get(key, fn).copy()
+
+        cached.clear = lambda: _get_swr_store().invalidate(key)
+        cached.loaded_at = lambda: _get_swr_store().loaded_at(key)
+        for ws in worksheets:
+            _CACHE_REGISTRY.setdefault(ws, []).append(cached)
+        return cached
+    return decorator
+
+
+def data_as_of() -> datetime | None:
+    """Horário da leitura mais antiga entre os frames em cache."""
+    loaded = {
+        loader.loaded_at()
+        for loaders in _CACHE_REGISTRY.values()
+        for loader in loaders
+    } - {None}
+    return datetime.fromtimestamp(min(loaded)) if loaded else None
+
+
+def invalidate_cache(*worksheets: str) -> None:
+    """Invalida os loaders das worksheets informadas (todas se vazio).
+
+    Escrita em transações pode ter criado uma aba anual — a lista de
+    abas (ABAS_KEY) é recarregada junto.
+    """
+    targets = worksheets or tuple(_CACHE_REGISTRY)
+    if any(_logical_sheet(ws) == "Transacoes" for ws in targets):
+        targets = (*targets, CFG.ABAS_KEY)
+    cleared: set[int] = set()
+    for ws in targets:
+        for loader in _CACHE_REGISTRY.get(ws, []):
+            if id(loader) not in cleared:
+                loader.clear()
+                cleared.add(id(loader))
+
+
 def _normalize_strings(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
     """Normaliza strings de colunas categóricas."""
     for col in columns:
@@ -480,15 +1742,44 @@ def _normalize_strings(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
     return df
 
 
-@st.cache_data(ttl=CFG.CACHE_TTL)
-def load_data() -> tuple[pd.DataFrame, pd.DataFrame]:
-    """Carrega transações e patrimônio do Google Sheets."""
-    conn = get_conn()
+def _shard_name(year: int) -> str:
+    """Aba anual de transações (ex.: Transacoes_2025)."""
+    return f"Transacoes_{int(year)}"
+
+
+def _shard_year(worksheet: str) -> int | None:
+    """Ano da aba anual de transações; None para qualquer outra aba."""
+    prefix, _, suffix = str(worksheet).rpartition("_")
+    if prefix == "Transacoes" and len(suffix) == 4 and suffix.isdigit():
+        return int(suffix)
+    return None
+
+
+def _logical_sheet(worksheet: str) -> str:
+    """Aba lógica: as abas anuais respondem como "Transacoes"."""
+    return "Transacoes" if _shard_year(worksheet) is not None else worksheet
+
+
+def _is_cold_year(year: int) -> bool:
+    """Ano anterior a qualquer janela de análise do mês corrente."""
+    return year < datetime.now().year - 1
+
+
+def _years_of(df: pd.DataFrame) -> pd.Series:
+    """Ano da Data de cada linha (ano corrente se a data for inválida)."""
+    if df.empty or "Data" not in df.columns:
+        return pd.Series(datetime.now().year, index=df.index, dtype=int)
+    years = pd.to_datetime(df["Data"], errors="coerce").dt.year
+    return years.fillna(datetime.now().year).astype(int)
+
+
+def _read_transacoes(worksheet: str) -> pd.DataFrame:
+    """Lê e normaliza uma aba de transações (legada ou anual)."""
+    backend = get_backend()
 
     expected_trans = list(CFG.COLS_TRANSACAO)
     try:
-        df_trans = conn.read(worksheet="Transacoes")
-        df_trans = df_trans.dropna(how="all")
+        df_trans = backend.read(worksheet)
         missing = set(expected_trans) - set(df_trans.columns)
         for col in missing:
             df_trans[col] = None
@@ -512,85 +1803,345 @@ def load_data() -> tuple[pd.DataFrame, pd.DataFrame]:
             if empty_ids.any():
                 df_trans.loc[empty_ids, "Id"] = [generate_id() for _ in range(empty_ids.sum())]
     except Exception as e:
-        logger.error(f"load_data [Transacoes]: {e}")
+        logger.error(f"load_transacoes [{worksheet}]: {e}")
         df_trans = pd.DataFrame(columns=expected_trans)
+    return df_trans
 
-    expected_pat = list(CFG.COLS_PATRIMONIO)
-    try:
-        df_assets = conn.read(worksheet="Patrimonio")
-        df_assets = df_assets.dropna(how="all")
-        missing = set(expected_pat) - set(df_assets.columns)
-        for col in missing:
-            df_assets[col] = None
-        if not df_assets.empty:
-            df_assets["Valor"] = pd.to_numeric(df_assets["Valor"], errors="coerce").fillna(0.0)
-            df_assets = _normalize_strings(df_assets, ["Item", "Responsavel"])
-    except Exception as e:
-        logger.error(f"load_data [Patrimonio]: {e}")
-        df_assets = pd.DataFrame(columns=expected_pat)
 
-    return df_trans, df_assets
+@functools.lru_cache(maxsize=None)
+def _transacoes_loader(worksheet: str):
+    """Loader SWR de uma aba de transações, registrado nela e em "Transacoes".
 
-def _parse_ativo(val) -> bool:
-    """Converte valor para booleano (coluna Ativo)."""
-    if isinstance(val, bool):
-        return val
-    if isinstance(val, (int, float)):
-        return bool(val)
-    return str(val).strip().lower() in ("true", "1", "1.0", "sim", "s", "yes")
+    Anos frios ficam em cache permanente: só uma escrita na aba (ou o
+    botão de atualizar) os invalida. Devolve o frame compartilhado do
+    cache — quem chama não deve alterá-lo no lugar.
+    """
+    key = "load_transacoes" if worksheet == "Transacoes" else f"load_{worksheet.lower()}"
+    year = _shard_year(worksheet)
 
+    def loader() -> pd.DataFrame:
+        permanent = year is not None and _is_cold_year(year)
+        return _get_swr_store().get(key, lambda: _read_transacoes(worksheet), permanent=permanent)
 
-@st.cache_data(ttl=CFG.CACHE_TTL)
-def load_recorrentes() -> pd.DataFrame:
-    """Carrega transações recorrentes do Google Sheets."""
-    conn = get_conn()
-    expected = list(CFG.COLS_RECORRENTE)
-    try:
-        df = conn.read(worksheet="Recorrentes")
-        df = df.dropna(how="all")
-        missing = set(expected) - set(df.columns)
-        for col in missing:
-            df[col] = None
-        if not df.empty:
-            df["Valor"] = pd.to_numeric(df["Valor"], errors="coerce").fillna(0.0)
-            df["DiaVencimento"] = pd.to_numeric(
-                df["DiaVencimento"], errors="coerce"
-            ).fillna(1).astype(int)
-            df["Ativo"] = df["Ativo"].apply(_parse_ativo)
-            df = _normalize_strings(df, ["Descricao", "Tipo", "Categoria", "Responsavel"])
-    except Exception as e:
-        logger.error(f"load_recorrentes: {e}")
-        df = pd.DataFrame(columns=expected)
-    return df
+    def loaded_at() -> float | None:
+        # Ano frio não envelhece — não entra na idade exibida dos dados
+        if year is not None and _is_cold_year(year):
+            return None
+        return _get_swr_store().loaded_at(key)
 
-@st.cache_data(ttl=CFG.CACHE_TTL)
-def load_orcamentos() -> pd.DataFrame:
-    """Carrega orçamentos por categoria do Google Sheets."""
-    conn = get_conn()
-    expected = list(CFG.COLS_ORCAMENTO)
+    loader.clear = lambda: _get_swr_store().invalidate(key)
+    loader.loaded_at = loaded_at
+    for ws in dict.fromkeys((worksheet, "Transacoes")):
+        _CACHE_REGISTRY.setdefault(ws, []).append(loader)
+    return loader
+
+
+_transacoes_loader("Transacoes")  # aba legada primeiro no registro
+
+
+@_cached_loader(CFG.ABAS_KEY)
+def load_abas() -> pd.DataFrame:
+    """Lista as abas da planilha (descoberta das abas anuais)."""
     try:
-        df = conn.read(worksheet="Orcamentos")
-        df = df.dropna(how="all")
-        missing = set(expected) - set(df.columns)
-        for col in missing:
-            df[col] = None
-        if not df.empty:
-            df["Limite"] = pd.to_numeric(df["Limite"], errors="coerce").fillna(0.0)
-            df = _normalize_strings(df, ["Categoria", "Responsavel"])
+        df = pd.DataFrame({"Planilha": get_backend().worksheets()}, dtype=object)
     except Exception as e:
-        logger.error(f"load_orcamentos: {e}")
-        df = pd.DataFrame(columns=expected)
+        logger.warning(f"load_abas: {e}")
+        return pd.DataFrame(columns=["Planilha"])  # sem header: o cache serve a última lista boa
+    df.attrs["header"] = ["Planilha"]
     return df
 
 
-@st.cache_data(ttl=CFG.CACHE_TTL)
+def _years_in(abas) -> list[int]:
+    """Anos com aba anual, dada uma lista de nomes de abas."""
+    return sorted({_shard_year(str(ws).strip()) for ws in abas} - {None})
+
+
+def transacoes_years() -> list[int]:
+    """Anos que já têm aba própria (Transacoes_YYYY), pela lista de abas em cache."""
+    return _years_in(load_abas()["Planilha"])
+
+
+def _is_aporte(df: pd.DataFrame) -> pd.Series:
+    return (df["Tipo"] == CFG.TIPO_SAIDA) & (df["Categoria"] == CFG.CAT_INVESTIMENTO)
+
+
+def strip_derived(df: pd.DataFrame) -> pd.DataFrame:
+    """Remove as colunas derivadas e volta os categóricos para texto.
+
+    Usado antes de editar/gravar/exportar um frame canônico.
+    """
+    df = df.drop(columns=[c for c in CFG.COLS_DERIVADAS if c in df.columns])
+    if isinstance(df.index, pd.DatetimeIndex):
+        df = df.reset_index(drop=True)
+    for col in ("Tipo", "Categoria", "Responsavel"):
+        if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(str)
+    return df
+
+
+def _classify(tipo: pd.Series, categoria: pd.Series) -> dict:
+    """Máscaras is_income / is_expense / is_investment e grupo 50/30/20."""
+    is_saida = tipo == CFG.TIPO_SAIDA
+    is_inv_cat = categoria == CFG.CAT_INVESTIMENTO
+    is_expense = is_saida & ~is_inv_cat
+    is_investment = is_saida & is_inv_cat
+    # Código do grupo: 0 necessidades, 1 desejos, 2 investido, -1 nenhum
+    codes = (
+        (is_expense & categoria.isin(CFG.NECESSIDADES)).astype("int8")
+        + (is_expense & categoria.isin(CFG.DESEJOS)).astype("int8") * 2
+        + is_investment.astype("int8") * 3
+        - 1
+    )
+    return {
+        "is_income": tipo == CFG.TIPO_ENTRADA,
+        "is_expense": is_expense,
+        "is_investment": is_investment,
+        "group": pd.Categorical.from_codes(codes.to_numpy(), categories=list(CFG.GRUPOS_503020)),
+    }
+
+
+def build_transaction_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Frame canônico de transações: tipos fixos + colunas derivadas.
+
+    Tipo, Categoria e Responsavel viram categóricos (valores fora do
+    Config entram como categorias extras); cents traz Valor em centavos
+    int64 para somas exatas. As análises usam period, year, month, day,
+    weekday, as máscaras is_income / is_expense / is_investment e group
+    (50/30/20) em vez de recalcular .dt e comparações de texto a cada
+    chamada. Linhas ordenadas por Data, que também vira o índice
+    (DatetimeIndex): filtros de mês/período são fatias por busca binária
+    (ver filter_by_dates). Idempotente.
+    """
+    df = strip_derived(df)
+    data = pd.to_datetime(df["Data"], errors="coerce")
+    if data.isna().any():
+        df, data = df[data.notna()], data[data.notna()]
+    df = df.assign(Data=data).sort_values("Data", kind="stable")
+    df = df.set_axis(pd.DatetimeIndex(df["Data"].to_numpy()))
+    data = df["Data"]
+
+    for col, base in (
+        ("Tipo", CFG.TIPOS),
+        ("Categoria", CFG.CATEGORIAS_TODAS),
+        ("Responsavel", CFG.RESPONSAVEIS),
+    ):
+        values = df[col].fillna("").astype(str)
+        extra = sorted(set(values.unique()) - set(base))
+        df[col] = values.astype(pd.CategoricalDtype([*base, *extra]))
+
+    return df.assign(
+        cents=to_cents(df["Valor"]),
+        period=data.dt.to_period("M"),
+        year=data.dt.year.astype("int16"),
+        month=data.dt.month.astype("int8"),
+        day=data.dt.day.astype("int8"),
+        weekday=data.dt.weekday.astype("int8"),
+        **_classify(df["Tipo"], df["Categoria"]),
+    )
+
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    """Garante o frame canônico (frames montados fora de load_transacoes)."""
+    return df if "is_expense" in df.columns else build_transaction_frame(df)
+
+
+_MEMO_LOCK = threading.Lock()
+
+
+def _memo_put(memo: dict, key, value, cap: int) -> None:
+    """Guarda key em um memo compartilhado entre sessões, descartando o
+    mais antigo no limite. Toda escrita nos memos passa pelo lock: reruns
+    concorrentes não veem o dict mudar no meio da iteração."""
+    with _MEMO_LOCK:
+        while len(memo) >= cap:
+            memo.pop(next(iter(memo)), None)
+        memo[key] = value
+
+
+@st.cache_resource(show_spinner=False)
+def _get_versioned() -> dict:
+    """Frames versionados vivos: id(frame) → (weakref, versão)."""
+    return {}
+
+
+def _stamp(df: pd.DataFrame, versao: str) -> pd.DataFrame:
+    """Marca o próprio objeto df como portador da versão (ver _versao)."""
+    registry = _get_versioned()
+    key = id(df)
+
+    def _drop(ref, key=key) -> None:
+        if registry.get(key, (None,))[0] is ref:
+            registry.pop(key, None)
+
+    df.attrs["versao"] = versao
+    registry[key] = (weakref.ref(df, _drop), versao)
+    return df
+
+
+def _versao(df: pd.DataFrame) -> str | None:
+    """Versão do frame, só se ele for o objeto marcado por _stamp.
+
+    attrs é herdado por fatias e cópias (df[mask], assign...): um frame
+    derivado do mesmo tamanho reaproveitaria cubo, partição e métricas do
+    original. Só o objeto registrado conta como versionado.
+    """
+    entry = _get_versioned().get(id(df))
+    if entry is None or entry[0]() is not df:
+        return None
+    return entry[1]
+
+
+@st.cache_resource(show_spinner=False)
+def _get_typed_memo() -> dict:
+    """Frames canônicos já montados, por (anos, aportes_fora)."""
+    return {}
+
+
+def load_transacoes(years=None, *, aportes_fora: bool = False) -> pd.DataFrame:
+    """Carrega transações das abas anuais (todas, ou só os anos pedidos).
+
+    A aba legada "Transacoes" (anterior à divisão por ano) continua sendo
+    lida e filtrada pelos mesmos anos. Com aportes_fora, os demais anos
+    entram só com os aportes (Saída/Investimento), que os indicadores
+    acumulados somam desde o início do histórico.
+    """
+    wanted = None if years is None else {int(y) for y in years}
+
+    # (aba, frame do cache SWR, só aportes?) — a aba legada é filtrada por ano
+    sources = [("Transacoes", _transacoes_loader("Transacoes")(), False)]
+    for year in transacoes_years():
+        if wanted is None or year in wanted or aportes_fora:
+            ws = _shard_name(year)
+            only_aportes = wanted is not None and year not in wanted
+            sources.append((ws, _transacoes_loader(ws)(), only_aportes))
+
+    # Mesmos frames de origem → mesmo frame canônico (montado uma vez)
+    memo = _get_typed_memo()
+    memo_key = (None if wanted is None else tuple(sorted(wanted)), aportes_fora)
+    hit = memo.get(memo_key)
+    if hit is not None and len(hit[0]) == len(sources) and all(
+        a is b for a, (_, b, _) in zip(hit[0], sources)
+    ):
+        return _stamp(hit[1].copy(deep=False), hit[1].attrs["versao"])
+
+    parts = []
+    for ws, df, only_aportes in sources:
+        if df.empty or wanted is None or (ws != "Transacoes" and not only_aportes):
+            parts.append(df)
+            continue
+        if only_aportes:
+            mask = pd.Series(False, index=df.index)
+        else:
+            mask = df["Data"].dt.year.isin(list(wanted))
+        if aportes_fora:
+            mask = mask | _is_aporte(df)
+        parts.append(df[mask])
+
+    non_empty = [df for df in parts if not df.empty]
+    df_trans = (
+        pd.concat(non_empty, ignore_index=True) if non_empty
+        else pd.DataFrame(columns=list(CFG.COLS_TRANSACAO))
+    )
+    df_trans = build_transaction_frame(df_trans)
+    # Cabeçalho da aba legada (é a que validate_worksheets confere)
+    header = next((df.attrs["header"] for _, df, _ in sources if "header" in df.attrs), None)
+    df_trans.attrs = {"header": header} if header is not None else {}
+    df_trans.attrs["versao"] = generate_id()  # identifica a versão dos dados (cubo)
+    _memo_put(memo, memo_key, (tuple(df for _, df, _ in sources), df_trans), cap=16)
+    return _stamp(df_trans.copy(deep=False), df_trans.attrs["versao"])
+
+
+def analysis_years(year: int) -> tuple[int, ...]:
+    """Anos que as análises do mês podem tocar.
+
+    Até 13 meses para trás do mês selecionado, mais os últimos meses a
+    partir de hoje (templates de transações frequentes).
+    """
+    now = datetime.now()
+    return tuple(sorted({year - 1, year, now.year - 1, now.year}))
+
+
+@_cached_loader("Patrimonio")
+def load_patrimonio() -> pd.DataFrame:
+    """Carrega patrimônio do Google Sheets."""
+    backend = get_backend()
+
+    expected_pat = list(CFG.COLS_PATRIMONIO)
+    try:
+        df_assets = backend.read("Patrimonio")
+        missing = set(expected_pat) - set(df_assets.columns)
+        for col in missing:
+            df_assets[col] = None
+        if not df_assets.empty:
+            df_assets["Valor"] = pd.to_numeric(df_assets["Valor"], errors="coerce").fillna(0.0)
+            df_assets = _normalize_strings(df_assets, ["Item", "Responsavel"])
+    except Exception as e:
+        logger.error(f"load_patrimonio: {e}")
+        df_assets = pd.DataFrame(columns=expected_pat)
+    return df_assets
+
+
+def load_data() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Carrega transações e patrimônio do Google Sheets."""
+    return load_transacoes(), load_patrimonio()
+
+def _parse_ativo(val) -> bool:
+    """Converte valor para booleano (coluna Ativo)."""
+    if isinstance(val, bool):
+        return val
+    if isinstance(val, (int, float)):
+        return bool(val)
+    return str(val).strip().lower() in ("true", "1", "1.0", "sim", "s", "yes")
+
+
+@_cached_loader("Recorrentes")
+def load_recorrentes() -> pd.DataFrame:
+    """Carrega transações recorrentes do Google Sheets."""
+    backend = get_backend()
+    expected = list(CFG.COLS_RECORRENTE)
+    try:
+        df = backend.read("Recorrentes")
+        missing = set(expected) - set(df.columns)
+        for col in missing:
+            df[col] = None
+        if not df.empty:
+            df["Valor"] = pd.to_numeric(df["Valor"], errors="coerce").fillna(0.0)
+            df["DiaVencimento"] = pd.to_numeric(
+                df["DiaVencimento"], errors="coerce"
+            ).fillna(1).astype(int)
+            df["Ativo"] = df["Ativo"].apply(_parse_ativo)
+            df = _normalize_strings(df, ["Descricao", "Tipo", "Categoria", "Responsavel"])
+    except Exception as e:
+        logger.error(f"load_recorrentes: {e}")
+        df = pd.DataFrame(columns=expected)
+    return df
+
+@_cached_loader("Orcamentos")
+def load_orcamentos() -> pd.DataFrame:
+    """Carrega orçamentos por categoria do Google Sheets."""
+    backend = get_backend()
+    expected = list(CFG.COLS_ORCAMENTO)
+    try:
+        df = backend.read("Orcamentos")
+        missing = set(expected) - set(df.columns)
+        for col in missing:
+            df[col] = None
+        if not df.empty:
+            df["Limite"] = pd.to_numeric(df["Limite"], errors="coerce").fillna(0.0)
+            df = _normalize_strings(df, ["Categoria", "Responsavel"])
+    except Exception as e:
+        logger.error(f"load_orcamentos: {e}")
+        df = pd.DataFrame(columns=expected)
+    return df
+
+
+@_cached_loader("Configuracoes")
 def load_config() -> pd.DataFrame:
     """Carrega configurações do usuário do Google Sheets."""
-    conn = get_conn()
+    backend = get_backend()
     expected = list(CFG.COLS_CONFIG)
     try:
-        df = conn.read(worksheet="Configuracoes")
-        df = df.dropna(how="all")
+        df = backend.read("Configuracoes")
         missing = set(expected) - set(df.columns)
         for col in missing:
             df[col] = None
@@ -602,14 +2153,13 @@ def load_config() -> pd.DataFrame:
     return df
 
 
-@st.cache_data(ttl=CFG.CACHE_TTL)
+@_cached_loader("Metas")
 def load_metas() -> pd.DataFrame:
     """Carrega metas financeiras do Google Sheets (G1)."""
-    conn = get_conn()
+    backend = get_backend()
     expected = list(CFG.COLS_METAS)
     try:
-        df = conn.read(worksheet="Metas")
-        df = df.dropna(how="all")
+        df = backend.read("Metas")
         missing = set(expected) - set(df.columns)
         for col in missing:
             df[col] = None
@@ -629,14 +2179,13 @@ def load_metas() -> pd.DataFrame:
         df = pd.DataFrame(columns=expected)
     return df
 
-@st.cache_data(ttl=CFG.CACHE_TTL)
+@_cached_loader("Passivos")
 def load_passivos() -> pd.DataFrame:
     """Carrega passivos (dívidas/financiamentos) do Google Sheets (I5)."""
-    conn = get_conn()
+    backend = get_backend()
     expected = list(CFG.COLS_PASSIVOS)
     try:
-        df = conn.read(worksheet="Passivos")
-        df = df.dropna(how="all")
+        df = backend.read("Passivos")
         missing = set(expected) - set(df.columns)
         for col in missing:
             df[col] = None
@@ -649,14 +2198,13 @@ def load_passivos() -> pd.DataFrame:
     return df
 
 
-@st.cache_data(ttl=CFG.CACHE_TTL)
+@_cached_loader("Lixeira")
 def load_lixeira() -> pd.DataFrame:
     """Carrega transações da lixeira (S3)."""
-    conn = get_conn()
+    backend = get_backend()
     expected = list(CFG.COLS_LIXEIRA)
     try:
-        df = conn.read(worksheet="Lixeira")
-        df = df.dropna(how="all")
+        df = backend.read("Lixeira")
         missing = set(expected) - set(df.columns)
         for col in missing:
             df[col] = None
@@ -670,18 +2218,98 @@ def load_lixeira() -> pd.DataFrame:
     return df
 
 
+_BOOT_LOADERS: dict = {
+    "transacoes": ("Transacoes", load_transacoes),
+    "patrimonio": ("Patrimonio", load_patrimonio),
+    "recorrentes": ("Recorrentes", load_recorrentes),
+    "orcamentos": ("Orcamentos", load_orcamentos),
+    "config": ("Configuracoes", load_config),
+    "metas": ("Metas", load_metas),
+    "passivos": ("Passivos", load_passivos),
+    "lixeira": ("Lixeira", load_lixeira),
+}
+
+
+@st.cache_resource(show_spinner=False)
+def _get_pending_memo() -> dict:
+    """Transações com as linhas do WAL já montadas, por (versão, entradas)."""
+    return {}
+
+
+def _with_pending_transacoes(df: pd.DataFrame) -> pd.DataFrame:
+    """with_pending do frame canônico de transações, montado uma vez.
+
+    A versão do resultado deriva da versão carregada e dos ids das
+    entradas pendentes: reruns com o mesmo WAL reaproveitam o frame (e,
+    com ele, cubo, partições e métricas).
+    """
+    entries = _get_wal().pending("Transacoes")
+    versao = _versao(df)
+    if not entries or versao is None:
+        return with_pending(df, "Transacoes", entries)
+    key = (versao, tuple(e["id"] for e in entries))
+    memo = _get_pending_memo()
+    typed = memo.get(key)
+    if typed is None:
+        merged = with_pending(df, "Transacoes", entries)
+        if merged is df:
+            return df
+        typed = build_transaction_frame(merged)
+        digest = hashlib.sha1("|".join(key[1]).encode()).hexdigest()[:12]
+        typed.attrs = {**merged.attrs, "versao": f"{versao}+{digest}"}
+        _memo_put(memo, key, typed, cap=8)
+    return _stamp(typed.copy(deep=False), typed.attrs["versao"])
+
+
+def load_all(years=None) -> DataBundle:
+    """Carrega todas as worksheets em paralelo (boot).
+
+    Cada loader roda numa thread do pool com o ScriptRunContext da sessão
+    anexado (chamadas st.* dentro dele veem a sessão). Os loaders servem do
+    cache SWR (_SWRStore): quente, o custo é desprezível; a frio, o boot
+    passa a custar a leitura mais lenta em vez da soma de todas. Appends ainda no WAL entram como linhas
+    provisórias. Com years, transações só desses anos (mais os aportes
+    dos demais — ver load_transacoes).
+    """
+    ctx = get_script_run_ctx()
+    loaders = dict(_BOOT_LOADERS)
+    if years is not None:
+        loaders["transacoes"] = (
+            "Transacoes", functools.partial(load_transacoes, tuple(years), aportes_fora=True),
+        )
+
+    def _timed(name: str, spec: tuple):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        worksheet, loader = spec
+        t0 = time.perf_counter()
+        df = loader()
+        ms = (time.perf_counter() - t0) * 1000
+        # Linhas ainda no WAL entram como provisórias
+        if name == "transacoes":
+            merged = _with_pending_transacoes(df)
+        else:
+            merged = with_pending(df, worksheet)
+        return name, merged, ms
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CFG.BOOT_WORKERS, thread_name_prefix="boot-loader") as pool:
+        results = list(pool.map(lambda item: _timed(*item), loaders.items()))
+
+    frames = {name: df for name, df, _ in results}
+    latencias = {name: round(ms, 1) for name, _, ms in results}
+    wall_ms = (time.perf_counter() - t_start) * 1000
+    if wall_ms > 100:
+        detail = ", ".join(f"{k}={v:.0f}" for k, v in latencias.items())
+        logger.info(f"load_all: {wall_ms:.0f}ms ({detail})")
+    return DataBundle(**frames, latencias=latencias, wall_ms=round(wall_ms, 1))
+
+
 def _move_to_lixeira(rows: pd.DataFrame) -> bool:
     """Move transações para a lixeira (soft delete — S3)."""
     if rows.empty:
         return True
-    conn = get_conn()
     try:
-        try:
-            df_lixeira = conn.read(worksheet="Lixeira")
-            df_lixeira = df_lixeira.dropna(how="all")
-        except Exception:
-            df_lixeira = pd.DataFrame(columns=list(CFG.COLS_LIXEIRA))
-
         df_to_trash = rows.copy()
         df_to_trash["DeletadoEm"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -689,13 +2317,14 @@ def _move_to_lixeira(rows: pd.DataFrame) -> bool:
             if col not in df_to_trash.columns:
                 df_to_trash[col] = ""
 
-        df_updated = pd.concat([df_lixeira, df_to_trash[list(CFG.COLS_LIXEIRA)]], ignore_index=True)
-
-        if len(df_updated) > 200:
-            df_updated = df_updated.sort_values("DeletadoEm", ascending=False).head(200).reset_index(drop=True)
+        def _add_to_trash(df_lixeira: pd.DataFrame) -> pd.DataFrame:
+            df_updated = pd.concat([df_lixeira, df_to_trash[list(CFG.COLS_LIXEIRA)]], ignore_index=True)
+            if len(df_updated) > 200:
+                df_updated = df_updated.sort_values("DeletadoEm", ascending=False).head(200).reset_index(drop=True)
+            return df_updated
 
-        df_updated = _serialize_for_sheet(df_updated)
-        conn.update(worksheet="Lixeira", data=df_updated)
+        _cas_update("Lixeira", _add_to_trash, pd.DataFrame(columns=list(CFG.COLS_LIXEIRA)))
+        invalidate_cache("Lixeira")
         logger.info(f"_move_to_lixeira: {len(rows)} registros movidos")
         _log_audit("SOFT_DELETE", "Lixeira", f"{len(rows)} transações")
         return True
@@ -708,14 +2337,8 @@ def _restore_from_lixeira(rows: pd.DataFrame) -> bool:
     """Restaura transações da lixeira para Transacoes (S3)."""
     if rows.empty:
         return True
-    conn = get_conn()
+    backend = get_backend()
     try:
-        try:
-            df_trans = conn.read(worksheet="Transacoes")
-            df_trans = df_trans.dropna(how="all")
-        except Exception:
-            df_trans = pd.DataFrame(columns=list(CFG.COLS_TRANSACAO))
-
         df_restore = rows.copy()
         if "DeletadoEm" in df_restore.columns:
             df_restore = df_restore.drop(columns=["DeletadoEm"])
@@ -724,21 +2347,15 @@ def _restore_from_lixeira(rows: pd.DataFrame) -> bool:
             if col not in df_restore.columns:
                 df_restore[col] = ""
 
-        df_updated = pd.concat([df_trans, df_restore[list(CFG.COLS_TRANSACAO)]], ignore_index=True)
-        df_updated = _serialize_for_sheet(df_updated)
-        conn.update(worksheet="Transacoes", data=df_updated)
+        df_restore = df_restore[list(CFG.COLS_TRANSACAO)]
+        touched = _append_transacoes(backend, df_restore)
 
         try:
-            df_lixeira = conn.read(worksheet="Lixeira")
-            df_lixeira = df_lixeira.dropna(how="all")
-            restored_ids = set(rows["Id"].astype(str).str.strip())
-            df_lixeira = df_lixeira[~df_lixeira["Id"].astype(str).str.strip().isin(restored_ids)]
-            df_lixeira = _serialize_for_sheet(df_lixeira)
-            conn.update(worksheet="Lixeira", data=df_lixeira)
+            backend.delete_by_id("Lixeira", rows["Id"])
         except Exception:
             pass
 
-        st.cache_data.clear()
+        invalidate_cache(*touched, "Lixeira")
         logger.info(f"_restore_from_lixeira: {len(rows)} restauradas")
         _log_audit("RESTORE", "Transacoes", f"{len(rows)} da lixeira")
         return True
@@ -756,22 +2373,16 @@ def save_config(user_config: UserConfig, responsavel: str) -> bool:
         {"Chave": "autonomia_alvo", "Valor": str(user_config.autonomia_alvo), "Responsavel": responsavel},
         {"Chave": "auto_gerar_recorrentes", "Valor": str(user_config.auto_gerar_recorrentes).lower(), "Responsavel": responsavel},
     ]
-    conn = get_conn()
-    try:
-        try:
-            df_curr = conn.read(worksheet="Configuracoes")
-            df_curr = df_curr.dropna(how="all")
-        except Exception:
-            df_curr = pd.DataFrame(columns=list(CFG.COLS_CONFIG))
 
+    def _replace_profile(df_curr: pd.DataFrame) -> pd.DataFrame:
         # Remove config existente deste responsável
         if not df_curr.empty and "Responsavel" in df_curr.columns:
-            df_curr = df_curr[df_curr["Responsavel"].str.strip() != responsavel].copy()
+            df_curr = df_curr[df_curr["Responsavel"].astype(str).str.strip() != responsavel].copy()
+        return pd.concat([df_curr, pd.DataFrame(entries)], ignore_index=True)
 
-        df_new = pd.DataFrame(entries)
-        df_updated = pd.concat([df_curr, df_new], ignore_index=True)
-        conn.update(worksheet="Configuracoes", data=df_updated)
-        st.cache_data.clear()
+    try:
+        _cas_update("Configuracoes", _replace_profile, pd.DataFrame(columns=list(CFG.COLS_CONFIG)))
+        invalidate_cache("Configuracoes")
         logger.info(f"save_config OK [{responsavel}]")
         _log_audit("CONFIG", "Configuracoes", f"Perfil: {responsavel}")
         return True
@@ -793,37 +2404,219 @@ def _serialize_for_sheet(df: pd.DataFrame) -> pd.DataFrame:
         )
     return df_out
 
-def _log_audit(action: str, worksheet: str, details: str = "") -> None:
-    """Registra ação no audit log (fire-and-forget)."""
+@st.cache_resource(ttl=CFG.CACHE_TTL, show_spinner=False)
+def _get_worksheet_layout(_conn: GSheetsConnection, worksheet: str) -> tuple | None:
+    """Retorna (handle gspread, cabeçalho) da worksheet para escrita por linha.
+
+    None quando o backend não expõe a worksheet (ex.: planilha pública),
+    caso em que só a reescrita completa é possível.
+    """
+    select = getattr(getattr(_conn, "client", None), "_select_worksheet", None)
+    if select is None:
+        return None
+    ws = _api("read", select, worksheet=worksheet)
+    header = [str(c).strip() for c in _api("read", ws.row_values, 1)]
+    return ws, header
+
+
+def _cell_value(val):
+    """Converte escalar pandas/numpy para valor nativo aceito pela API."""
+    if val is None:
+        return ""
     try:
-        conn = get_conn()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        usuario = st.session_state.get("auth_user", "anônimo")
+        if pd.isna(val):
+            return ""
+    except (TypeError, ValueError):
+        pass
+    if hasattr(val, "item"):
+        return val.item()
+    return val
+
+
+def _append_rows(conn: GSheetsConnection, worksheet: str, df_rows: pd.DataFrame) -> bool:
+    """Anexa linhas ao final da worksheet sem reler nem reescrever a planilha.
+
+    Retorna False quando o append não é possível (backend sem suporte,
+    planilha sem cabeçalho ou colunas novas) — o chamador cai no rewrite.
+    """
+    if df_rows.empty:
+        return True
+    layout = _get_worksheet_layout(conn, worksheet)
+    if layout is None:
+        return False
+    ws, header = layout
+    if not header or set(df_rows.columns) - set(header):
+        return False
+    df_out = _serialize_for_sheet(df_rows).reindex(columns=header)
+    values = [[_cell_value(v) for v in row] for row in df_out.itertuples(index=False)]
+    _api("write", ws.append_rows, values, value_input_option="USER_ENTERED", table_range="A1")
+    return True
+
+
+def _rewrite_with_rows(backend: GSheetsBackend, worksheet: str, df_rows: pd.DataFrame) -> None:
+    """Fallback: relê a planilha, concatena as linhas e reescreve tudo.
+
+    Falha na leitura propaga: reescrever só com as linhas novas apagaria
+    a aba (WorksheetNotFound cai no _append, que cria a aba).
+    """
+    df_curr = backend.read(worksheet)
+    backend._replace(worksheet, pd.concat([df_curr, df_rows], ignore_index=True))
 
+
+class _AuditWriter:
+    """Writer do audit log em background: fila em processo + flush em lote.
+
+    O script thread só enfileira (nunca bloqueia). Uma thread daemon
+    agrupa eventos por até AUDIT_FLUSH_INTERVAL segundos e grava com
+    append; a poda para AUDIT_MAX_ROWS roda a cada 20 flushes. No
+    encerramento (close), a thread para e só então o resto da fila é
+    gravado — nunca dois flushes ao mesmo tempo.
+    """
+
+    _TRIM_EVERY = 20
+
+    def __init__(self, backend: StorageBackend) -> None:
+        self._backend = backend
+        self._queue: queue.Queue = queue.Queue(maxsize=CFG.AUDIT_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.last_flush: datetime | None = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row: dict) -> bool:
+        """Enfileira evento sem bloquear. False se a fila estiver cheia."""
         try:
-            df_log = conn.read(worksheet="AuditLog")
-            df_log = df_log.dropna(how="all")
-        except Exception:
-            df_log = pd.DataFrame(columns=list(CFG.COLS_AUDIT))
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logger.warning(f"Audit queue cheia — evento descartado: {row.get('Acao')}")
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enqueued": self.enqueued,
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "pending": self._queue.qsize(),
+                "flushes": self.flush_count,
+                "failed_flushes": self.failed_flushes,
+                "last_flush": self.last_flush,
+            }
+
+    def _next_batch(self, block: bool = True) -> list[dict]:
+        try:
+            # Espera limitada: a thread confere _stop entre uma espera e outra
+            batch = [self._queue.get(block=block, timeout=CFG.AUDIT_FLUSH_INTERVAL if block else None)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + CFG.AUDIT_FLUSH_INTERVAL
+        while len(batch) < CFG.AUDIT_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or not block:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        with background_quota():
+            while not self._stop.is_set():
+                batch = self._next_batch()
+                if batch:
+                    self._flush(batch)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Encerramento do processo: para a thread e grava o resto da fila."""
+        self._stop.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Audit writer não parou em {timeout:.0f}s — {self._queue.qsize()} eventos não gravados")
+            return
+        self.drain()
+
+    def drain(self) -> None:
+        """Grava o que restar na fila (só com a thread parada — ver close)."""
+        while True:
+            batch = self._next_batch(block=False)
+            if not batch:
+                return
+            self._flush(batch)
+
+    def _flush(self, batch: list[dict]) -> None:
+        df_batch = pd.DataFrame(batch, columns=list(CFG.COLS_AUDIT))
+        try:
+            _commit_rows(self._backend, "AuditLog", df_batch)
+        except Exception as e:
+            with self._lock:
+                self.dropped += len(batch)
+                self.failed_flushes += 1
+            logger.warning(f"Audit flush failed — {len(batch)} eventos perdidos: {e}")
+            return
+        with self._lock:
+            self.flushed += len(batch)
+            self.flush_count += 1
+            self.last_flush = datetime.now()
+            should_trim = self.flush_count % self._TRIM_EVERY == 0
+        if should_trim:
+            self._trim()
+
+    def _trim(self) -> None:
+        """Mantém apenas os últimos AUDIT_MAX_ROWS registros."""
+        try:
+            df_log = self._backend.read("AuditLog")
+            if len(df_log) > CFG.AUDIT_MAX_ROWS:
+                df_log = df_log.tail(CFG.AUDIT_MAX_ROWS).reset_index(drop=True)
+                self._backend.replace("AuditLog", df_log)
+        except Exception as e:
+            logger.warning(f"Audit trim failed (non-blocking): {e}")
+
+
+@st.cache_resource(show_spinner=False)
+def _get_audit_writer() -> _AuditWriter:
+    """Writer de auditoria único por processo (compartilhado entre sessões)."""
+    return _AuditWriter(get_backend())
 
-        new_row = pd.DataFrame([{
-            "Timestamp": timestamp,
-            "Usuario": usuario,
+
+def audit_stats() -> dict:
+    """Contadores do writer de auditoria (enfileirados, gravados, perdidos)."""
+    return _get_audit_writer().stats()
+
+
+def _log_audit(action: str, worksheet: str, details: str = "", usuario: str | None = None) -> None:
+    """Registra ação no audit log (fire-and-forget, gravado em background).
+
+    usuario fixa o autor (chamadas fora da sessão, ex.: replay do WAL).
+    """
+    try:
+        _get_audit_writer().submit({
+            "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "Usuario": usuario or st.session_state.get("auth_user", "anônimo"),
             "Acao": action,
             "Planilha": worksheet,
             "Detalhes": str(details)[:200],
-        }])
-
-        df_updated = pd.concat([df_log, new_row], ignore_index=True)
-        # Manter apenas últimos 500 registros para não sobrecarregar
-        if len(df_updated) > 500:
-            df_updated = df_updated.tail(500).reset_index(drop=True)
-        conn.update(worksheet="AuditLog", data=df_updated)
+        })
     except Exception as e:
         logger.warning(f"Audit log failed (non-blocking): {e}")
 
 def _check_rate_limit(action: str = "save", cooldown: float = 2.0) -> bool:
-    """Verifica rate limit por ação. Retorna True se permitido."""
+    """Evita clique duplo: uma ação por sessão a cada cooldown segundos.
+
+    A cota da API (compartilhada entre sessões) é do _QuotaGovernor.
+    """
     key = f"_rl_{action}"
     now = time.time()
     last = st.session_state.get(key, 0.0)
@@ -833,96 +2626,707 @@ def _check_rate_limit(action: str = "save", cooldown: float = 2.0) -> bool:
     return True
 
 
+def _commit_rows(backend: StorageBackend, worksheet: str, df_rows: pd.DataFrame) -> None:
+    """Grava linhas novas em uma única escrita (append), com retry.
+
+    Timeout ou 5xx não dizem se o append entrou: antes de cada nova
+    tentativa, as linhas cujo Id já está na aba saem do lote. Linhas sem
+    Id não têm como ser conferidas, então não há retry. Propaga a última
+    exceção se todas as tentativas falharem.
+    """
+    checkable = "Id" in df_rows.columns and _norm_ids(df_rows["Id"]).ne("").all()
+    retries = CFG.SAVE_RETRIES if checkable else 1
+    for attempt in range(retries):
+        try:
+            if attempt:
+                done = backend.existing_ids(worksheet, df_rows["Id"])
+                df_rows = df_rows[~_norm_ids(df_rows["Id"]).isin(done).values]
+                if df_rows.empty:
+                    return  # a tentativa anterior gravou tudo
+            backend.append(worksheet, df_rows)
+            return
+        except Exception:
+            if attempt == retries - 1:
+                raise
+            time.sleep(0.5 * (attempt + 1))
+
+
+def _split_by_year(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Agrupa linhas de transação pela aba anual do ano da Data."""
+    if df.empty:
+        return {}
+    return {_shard_name(year): part for year, part in df.groupby(_years_of(df).values, sort=True)}
+
+
+def _with_transacao_cols(df: pd.DataFrame) -> pd.DataFrame:
+    """Colunas na ordem de COLS_TRANSACAO (extras no fim) — cabeçalho de aba nova."""
+    extra = [c for c in df.columns if c not in CFG.COLS_TRANSACAO]
+    return df.reindex(columns=[*CFG.COLS_TRANSACAO, *extra])
+
+
+def _append_transacoes(backend: StorageBackend, df_rows: pd.DataFrame) -> list[str]:
+    """Anexa transações nas abas anuais (com retry). Retorna as abas tocadas."""
+    parts = _split_by_year(_with_transacao_cols(df_rows))
+    for shard, part in parts.items():
+        _commit_rows(backend, shard, part)
+    return list(parts)
+
+
+def _write_transacoes_diff(backend: StorageBackend, diff: dict[str, pd.DataFrame]) -> list[str]:
+    """Aplica o diff do histórico nas abas anuais. Retorna as abas tocadas.
+
+    Cada linha vai para a aba do ano da sua Data. Linha editada que não
+    está lá (ainda na aba legada, ou com o ano alterado) sai de onde
+    estiver e é anexada na aba certa. As abas existentes vêm da própria
+    planilha, lidas na hora: sem a lista, nada é gravado.
+    """
+    abas = set(backend.worksheets())
+    shards = [_shard_name(y) for y in _years_in(abas)]
+    touched = set(_append_transacoes(backend, diff["inserted"]))
+    abas.update(touched)
+    for shard, part in _split_by_year(diff["updated"]).items():
+        present = backend.existing_ids(shard, part["Id"]) if shard in abas else set()
+        in_place = _norm_ids(part["Id"]).isin(present).values
+        if in_place.any() and backend.update_by_id(shard, part[in_place]):
+            touched.add(shard)
+        moved = part[~in_place]
+        if moved.empty:
+            continue
+        sources = [ws for ws in ("Transacoes", *shards) if ws in abas and ws != shard]
+        for source in sources:
+            if backend.delete_by_id(source, moved["Id"]):
+                touched.add(source)
+        touched.update(_append_transacoes(backend, moved))
+    for shard, part in _split_by_year(diff["deleted"]).items():
+        n = backend.delete_by_id(shard, part["Id"]) if shard in abas else 0
+        if n:
+            touched.add(shard)
+        if n < len(part) and "Transacoes" in abas and backend.delete_by_id("Transacoes", part["Id"]):
+            touched.add("Transacoes")
+    return sorted(touched)
+
+
+def migrate_transacoes_to_shards() -> int | None:
+    """Move as linhas da aba legada "Transacoes" para as abas anuais.
+
+    Idempotente: linha sem Id ganha um gravado na própria aba legada
+    (CAS) antes da cópia, então uma nova execução reconhece o que já foi
+    copiado; Ids já presentes nas abas anuais são pulados. A aba legada
+    só é esvaziada (mantendo o cabeçalho) se ninguém a alterou durante a
+    cópia. Retorna quantas linhas migraram; None em falha ou conflito.
+    """
+    backend = get_backend()
+    try:
+        df = backend.read("Transacoes")
+        if df.empty:
+            return 0
+        rev = df.attrs.get("rev", 0)
+        abas = set(backend.worksheets())
+        # A cópia precisa de chave estável: Ids novos vão para a aba legada antes
+        ids = _norm_ids(df["Id"]) if "Id" in df.columns else pd.Series("", index=df.index)
+        if not ids.all():
+            df = df.assign(Id=[i or generate_id() for i in ids])
+            if not backend.replace_if("Transacoes", df, rev):
+                logger.warning("migrate_transacoes_to_shards: aba legada alterada antes da cópia")
+                return None
+            rev = backend.revision("Transacoes", fresh=True)
+        for shard, part in _split_by_year(_with_transacao_cols(df)).items():
+            done = backend.existing_ids(shard, part["Id"]) if shard in abas else set()
+            part = part[~_norm_ids(part["Id"]).isin(done).values]
+            if not part.empty:
+                _commit_rows(backend, shard, part)
+        if not backend.replace_if("Transacoes", df.iloc[0:0], rev):
+            logger.warning("migrate_transacoes_to_shards: aba legada alterada durante a cópia")
+            return None
+    except Exception as e:
+        logger.error(f"migrate_transacoes_to_shards failed: {e}")
+        return None
+    finally:
+        invalidate_cache("Transacoes")
+    logger.info(f"migrate_transacoes_to_shards OK: {len(df)} linhas")
+    _log_audit("MIGRATE", "Transacoes", f"{len(df)} linhas para abas anuais")
+    return len(df)
+
+
+class _WriteAheadLog:
+    """Fila durável de appends pendentes, reenviados em background.
+
+    Cada mutação vira um arquivo JSON em PENDING_DIR (gravação atômica)
+    antes de qualquer chamada de rede; o script segue na hora. Só a thread
+    daemon fala com o backend: reenvia em ordem (FIFO por worksheet) com
+    backoff exponencial e jitter, e só apaga o arquivo depois da
+    confirmação. Linhas com Id não duplicam se uma resposta se perder; as
+    demais têm entrega at-least-once (ver _unsent). Após WAL_MAX_FAILURES falhas que não
+    são de disponibilidade, a entrada vai para PENDING_DIR/dead. Entrada
+    de "Transacoes" é um lote só: o replay grava cada aba anual e só
+    confirma quando todas entraram.
+    """
+
+    def __init__(self, backend: StorageBackend) -> None:
+        self._backend = backend
+        self._dir = Path(__file__).parent / CFG.PENDING_DIR
+        self._dir.mkdir(exist_ok=True)
+        self._dead_dir = self._dir / "dead"
+        self._lock = threading.Lock()
+        self._settled = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._entries: dict[str, dict] = {}
+        self._buried: set[str] = set()
+        for path in sorted(self._dir.glob("*.json")):
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+                self._entries[entry["id"]] = entry
+            except Exception as e:
+                logger.error(f"WAL: entrada ilegível {path.name}: {e}")
+        if self._entries:
+            logger.info(f"WAL: {len(self._entries)} mutações pendentes recuperadas")
+        self._thread = threading.Thread(target=self._run, name="wal-replay", daemon=True)
+        self._thread.start()
+
+    def _path(self, entry_id: str) -> Path:
+        return self._dir / f"{entry_id}.json"
+
+    def _persist(self, entry: dict) -> None:
+        path = self._path(entry["id"])
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+
+    def enqueue(self, worksheet: str, df_rows: pd.DataFrame, audit: dict | None = None) -> str:
+        """Grava a mutação em disco e acorda o replay. Retorna o id da entrada.
+
+        audit (argumentos de _log_audit) é registrado só após a confirmação.
+        """
+        df_out = _serialize_for_sheet(df_rows)
+        rows = [{k: _cell_value(v) for k, v in rec.items()} for rec in df_out.to_dict("records")]
+        now = time.time()
+        entry = {
+            "id": f"{now:017.6f}-{uuid.uuid4().hex[:8]}",
+            "worksheet": worksheet,
+            "rows": rows,
+            "created": now,
+            "attempts": 0,
+            "next_try": now,
+            "last_error": "",
+        }
+        if audit is not None:
+            entry["audit"] = audit
+        self._persist(entry)
+        with self._lock:
+            self._entries[entry["id"]] = entry
+        self._wake.set()
+        return entry["id"]
+
+    def pending(self, worksheet: str | None = None) -> list[dict]:
+        """Entradas pendentes (em ordem); "Transacoes" inclui as abas anuais."""
+        with self._lock:
+            return self._pending_locked(worksheet)
+
+    def _pending_locked(self, worksheet: str | None) -> list[dict]:
+        entries = sorted(self._entries.values(), key=lambda e: e["id"])
+        return [
+            e for e in entries
+            if worksheet is None or worksheet in (e["worksheet"], _logical_sheet(e["worksheet"]))
+        ]
+
+    def stats(self) -> dict:
+        entries = self.pending()
+        return {
+            "pending": len(entries),
+            "rows": sum(len(e["rows"]) for e in entries),
+            "max_attempts": max((e["attempts"] for e in entries), default=0),
+            "last_error": next((e["last_error"] for e in reversed(entries) if e["last_error"]), ""),
+        }
+
+    def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            now = time.time()
+            blocked: set[str] = set()
+            next_due = now + 30.0
+            for entry in self.pending():
+                ws = entry["worksheet"]
+                if ws in blocked:
+                    continue
+                if entry["next_try"] > now:
+                    blocked.add(ws)  # mantém a ordem dentro da worksheet
+                    next_due = min(next_due, entry["next_try"])
+                    continue
+                if not self._replay(entry):
+                    blocked.add(ws)
+                    next_due = min(next_due, entry["next_try"])
+            self._wake.wait(timeout=max(0.1, next_due - time.time()))
+
+    def drain(self, worksheet: str, timeout: float = CFG.WAL_DRAIN_WAIT) -> bool:
+        """Antecipa o replay do que estiver pendente na worksheet e espera.
+
+        Usado antes de reescritas completas: sem isso, a reescrita gravaria
+        as linhas provisórias e o replay as anexaria de novo. O envio é da
+        thread de replay; o script só espera até timeout. False se ainda
+        houver pendência.
+        """
+        with self._lock:
+            for entry in self._pending_locked(worksheet):
+                entry["next_try"] = min(entry["next_try"], time.time())
+        self._wake.set()
+        with self._settled:
+            return self._settled.wait_for(lambda: not self._pending_locked(worksheet), timeout)
+
+    def wait(self, entry_id: str, timeout: float = CFG.WAL_DRAIN_WAIT) -> bool | None:
+        """Espera a confirmação da entrada: True gravada, False descartada
+        (dead), None ainda pendente após timeout."""
+        with self._settled:
+            self._settled.wait_for(lambda: entry_id not in self._entries, timeout)
+            if entry_id in self._entries:
+                return None
+            return entry_id not in self._buried
+
+    def _replay(self, entry: dict) -> bool:
+        ws = entry["worksheet"]
+        df_rows = pd.DataFrame(entry["rows"])
+        # Lote de transações: uma escrita por aba anual, cada uma idempotente
+        parts = _split_by_year(_with_transacao_cols(df_rows)) if ws == "Transacoes" else {ws: df_rows}
+        try:
+            for target, part in parts.items():
+                part = self._unsent(entry, target, part)
+                if not part.empty:
+                    self._backend.append(target, part)
+        except Exception as e:
+            entry["attempts"] += 1
+            if not (_is_outage(e) or isinstance(e, TimeoutError)):
+                entry["failures"] = entry.get("failures", 0) + 1
+            entry["last_error"] = str(e)[:200]
+            logger.warning(f"WAL replay failed [{ws}] (tentativa {entry['attempts']}): {e}")
+            if entry.get("failures", 0) >= CFG.WAL_MAX_FAILURES:
+                self._bury(entry)
+                return False
+            delay = min(CFG.WAL_BACKOFF_MAX, CFG.WAL_BACKOFF_BASE ** entry["attempts"])
+            entry["next_try"] = time.time() + delay * random.uniform(0.5, 1.5)
+            try:
+                self._persist(entry)
+            except Exception as pe:
+                logger.error(f"WAL: falha ao persistir tentativa [{ws}]: {pe}")
+            return False
+        self._path(entry["id"]).unlink(missing_ok=True)
+        invalidate_cache(ws, *parts)
+        logger.info(f"WAL replay OK [{ws}]: {len(entry['rows'])} registros")
+        if "audit" in entry:
+            _log_audit(**entry["audit"])
+        # Por último: quem espera a entrada (drain/wait) já encontra o cache invalidado
+        self._forget(entry)
+        return True
+
+    def _unsent(self, entry: dict, ws: str, df_rows: pd.DataFrame) -> pd.DataFrame:
+        """Linhas da entrada que ainda não estão na planilha.
+
+        A chave de idempotência é o Id. Abas sem coluna Id (Patrimonio,
+        Recorrentes, Orcamentos, Passivos) têm entrega at-least-once: uma
+        resposta perdida pode duplicar a linha — conferir exigiria ler a
+        aba inteira a cada envio, e contagem de cópias não distingue a
+        nossa linha de uma igual gravada por outro usuário.
+        """
+        if not entry["attempts"] or "Id" not in df_rows.columns:
+            return df_rows
+        done = self._backend.existing_ids(ws, df_rows["Id"])
+        return df_rows[~_norm_ids(df_rows["Id"]).isin(done).values]
+
+    def _forget(self, entry: dict) -> None:
+        with self._settled:
+            self._entries.pop(entry["id"], None)
+            self._settled.notify_all()
+
+    def _bury(self, entry: dict) -> None:
+        """Move a entrada para PENDING_DIR/dead: sai da fila, fica para inspeção."""
+        ws = entry["worksheet"]
+        try:
+            self._dead_dir.mkdir(exist_ok=True)
+            self._persist(entry)
+            self._path(entry["id"]).replace(self._dead_dir / f"{entry['id']}.json")
+        except Exception as e:
+            logger.error(f"WAL: falha ao mover entrada para dead [{ws}]: {e}")
+            return
+        self._buried.add(entry["id"])
+        self._forget(entry)
+        logger.error(
+            f"WAL: entrada descartada após {entry['failures']} falhas [{ws}]: "
+            f"{len(entry['rows'])} registros em {self._dead_dir.name}/{entry['id']}.json"
+        )
+
+
+@st.cache_resource(show_spinner=False)
+def _get_wal() -> _WriteAheadLog:
+    """Write-ahead log único por processo."""
+    return _WriteAheadLog(get_backend())
+
+
+def wal_stats() -> dict:
+    """Resumo das mutações ainda não confirmadas pelo backend."""
+    return _get_wal().stats()
+
+
+def with_pending(df: pd.DataFrame, worksheet: str, entries: list[dict] | None = None) -> pd.DataFrame:
+    """Anexa ao frame as linhas ainda pendentes no WAL (provisórias).
+
+    As linhas são convertidas para os dtypes do frame carregado; as já
+    confirmadas (Id presente) são ignoradas. entries fixa as entradas
+    (padrão: as pendentes agora).
+    """
+    if entries is None:
+        entries = _get_wal().pending(worksheet)
+    if not entries:
+        return df
+    df_pend = pd.DataFrame([row for e in entries for row in e["rows"]]).reindex(columns=df.columns)
+    if "Id" in df.columns and not df.empty:
+        df_pend = df_pend[~_norm_ids(df_pend["Id"]).isin(set(_norm_ids(df["Id"]))).values]
+    if df_pend.empty:
+        return df
+    for col in df.columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            df_pend[col] = df_pend[col].apply(_parse_ativo)
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            df_pend[col] = pd.to_datetime(df_pend[col], errors="coerce")
+        elif pd.api.types.is_numeric_dtype(dtype):
+            df_pend[col] = pd.to_numeric(df_pend[col], errors="coerce").fillna(0)
+        else:
+            df_pend[col] = df_pend[col].fillna("").astype(str).str.strip()
+    merged = pd.concat([df, df_pend], ignore_index=True)
+    merged.attrs = df.attrs
+    return merged
+
+
+def _enqueue_rows(worksheet: str, df_rows: pd.DataFrame, audit: dict | None = None) -> str:
+    """Registra appends no WAL; a gravação real acontece em background.
+
+    Transações viram uma entrada só, distribuída pelas abas anuais no
+    replay. Retorna o id da entrada.
+    """
+    if worksheet == "Transacoes":
+        df_rows = _with_transacao_cols(df_rows)
+    return _get_wal().enqueue(worksheet, df_rows, audit)
+
+
 def save_entry(data: dict, worksheet: str, *, skip_audit: bool = False, skip_rate_limit: bool = False) -> bool:
-    """Salva uma nova entrada na planilha com retry e rate limit."""
+    """Salva uma nova entrada na planilha com rate limit.
+
+    A linha vai para o WAL local e é anexada em background; até a
+    confirmação aparece como provisória (with_pending).
+    """
     if not skip_rate_limit and not _check_rate_limit(f"save_{worksheet}"):
         st.toast("⚠ Aguarde antes de salvar novamente")
         return False
     if worksheet == "Transacoes" and "Id" not in data:
         data["Id"] = generate_id()
-    conn = get_conn()
-    for attempt in range(CFG.SAVE_RETRIES):
-        try:
-            try:
-                df_curr = conn.read(worksheet=worksheet)
-                df_curr = df_curr.dropna(how="all")
-            except Exception:
-                df_curr = pd.DataFrame()
-            df_new = pd.DataFrame([data])
-            df_updated = pd.concat([df_curr, df_new], ignore_index=True)
-            df_updated = _serialize_for_sheet(df_updated)
-            conn.update(worksheet=worksheet, data=df_updated)
-            st.cache_data.clear()
-            logger.info(f"save_entry OK [{worksheet}]")
-            if not skip_audit:
-                _log_audit("CREATE", worksheet, f"{data.get('Descricao', data.get('Item', data.get('Chave', '')))}")
-            return True
-        except Exception as e:
-            if attempt == CFG.SAVE_RETRIES - 1:
-                logger.error(f"save_entry failed [{worksheet}]: {e}")
-                st.error(f"Falha ao salvar após {CFG.SAVE_RETRIES} tentativas: {e}")
-                st.cache_data.clear()
-                return False
-            time.sleep(0.5 * (attempt + 1))
-    return False
+    try:
+        _enqueue_rows(worksheet, pd.DataFrame([data]))
+    except Exception as e:
+        logger.error(f"save_entry failed [{worksheet}]: {e}")
+        st.error(f"Falha ao salvar: {e}")
+        return False
+    logger.info(f"save_entry OK [{worksheet}] (pendente de sincronização)")
+    if not skip_audit:
+        _log_audit("CREATE", worksheet, f"{data.get('Descricao', data.get('Item', data.get('Chave', '')))}")
+    return True
+
+
+_VALIDATORS: dict = {
+    "Transacoes": validate_transaction,
+    "Patrimonio": validate_asset,
+    "Recorrentes": validate_recorrente,
+    "Orcamentos": validate_orcamento,
+    "Passivos": validate_passivo,
+}
 
 
-def update_sheet(df_edited: pd.DataFrame, worksheet: str) -> bool:
-    """Atualiza planilha inteira com DataFrame editado (com retry e rate limit)."""
+def save_entries(
+    entries: list[dict],
+    worksheet: str,
+    *,
+    skip_audit: bool = False,
+    skip_rate_limit: bool = False,
+) -> BatchResult:
+    """Salva várias entradas em uma única escrita (append em lote).
+
+    Valida todas antes, enfileira as válidas numa única entrada do WAL
+    (um append em background) e devolve relatório por linha.
+    """
+    result = BatchResult()
+    if not entries:
+        return result
+    if not skip_rate_limit and not _check_rate_limit(f"save_{worksheet}"):
+        st.toast("⚠ Aguarde antes de salvar novamente")
+        return result
+
+    validator = _VALIDATORS.get(worksheet)
+    valid: list[dict] = []
+    for i, entry in enumerate(entries):
+        if worksheet == "Transacoes" and "Id" not in entry:
+            entry["Id"] = generate_id()
+        ok, err = validator(entry) if validator else (True, "")
+        result.report.append({"linha": i + 1, "ok": ok, "erro": err, "entry": entry})
+        if ok:
+            valid.append(entry)
+
+    if not valid:
+        return result
+
+    try:
+        _enqueue_rows(worksheet, pd.DataFrame(valid))
+        result.written = True
+    except Exception as e:
+        logger.error(f"save_entries failed [{worksheet}]: {e}")
+        for r in result.report:
+            if r["ok"]:
+                r["ok"], r["erro"] = False, f"Falha ao gravar: {e}"
+
+    if result.written:
+        logger.info(f"save_entries OK [{worksheet}]: {len(valid)} registros")
+        if not skip_audit:
+            _log_audit("BATCH_CREATE", worksheet, f"{len(valid)} registros")
+    return result
+
+
+def _fresh_frame(worksheet: str) -> pd.DataFrame:
+    """Relê a worksheet pelo loader (mesma normalização do frame em tela)."""
+    invalidate_cache(worksheet)
+    loaders = _CACHE_REGISTRY.get(worksheet)
+    return loaders[0]() if loaders else get_backend().read(worksheet)
+
+
+def update_sheet(df_edited: pd.DataFrame, worksheet: str, df_base: pd.DataFrame | None = None) -> bool:
+    """Atualiza planilha inteira com DataFrame editado (com retry e rate limit).
+
+    Com df_base (o frame em que a edição se baseou), a gravação é
+    compare-and-swap pela revisão; em conflito, as mudanças são mescladas
+    sobre a versão atual (merge_three_way) e a gravação é repetida. Frame
+    sem revisão (leitura que falhou) aborta: com CAS nunca há reescrita
+    incondicional.
+    """
     if not _check_rate_limit(f"update_{worksheet}"):
         st.toast("⚠ Aguarde antes de salvar novamente")
         return False
-    conn = get_conn()
+    if not _get_wal().drain(worksheet):
+        st.error("Há lançamentos pendentes de sincronização nesta planilha — tente novamente em instantes")
+        return False
+    backend = get_backend()
+    expected = df_base.attrs.get("rev") if df_base is not None else None
+    if df_base is not None and expected is None:
+        logger.error(f"update_sheet [{worksheet}]: frame base sem revisão — gravação abortada")
+        st.error("Não foi possível confirmar a versão da planilha — recarregue e tente de novo")
+        return False
+    df_to_save = df_edited
     for attempt in range(CFG.SAVE_RETRIES):
         try:
-            df_to_save = _serialize_for_sheet(df_edited)
-            conn.update(worksheet=worksheet, data=df_to_save)
-            st.cache_data.clear()
-            logger.info(f"update_sheet OK [{worksheet}]: {len(df_edited)} rows")
-            _log_audit("UPDATE", worksheet, f"{len(df_edited)} registros")
+            if expected is None:
+                backend.replace(worksheet, df_to_save)
+            elif not backend.replace_if(worksheet, df_to_save, expected):
+                # Outro usuário gravou desde a leitura — mescla e tenta de novo
+                df_theirs = _fresh_frame(worksheet)
+                if "rev" not in df_theirs.attrs or "header" not in df_theirs.attrs:
+                    # Releitura falhou: mesclar com vazio apagaria a planilha
+                    logger.error(f"update_sheet conflict [{worksheet}]: releitura falhou — gravação abortada")
+                    st.error("Planilha alterada por outro usuário e não foi possível relê-la — tente de novo")
+                    return False
+                df_to_save = merge_three_way(df_base, df_edited, df_theirs)
+                expected = df_theirs.attrs.get("rev")
+                logger.info(f"update_sheet conflict [{worksheet}]: mesclado (tentativa {attempt + 1})")
+                st.toast("⟳ Alterações de outro usuário foram mescladas")
+                continue
+            invalidate_cache(worksheet)
+            logger.info(f"update_sheet OK [{worksheet}]: {len(df_to_save)} rows")
+            _log_audit("UPDATE", worksheet, f"{len(df_to_save)} registros")
             return True
         except Exception as e:
             if attempt == CFG.SAVE_RETRIES - 1:
                 logger.error(f"update_sheet failed [{worksheet}]: {e}")
                 st.error(f"Erro ao atualizar após {CFG.SAVE_RETRIES} tentativas: {e}")
-                st.cache_data.clear()
+                invalidate_cache(worksheet)
                 return False
             time.sleep(0.5 * (attempt + 1))
+    logger.error(f"update_sheet conflict [{worksheet}]: {CFG.SAVE_RETRIES} conflitos seguidos")
+    st.error("Planilha alterada por outro usuário durante a gravação — recarregue e tente de novo")
+    invalidate_cache(worksheet)
     return False
 
-def validate_worksheets() -> None:
+
+def _cas_update(worksheet: str, modify, empty: pd.DataFrame) -> None:
+    """Read-modify-write com compare-and-swap e releitura em conflito.
+
+    `modify` recebe o frame atual e devolve o novo; `empty` é usado só
+    quando a worksheet ainda não existe. Qualquer outra falha de leitura
+    propaga — reescrever a partir dela apagaria a aba. Propaga
+    RuntimeError se os conflitos persistirem após SAVE_RETRIES tentativas.
+    """
+    backend = get_backend()
+    for _ in range(CFG.SAVE_RETRIES):
+        try:
+            df_curr = backend.read(worksheet)
+        except WorksheetNotFound:
+            df_curr = empty
+        expected = df_curr.attrs.get("rev")
+        df_new = modify(df_curr)
+        if expected is None:
+            backend.replace(worksheet, df_new)
+            return
+        if backend.replace_if(worksheet, df_new, expected):
+            return
+    raise RuntimeError(f"conflito de escrita persistente em {worksheet}")
+
+
+def _canonical_rows(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
+    """Forma comparável das linhas: como seriam gravadas, tudo em texto.
+
+    Números viram float em texto ("10" e 10.0 comparam iguais).
+    """
+    df_out = _serialize_for_sheet(df.reindex(columns=cols)).astype(object)
+    df_out = df_out.where(df_out.notna(), "").astype(str).apply(lambda c: c.str.strip())
+    num = df_out.apply(pd.to_numeric, errors="coerce").astype(float)
+    return df_out.where(num.isna(), num.astype(str))
+
+
+def diff_rows(df_before: pd.DataFrame, df_after: pd.DataFrame, cols: list[str]) -> dict[str, pd.DataFrame]:
+    """Diff por Id entre dois recortes da mesma worksheet.
+
+    Retorna {"inserted", "updated", "deleted"}. Linhas sem Id (criadas no
+    editor) recebem um Id novo e entram como inseridas.
+    """
+    before = df_before.reindex(columns=cols).reset_index(drop=True)
+    after = df_after.reindex(columns=cols).reset_index(drop=True)
+    ids_before = _norm_ids(before["Id"])
+    ids_after = _norm_ids(after["Id"])
+
+    is_new = (ids_after == "") | ~ids_after.isin(set(ids_before))
+    inserted = after[is_new].copy()
+    blank = _norm_ids(inserted["Id"]) == ""
+    if blank.any():
+        inserted.loc[blank.values, "Id"] = [generate_id() for _ in range(int(blank.sum()))]
+
+    deleted = before[~ids_before.isin(set(ids_after))]
+
+    common_after = after[~is_new].assign(Id=ids_after[~is_new])
+    common_before = before.assign(Id=ids_before).drop_duplicates("Id").set_index("Id")
+    common_before = common_before.reindex(common_after["Id"]).reset_index()
+    changed = (
+        _canonical_rows(common_after.reset_index(drop=True), cols)
+        != _canonical_rows(common_before, cols)
+    ).any(axis=1)
+    updated = common_after[changed.values]
+    return {"inserted": inserted, "updated": updated, "deleted": deleted}
+
+
+def merge_three_way(df_base: pd.DataFrame, df_ours: pd.DataFrame, df_theirs: pd.DataFrame) -> pd.DataFrame:
+    """Reaplica nossas mudanças (base → ours) sobre a versão atual (theirs).
+
+    Com coluna Id: inserções, edições e remoções por Id (em conflito na
+    mesma linha, a nossa versão vence). Sem Id: multiconjunto de linhas —
+    removemos de theirs o que removemos da base e anexamos o que criamos.
+    """
+    cols = list(dict.fromkeys([*df_theirs.columns, *df_ours.columns]))
+    theirs = df_theirs.reindex(columns=cols).reset_index(drop=True)
+
+    if all("Id" in df.columns for df in (df_base, df_ours, df_theirs)):
+        diff = diff_rows(df_base, df_ours, cols)
+        ids = _norm_ids(theirs["Id"])
+        theirs = theirs[~ids.isin(set(_norm_ids(diff["deleted"]["Id"])))]
+        upd = diff["updated"].assign(Id=_norm_ids(diff["updated"]["Id"]).values).set_index("Id")
+        keys = _norm_ids(theirs["Id"]).values
+        hit = pd.Series(keys).isin(upd.index).values
+        if hit.any():
+            theirs = theirs.astype(object)
+            theirs.loc[hit, cols] = upd.reindex(keys[hit]).reset_index()[cols].values
+        merged = pd.concat([theirs, diff["inserted"]], ignore_index=True)
+        return merged.reset_index(drop=True)
+
+    def _keys(df: pd.DataFrame) -> pd.Series:
+        return _canonical_rows(df, cols).agg("\x1f".join, axis=1).reset_index(drop=True)
+
+    k_base, k_ours, k_theirs = _keys(df_base), _keys(df_ours), _keys(df_theirs)
+    n_base, n_ours = k_base.value_counts(), k_ours.value_counts()
+    n_removed = (n_base - n_ours.reindex(n_base.index, fill_value=0)).clip(lower=0)
+    # n-ésima ocorrência de cada linha: remove/adiciona só o excedente
+    occ_theirs = k_theirs.groupby(k_theirs).cumcount()
+    occ_ours = k_ours.groupby(k_ours).cumcount()
+    drop = (occ_theirs < k_theirs.map(n_removed).fillna(0)).values
+    added = (occ_ours >= k_ours.map(n_base).fillna(0)).values
+    ours_added = df_ours.reindex(columns=cols).reset_index(drop=True)[added]
+    return pd.concat([theirs[~drop], ours_added], ignore_index=True)
+
+
+def apply_row_diff(worksheet: str, diff: dict[str, pd.DataFrame]) -> bool:
+    """Envia só as mutações do diff ao backend (append/update/delete por Id)."""
+    n_ins, n_upd, n_del = (len(diff[k]) for k in ("inserted", "updated", "deleted"))
+    if not (n_ins or n_upd or n_del):
+        return True
+    if not _check_rate_limit(f"update_{worksheet}"):
+        st.toast("⚠ Aguarde antes de salvar novamente")
+        return False
+    if not _get_wal().drain(worksheet):
+        # Linhas provisórias editadas ainda não existem no backend
+        st.error("Há lançamentos pendentes de sincronização nesta planilha — tente novamente em instantes")
+        return False
+    backend = get_backend()
+    touched = [worksheet]
+    try:
+        if worksheet == "Transacoes":
+            touched = _write_transacoes_diff(backend, diff)
+        else:
+            if n_ins:
+                _commit_rows(backend, worksheet, diff["inserted"])
+            if n_upd:
+                backend.update_by_id(worksheet, diff["updated"])
+            if n_del:
+                backend.delete_by_id(worksheet, diff["deleted"]["Id"])
+    except Exception as e:
+        logger.error(f"apply_row_diff failed [{worksheet}]: {e}")
+        st.error(f"Erro ao salvar alterações: {e}")
+        invalidate_cache(worksheet)
+        return False
+    invalidate_cache(*touched)
+    logger.info(f"apply_row_diff OK [{worksheet}]: +{n_ins} ~{n_upd} -{n_del}")
+    _log_audit("PATCH", worksheet, f"+{n_ins} ~{n_upd} -{n_del}")
+    return True
+
+
+def validate_worksheets(data: DataBundle) -> None:
     """Valida integridade das worksheets no boot (S4 + T5).
 
     Verifica se todas as worksheets existem e têm as colunas esperadas.
+    Usa o cabeçalho original registrado pelos loaders (sem nova leitura);
+    só o AuditLog, que não tem loader, é sondado pela linha de cabeçalho.
     Executa apenas uma vez por sessão.
     """
     if st.session_state.get("_ws_validated", False):
         return
-    conn = get_conn()
     worksheets = {
-        "Transacoes": list(CFG.COLS_TRANSACAO),
-        "Patrimonio": list(CFG.COLS_PATRIMONIO),
-        "Recorrentes": list(CFG.COLS_RECORRENTE),
-        "Orcamentos": list(CFG.COLS_ORCAMENTO),
-        "Configuracoes": list(CFG.COLS_CONFIG),
-        "AuditLog": list(CFG.COLS_AUDIT),
-        "Metas": list(CFG.COLS_METAS),
-        "Passivos": list(CFG.COLS_PASSIVOS),
-        "Lixeira": list(CFG.COLS_LIXEIRA),
+        "Transacoes": (data.transacoes, list(CFG.COLS_TRANSACAO)),
+        "Patrimonio": (data.patrimonio, list(CFG.COLS_PATRIMONIO)),
+        "Recorrentes": (data.recorrentes, list(CFG.COLS_RECORRENTE)),
+        "Orcamentos": (data.orcamentos, list(CFG.COLS_ORCAMENTO)),
+        "Configuracoes": (data.config, list(CFG.COLS_CONFIG)),
+        "AuditLog": (None, list(CFG.COLS_AUDIT)),
+        "Metas": (data.metas, list(CFG.COLS_METAS)),
+        "Passivos": (data.passivos, list(CFG.COLS_PASSIVOS)),
+        "Lixeira": (data.lixeira, list(CFG.COLS_LIXEIRA)),
     }
     issues: list[str] = []
-    for ws_name, expected_cols in worksheets.items():
-        try:
-            df = conn.read(worksheet=ws_name)
-            if df is not None and not df.empty:
-                missing = set(expected_cols) - set(df.columns)
-                if missing:
-                    issues.append(
-                        f"{ws_name}: colunas faltando — {', '.join(sorted(missing))}"
-                    )
-        except Exception as e:
+    for ws_name, (df, expected_cols) in worksheets.items():
+        if df is None:
+            try:
+                header = get_backend().headers(ws_name)
+            except Exception as e:
+                logger.warning(f"[Integridade] {ws_name}: {e}")
+                header = None
+        else:
+            header = df.attrs.get("header")
+        if header is None:
             issues.append(f"{ws_name}: não encontrada ou inacessível")
-            logger.warning(f"[Integridade] {ws_name}: {e}")
+            continue
+        if header:
+            missing = set(expected_cols) - set(header)
+            if missing:
+                issues.append(
+                    f"{ws_name}: colunas faltando — {', '.join(sorted(missing))}"
+                )
     if issues:
         for issue in issues:
             logger.warning(f"[Integridade] {issue}")
@@ -935,11 +3339,44 @@ def validate_worksheets() -> None:
 # 7. MOTOR ANALÍTICO
 # ==============================================================================
 
+@st.cache_resource(show_spinner=False)
+def _get_partition_memo() -> dict:
+    """Partições por responsável já montadas, por versão dos dados."""
+    return {}
+
+
+def _user_partition(df: pd.DataFrame, versao: str, user_filter: str, include_shared: bool) -> pd.DataFrame:
+    """Partição de um frame versionado (ver _versao), montada uma vez.
+
+    A partição recebe versão própria (derivada da do frame), para que
+    cubo e partições não confundam frames diferentes da mesma carga.
+    """
+    if user_filter == "Casal":
+        return df
+    key = (versao, user_filter, include_shared)
+    memo = _get_partition_memo()
+    part = memo.get(key)
+    if part is None:
+        resp = df["Responsavel"]
+        mask = resp.isin([user_filter, "Casal"]) if include_shared else resp == user_filter
+        part = df[mask]
+        part.attrs = {**df.attrs, "versao": f"{versao}/{user_filter}{'+' if include_shared else ''}"}
+        _memo_put(memo, key, part, cap=32)
+    return part
+
+
 def filter_by_user(df: pd.DataFrame, user_filter: str, include_shared: bool = False) -> pd.DataFrame:
     """Filtra DataFrame por responsável.
 
     include_shared=True inclui registros 'Casal' junto com o usuário individual.
+    Em frames versionados (transações carregadas) devolve uma cópia rasa
+    da partição já montada para a versão: trate o resultado como somente
+    leitura — colunas novas não vazam, alterações no lugar sim.
     """
+    versao = _versao(df)
+    if versao is not None and "Responsavel" in df.columns:
+        part = _user_partition(df, versao, user_filter, include_shared)
+        return _stamp(part.copy(deep=False), part.attrs["versao"])
     if user_filter != "Casal" and "Responsavel" in df.columns:
         if include_shared:
             return df[df["Responsavel"].isin([user_filter, "Casal"])].copy()
@@ -947,10 +3384,123 @@ def filter_by_user(df: pd.DataFrame, user_filter: str, include_shared: bool = Fa
     return df.copy()
 
 
+def _sum_brl(df: pd.DataFrame) -> float:
+    """Soma exata (em centavos) de Valor de um frame canônico, em reais."""
+    return cents_to_brl(df["cents"].sum())
+
+
+def _sum_brl_by(df: pd.DataFrame, by) -> pd.Series:
+    """Soma exata de Valor por grupo, em reais."""
+    return df.groupby(by, observed=True)["cents"].sum() / 100
+
+
+@st.cache_resource(show_spinner=False)
+def _get_cube_memo() -> dict:
+    """Cubos mensais já montados, por versão dos dados."""
+    return {}
+
+
+def transaction_cube(df_trans: pd.DataFrame) -> pd.DataFrame:
+    """Cubo mensal: centavos e nº de transações por Responsavel × period × Categoria × Tipo.
+
+    Montado uma vez por versão dos dados (ver _versao; posta por
+    load_transacoes/load_all) e compartilhado pelas análises de tendência,
+    que passam a custar O(meses × categorias). Frames derivados montam um
+    cubo próprio, sem cache.
+    """
+    df = _typed(df_trans)
+    versao = _versao(df)
+    memo = _get_cube_memo()
+    hit = memo.get(versao) if versao is not None else None
+    if hit is not None:
+        return hit
+
+    cube = (
+        df.groupby(["Responsavel", "period", "Categoria", "Tipo"], observed=True)["cents"]
+        .agg(cents="sum", n="size")
+        .reset_index()
+    )
+    cube = cube.assign(**_classify(cube["Tipo"], cube["Categoria"]))
+    cube.attrs = {}  # o cubo não é um frame de transações versionado
+    if versao is not None:
+        _memo_put(memo, versao, cube, cap=8)
+    return cube
+
+
+def _user_cube(df_trans: pd.DataFrame, user_filter: str) -> pd.DataFrame:
+    """Fatia do cubo do usuário (mesma regra de filter_by_user)."""
+    return filter_by_user(transaction_cube(df_trans), user_filter)
+
+
+def _cube_totals(cube: pd.DataFrame) -> pd.DataFrame:
+    """Totais mensais do cubo, em centavos: renda, gastos, investido e n."""
+    cents = cube["cents"]
+    return pd.DataFrame({
+        "renda": cents.where(cube["is_income"], 0),
+        "gastos": cents.where(cube["is_expense"], 0),
+        "investido": cents.where(cube["is_investment"], 0),
+        "n": cube["n"],
+    }).groupby(cube["period"]).sum()
+
+
+def investment_ledger(df_trans: pd.DataFrame, user_filter: str) -> pd.Series:
+    """Aportes acumulados (centavos) por mês, do primeiro ao último aporte.
+
+    Série mensal contínua derivada do cubo: o acumulado até o fim de
+    qualquer mês é uma consulta O(1) (_ledger_at), seja qual for a janela.
+    """
+    cube = _user_cube(df_trans, user_filter)
+    aportes = cube[cube["is_investment"]].groupby("period")["cents"].sum()
+    if aportes.empty:
+        return aportes
+    meses = pd.period_range(aportes.index.min(), aportes.index.max(), freq="M")
+    return aportes.reindex(meses, fill_value=0).cumsum()
+
+
+def _ledger_at(ledger: pd.Series, period: pd.Period) -> int:
+    """Aportes acumulados (centavos) até o fim de period."""
+    if ledger.empty or period < ledger.index[0]:
+        return 0
+    if period >= ledger.index[-1]:
+        return int(ledger.iloc[-1])
+    return int(ledger.iloc[(period - ledger.index[0]).n])
+
+
+def _month_window(ref_month: int, ref_year: int, months_back: int) -> tuple[pd.Period, pd.Period]:
+    """(primeiro, último) período de uma janela de months_back meses até a referência."""
+    end = pd.Period(year=ref_year, month=ref_month, freq="M")
+    return end - (months_back - 1), end
+
+
+def _date_sorted(df: pd.DataFrame) -> bool:
+    """Frame com índice = Data em ordem crescente (frame canônico)."""
+    return isinstance(df.index, pd.DatetimeIndex) and df.index.is_monotonic_increasing
+
+
+def filter_by_dates(df: pd.DataFrame, start, end) -> pd.DataFrame:
+    """Filtra start <= Data <= end.
+
+    No frame canônico é uma fatia O(log n) (searchsorted no índice) que
+    não copia os dados — quem precisar alterar o resultado deve copiá-lo.
+    """
+    if df.empty:
+        return df
+    if _date_sorted(df):
+        idx = df.index
+        return df.iloc[idx.searchsorted(start, side="left"):idx.searchsorted(end, side="right")]
+    return df[(df["Data"] >= start) & (df["Data"] <= end)]
+
+
 def filter_by_month(df: pd.DataFrame, month: int, year: int) -> pd.DataFrame:
-    """Filtra DataFrame por mês/ano."""
+    """Filtra DataFrame por mês/ano (fatia sem cópia no frame canônico)."""
     if df.empty:
         return df
+    if _date_sorted(df):
+        start = pd.Timestamp(year, month, 1)
+        idx = df.index
+        return df.iloc[idx.searchsorted(start):idx.searchsorted(start + pd.offsets.MonthBegin())]
+    if "month" in df.columns:
+        return df[(df["month"] == month) & (df["year"] == year)].copy()
     return df[
         (df["Data"].dt.month == month) &
         (df["Data"].dt.year == year)
@@ -1020,6 +3570,34 @@ def detect_pending_recorrentes(
     return pd.DataFrame(pendentes).reset_index(drop=True)
 
 
+@st.cache_resource(show_spinner=False)
+def _get_metrics_memo() -> dict:
+    """Métricas do mês e derivados (score, alertas, orçamento), LRU."""
+    return {}
+
+
+def _memo_lru(key: tuple, build, cap: int = 128):
+    """Busca key no memo de métricas; na falta, chama build() e guarda.
+
+    Acerto move a chave para o fim; estouro descarta a menos usada.
+    """
+    memo = _get_metrics_memo()
+    with _MEMO_LOCK:
+        value = memo.pop(key, None)
+    if value is None:
+        value = build()
+    _memo_put(memo, key, value, cap)
+    return value
+
+
+def _frame_fingerprint(df: pd.DataFrame, cols=None) -> tuple[int, int]:
+    """(linhas, hash do conteúdo) — muda se qualquer valor das colunas mudar."""
+    cols = [c for c in (cols or df.columns) if c in df.columns]
+    if df.empty or not cols:
+        return (len(df), 0)
+    return (len(df), int(pd.util.hash_pandas_object(df[cols], index=False).sum()))
+
+
 def compute_budget(
     df_orcamentos: pd.DataFrame,
     cat_breakdown: dict,
@@ -1028,7 +3606,22 @@ def compute_budget(
     """Calcula status do orçamento por categoria.
 
     Retorna lista de dicts com categoria, limite, gasto, pct e status.
+    Memoizado pelo conteúdo dos orçamentos e pelo breakdown do mês.
     """
+    key = (
+        "budget", user_filter,
+        _frame_fingerprint(df_orcamentos), tuple(cat_breakdown.items()),
+    )
+    hit = _memo_lru(key, lambda: _build_budget(df_orcamentos, cat_breakdown, user_filter))
+    return [dict(b) for b in hit]
+
+
+def _build_budget(
+    df_orcamentos: pd.DataFrame,
+    cat_breakdown: dict,
+    user_filter: str,
+) -> list[dict]:
+    """Status do orçamento por categoria (sem memo)."""
     df_orc = filter_by_user(df_orcamentos, user_filter, include_shared=True)
 
     if df_orc.empty:
@@ -1042,7 +3635,9 @@ def compute_budget(
             continue
 
         gasto = cat_breakdown.get(cat, 0.0)
-        pct = (gasto / limite) * 100 if limite > 0 else 0.0
+        # Saldo em centavos: sem resíduo de ponto flutuante em restante/excedente
+        limite_c, gasto_c = round(limite * 100), round(gasto * 100)
+        pct = (gasto_c / limite_c) * 100 if limite_c > 0 else 0.0
 
         if pct >= 100:
             status = "over"
@@ -1056,8 +3651,8 @@ def compute_budget(
             "limite": limite,
             "gasto": gasto,
             "pct": pct,
-            "restante": max(0, limite - gasto),
-            "excedente": max(0, gasto - limite),
+            "restante": cents_to_brl(max(0, limite_c - gasto_c)),
+            "excedente": cents_to_brl(max(0, gasto_c - limite_c)),
             "status": status,
         })
 
@@ -1073,24 +3668,22 @@ def generate_recorrentes(
     """Gera transações a partir das recorrentes pendentes.
 
     Cria uma transação para cada recorrente pendente com
-    Origem='Recorrente' e data baseada no DiaVencimento.
-    Retorna dict com resumo ou None se falhar.
+    Origem='Recorrente' e data baseada no DiaVencimento, gravando
+    todas em uma única escrita (save_entries).
+    Retorna dict com resumo (incluindo falhas por linha) ou None se falhar.
     """
     if pendentes.empty:
         return None
 
     last_day = calendar.monthrange(target_year, target_month)[1]
-    entries_ok = 0
-    n_entradas = 0
-    n_saidas = 0
-    total_valor = 0.0
+    entries: list[dict] = []
 
     for _, rec in pendentes.iterrows():
         dia = int(rec.get("DiaVencimento", 1))
         dia_real = min(dia, last_day)
         data_lancamento = date(target_year, target_month, dia_real)
 
-        entry = {
+        entries.append({
             "Id": generate_id(),
             "Data": data_lancamento,
             "Descricao": str(rec["Descricao"]).strip(),
@@ -1099,26 +3692,24 @@ def generate_recorrentes(
             "Tipo": str(rec["Tipo"]).strip(),
             "Responsavel": str(rec["Responsavel"]).strip(),
             "Origem": CFG.ORIGEM_RECORRENTE,
-        }
+        })
 
-        ok, err = validate_transaction(entry)
-        if ok:
-            if save_entry(entry, "Transacoes", skip_audit=True, skip_rate_limit=True):
-                entries_ok += 1
-                total_valor += float(rec["Valor"])
-                if str(rec["Tipo"]).strip() == CFG.TIPO_ENTRADA:
-                    n_entradas += 1
-                else:
-                    n_saidas += 1
+    result = save_entries(entries, "Transacoes", skip_audit=True, skip_rate_limit=True)
+    for r in result.report:
+        if not r["ok"]:
+            logger.warning(f"generate_recorrentes: '{r['entry']['Descricao']}' — {r['erro']}")
 
-    if entries_ok > 0:
-        logger.info(f"generate_recorrentes: {entries_ok} geradas para {target_month}/{target_year}")
-        _log_audit("BATCH_CREATE", "Transacoes", f"{entries_ok} recorrentes em {target_month}/{target_year}")
+    saved = result.saved_entries
+    if saved:
+        n_entradas = sum(1 for e in saved if e["Tipo"] == CFG.TIPO_ENTRADA)
+        logger.info(f"generate_recorrentes: {len(saved)} geradas para {target_month}/{target_year}")
+        _log_audit("BATCH_CREATE", "Transacoes", f"{len(saved)} recorrentes em {target_month}/{target_year}")
         return {
-            "count": entries_ok,
+            "count": len(saved),
             "entradas": n_entradas,
-            "saidas": n_saidas,
-            "total": total_valor,
+            "saidas": len(saved) - n_entradas,
+            "total": sum(e["Valor"] for e in saved),
+            "falhas": [r for r in result.report if not r["ok"]],
         }
     return None
 
@@ -1177,7 +3768,29 @@ def compute_alerts(
     projection: dict | None,
     n_pendentes: int = 0,
 ) -> list[dict]:
-    """Engine de alertas inteligentes baseado em regras."""
+    """Engine de alertas inteligentes baseado em regras.
+
+    Memoizado sobre a chave das métricas (mx.memo_key), o orçamento, a
+    projeção, as pendências e o dia de hoje (regras de mês corrente).
+    """
+    if mx.memo_key is None:
+        return _build_alerts(mx, sel_mo, sel_yr, projection, n_pendentes)
+    key = (
+        "alerts", mx.memo_key, date.today(), n_pendentes,
+        repr(projection), repr(mx.budget_data),
+    )
+    hit = _memo_lru(key, lambda: _build_alerts(mx, sel_mo, sel_yr, projection, n_pendentes))
+    return [dict(a) for a in hit]
+
+
+def _build_alerts(
+    mx: MonthMetrics,
+    sel_mo: int,
+    sel_yr: int,
+    projection: dict | None,
+    n_pendentes: int,
+) -> list[dict]:
+    """Regras de alerta (sem memo)."""
     alerts: list[dict] = []
     now = datetime.now()
     is_current = (sel_mo == now.month and sel_yr == now.year)
@@ -1306,19 +3919,69 @@ def compute_metrics(
     target_year: int,
     user_config: UserConfig | None = None,
 ) -> MonthMetrics:
-    """Calcula todas as métricas financeiras para o mês/usuário."""
+    """Calcula todas as métricas financeiras para o mês/usuário.
+
+    Memoizado (LRU) por usuário, mês, UserConfig e pelo conteúdo do que o
+    mês de fato lê: as transações da janela de autonomia (que contém o mês
+    e o anterior), o acumulado de aportes e o patrimônio. Uma gravação só
+    invalida os meses cuja janela ela toca (ou todos, se mexer no acumulado).
+    Em frames versionados, a mesma versão acerta direto, sem refazer o hash.
+    Devolve cópia rasa: reatribuir campos não afeta o memo; listas e dicts
+    são compartilhados e não devem ser alterados no lugar.
+    """
     ucfg = user_config or UserConfig()
 
-    df_t = filter_by_user(df_trans, user_filter)
+    df_t = _typed(filter_by_user(df_trans, user_filter))
     df_a = filter_by_user(df_assets, user_filter, include_shared=True)
 
-    # Garantir que 'Data' é datetime ANTES de filter_by_month
-    if not df_t.empty and not pd.api.types.is_datetime64_any_dtype(df_t["Data"]):
-        df_t["Data"] = pd.to_datetime(df_t["Data"], errors="coerce")
-        df_t = df_t.dropna(subset=["Data"])
-
     df_mo = filter_by_month(df_t, target_month, target_year)
+    base_patrimonio = float(df_a["Valor"].sum()) if not df_a.empty else 0.0
+
+    def by_content() -> MonthMetrics:
+        ledger = investment_ledger(df_trans, user_filter)
+        investido_total = int(ledger.iloc[-1]) if not ledger.empty else 0
+        ref_date = end_of_month(target_year, target_month)
+        df_janela = filter_by_dates(df_t, ref_date - timedelta(days=90), ref_date)
+        key = (
+            "metrics", user_filter, target_month, target_year, astuple(ucfg),
+            df_t.empty, _frame_fingerprint(df_janela, CFG.COLS_TRANSACAO),
+            investido_total, base_patrimonio,
+        )
+
+        def build() -> MonthMetrics:
+            m = _build_metrics(
+                df_t, df_mo, df_janela, user_filter, target_month, target_year,
+                ucfg, base_patrimonio, investido_total,
+            )
+            m.memo_key = key
+            return m
+
+        return _memo_lru(key, build)
+
+    versao = _versao(df_t)
+    if versao is None:
+        hit = by_content()
+    else:
+        vkey = (
+            "metrics@", versao, len(df_t), user_filter, target_month, target_year,
+            astuple(ucfg), base_patrimonio,
+        )
+        hit = _memo_lru(vkey, by_content)
+    return replace(hit, df_user=df_t, df_month=df_mo, user_config=ucfg)
 
+
+def _build_metrics(
+    df_t: pd.DataFrame,
+    df_mo: pd.DataFrame,
+    df_janela: pd.DataFrame,
+    user_filter: str,
+    target_month: int,
+    target_year: int,
+    ucfg: UserConfig,
+    base_patrimonio: float,
+    investido_total: int,
+) -> MonthMetrics:
+    """Métricas do mês (sem memo); df_janela = transações dos 90 dias até o fim do mês."""
     m = MonthMetrics(
         df_user=df_t,
         df_month=df_mo,
@@ -1331,60 +3994,39 @@ def compute_metrics(
         m.insight_renda = "Nenhum dado registrado."
         return m
 
+    despesas = df_mo[df_mo["is_expense"]]
+    receitas = df_mo[df_mo["is_income"]]
+    aportes = df_mo[df_mo["is_investment"]]
     if not df_mo.empty:
-        m.renda = df_mo[df_mo["Tipo"] == CFG.TIPO_ENTRADA]["Valor"].sum()
-        despesas = df_mo[
-            (df_mo["Tipo"] == CFG.TIPO_SAIDA) &
-            (df_mo["Categoria"] != CFG.CAT_INVESTIMENTO)
-        ]
-        m.lifestyle = despesas["Valor"].sum()
-        m.investido_mes = df_mo[
-            (df_mo["Tipo"] == CFG.TIPO_SAIDA) &
-            (df_mo["Categoria"] == CFG.CAT_INVESTIMENTO)
-        ]["Valor"].sum()
-        m.month_entradas = len(df_mo[df_mo["Tipo"] == CFG.TIPO_ENTRADA])
+        m.renda = _sum_brl(receitas)
+        m.lifestyle = _sum_brl(despesas)
+        m.investido_mes = _sum_brl(aportes)
+        m.month_entradas = len(receitas)
         m.month_saidas = len(despesas)
-        m.month_investimentos = len(df_mo[
-            (df_mo["Tipo"] == CFG.TIPO_SAIDA) &
-            (df_mo["Categoria"] == CFG.CAT_INVESTIMENTO)
-        ])
-
-    m.disponivel = m.renda - m.lifestyle - m.investido_mes
-
-    base_patrimonio = df_a["Valor"].sum() if not df_a.empty else 0.0
-    m.investido_total = df_t[
-        (df_t["Tipo"] == CFG.TIPO_SAIDA) &
-        (df_t["Categoria"] == CFG.CAT_INVESTIMENTO)
-    ]["Valor"].sum()
+        m.month_investimentos = len(aportes)
+
+    m.disponivel = cents_to_brl(receitas["cents"].sum() - despesas["cents"].sum() - aportes["cents"].sum())
+
+    m.investido_total = cents_to_brl(investido_total)
     m.sobrevivencia = base_patrimonio + m.investido_total
 
     m.taxa_aporte = (m.investido_mes / m.renda * 100) if m.renda > 0 else 0.0
 
     # --- Autonomia ---
     ref_date = end_of_month(target_year, target_month)
-    inicio_3m = ref_date - timedelta(days=90)
-    df_burn = df_t[
-        (df_t["Data"] >= inicio_3m) &
-        (df_t["Data"] <= ref_date) &
-        (df_t["Tipo"] == CFG.TIPO_SAIDA) &
-        (df_t["Categoria"] != CFG.CAT_INVESTIMENTO)
-    ]
+    df_burn = df_janela[df_janela["is_expense"]]
     if not df_burn.empty:
         dias = max(1, (ref_date - df_burn["Data"].min()).days)
         meses = max(1, min(3, dias / 30))
-        media_gastos = df_burn["Valor"].sum() / meses
+        media_gastos = _sum_brl(df_burn) / meses
         m.autonomia = (m.sobrevivencia / media_gastos) if media_gastos > 0 else 999.0
     else:
         m.autonomia = 999.0
 
     # --- Regra 50/30/20 ---
     if m.renda > 0 and not df_mo.empty:
-        despesas_mo = df_mo[
-            (df_mo["Tipo"] == CFG.TIPO_SAIDA) &
-            (df_mo["Categoria"] != CFG.CAT_INVESTIMENTO)
-        ]
-        val_nec = despesas_mo[despesas_mo["Categoria"].isin(CFG.NECESSIDADES)]["Valor"].sum()
-        val_des = despesas_mo[despesas_mo["Categoria"].isin(CFG.DESEJOS)]["Valor"].sum()
+        val_nec = _sum_brl(despesas[despesas["group"] == "necessidades"])
+        val_des = _sum_brl(despesas[despesas["group"] == "desejos"])
         m.nec_pct = (val_nec / m.renda) * 100
         m.des_pct = (val_des / m.renda) * 100
         m.inv_pct = (m.investido_mes / m.renda) * 100
@@ -1394,33 +4036,24 @@ def compute_metrics(
 
     # --- Breakdown ---
     if not df_mo.empty:
-        cat_grp = df_mo[
-            (df_mo["Tipo"] == CFG.TIPO_SAIDA) &
-            (df_mo["Categoria"] != CFG.CAT_INVESTIMENTO)
-        ].groupby("Categoria")["Valor"].sum()
+        cat_grp = _sum_brl_by(despesas, "Categoria")
 
         if not cat_grp.empty:
             m.top_cat = cat_grp.idxmax()
             m.top_cat_val = cat_grp.max()
             m.cat_breakdown = cat_grp.sort_values(ascending=False).to_dict()
 
-        top_row = df_mo[
-            (df_mo["Tipo"] == CFG.TIPO_SAIDA) &
-            (df_mo["Categoria"] != CFG.CAT_INVESTIMENTO)
-        ].nlargest(1, "Valor")
+        top_row = despesas.nlargest(1, "Valor")
         if not top_row.empty:
             m.top_gasto_desc = str(top_row["Descricao"].values[0])
             m.top_gasto_val = float(top_row["Valor"].values[0])
 
-        renda_grp = df_mo[df_mo["Tipo"] == CFG.TIPO_ENTRADA].groupby("Categoria")["Valor"].sum()
+        renda_grp = _sum_brl_by(receitas, "Categoria")
         if not renda_grp.empty:
             m.renda_breakdown = renda_grp.sort_values(ascending=False).to_dict()
 
         # --- Top 5 Gastos ---
-        top5_df = df_mo[
-            (df_mo["Tipo"] == CFG.TIPO_SAIDA) &
-            (df_mo["Categoria"] != CFG.CAT_INVESTIMENTO)
-        ].nlargest(5, "Valor")
+        top5_df = despesas.nlargest(5, "Valor")
         m.top5_gastos = [
             {"desc": str(r["Descricao"]), "valor": float(r["Valor"]), "cat": str(r["Categoria"])}
             for _, r in top5_df.iterrows()
@@ -1429,20 +4062,13 @@ def compute_metrics(
         # --- Split Casal ---
         if user_filter == "Casal":
             for resp_name in CFG.RESPONSAVEIS:
-                resp_total = df_mo[
-                    (df_mo["Tipo"] == CFG.TIPO_SAIDA) &
-                    (df_mo["Categoria"] != CFG.CAT_INVESTIMENTO) &
-                    (df_mo["Responsavel"] == resp_name)
-                ]["Valor"].sum()
+                resp_total = _sum_brl(despesas[despesas["Responsavel"] == resp_name])
                 if resp_total > 0:
                     m.split_gastos[resp_name] = resp_total
 
             # --- Split Renda Casal ---
             for resp_name in CFG.RESPONSAVEIS:
-                resp_renda = df_mo[
-                    (df_mo["Tipo"] == CFG.TIPO_ENTRADA) &
-                    (df_mo["Responsavel"] == resp_name)
-                ]["Valor"].sum()
+                resp_renda = _sum_brl(receitas[receitas["Responsavel"] == resp_name])
                 if resp_renda > 0:
                     m.split_renda[resp_name] = resp_renda
 
@@ -1450,18 +4076,12 @@ def compute_metrics(
     m.ticket_medio = m.lifestyle / m.month_saidas if m.month_saidas > 0 else 0.0
 
     # --- Dia mais caro ---
-    if not df_mo.empty:
-        _despesas_dia = df_mo[
-            (df_mo["Tipo"] == CFG.TIPO_SAIDA) &
-            (df_mo["Categoria"] != CFG.CAT_INVESTIMENTO)
-        ].copy()
-        if not _despesas_dia.empty:
-            _despesas_dia["_dia"] = _despesas_dia["Data"].dt.day
-            _dia_agg = _despesas_dia.groupby("_dia")["Valor"].agg(["sum", "count"])
-            _idx_max = _dia_agg["sum"].idxmax()
-            m.dia_mais_caro = int(_idx_max)
-            m.dia_mais_caro_val = float(_dia_agg.loc[_idx_max, "sum"])
-            m.dia_mais_caro_count = int(_dia_agg.loc[_idx_max, "count"])
+    if not despesas.empty:
+        _dia_agg = despesas.groupby("day")["cents"].agg(["sum", "count"])
+        _idx_max = _dia_agg["sum"].idxmax()
+        m.dia_mais_caro = int(_idx_max)
+        m.dia_mais_caro_val = cents_to_brl(_dia_agg.loc[_idx_max, "sum"])
+        m.dia_mais_caro_count = int(_dia_agg.loc[_idx_max, "count"])
 
     # --- Health ---
     m.health = _compute_health(m)
@@ -1472,16 +4092,13 @@ def compute_metrics(
     df_prev = filter_by_month(df_t, prev_mo, prev_yr)
 
     if not df_prev.empty:
-        prev_renda = df_prev[df_prev["Tipo"] == CFG.TIPO_ENTRADA]["Valor"].sum()
-        prev_lifestyle = df_prev[
-            (df_prev["Tipo"] == CFG.TIPO_SAIDA) &
-            (df_prev["Categoria"] != CFG.CAT_INVESTIMENTO)
-        ]["Valor"].sum()
-        prev_investido = df_prev[
-            (df_prev["Tipo"] == CFG.TIPO_SAIDA) &
-            (df_prev["Categoria"] == CFG.CAT_INVESTIMENTO)
-        ]["Valor"].sum()
-        prev_disponivel = prev_renda - prev_lifestyle - prev_investido
+        prev_renda = _sum_brl(df_prev[df_prev["is_income"]])
+        prev_lifestyle = _sum_brl(df_prev[df_prev["is_expense"]])
+        prev_investido = _sum_brl(df_prev[df_prev["is_investment"]])
+        prev_disponivel = cents_to_brl(
+            df_prev.loc[df_prev["is_income"], "cents"].sum()
+            - df_prev.loc[df_prev["is_expense"] | df_prev["is_investment"], "cents"].sum()
+        )
         m.d_renda = calc_delta(m.renda, prev_renda)
         m.d_lifestyle = calc_delta(m.lifestyle, prev_lifestyle)
         m.d_investido = calc_delta(m.investido_mes, prev_investido)
@@ -1533,7 +4150,18 @@ def _compute_health(m: MonthMetrics) -> str:
 
 
 def compute_score(mx: MonthMetrics) -> dict:
-    """Calcula score financeiro de 0-100 com breakdown."""
+    """Calcula score financeiro de 0-100 com breakdown.
+
+    Só depende das métricas: memoizado sobre mx.memo_key.
+    """
+    if mx.memo_key is None:
+        return _build_score(mx)
+    hit = _memo_lru(("score", mx.memo_key), lambda: _build_score(mx))
+    return {**hit, "details": list(hit["details"])}
+
+
+def _build_score(mx: MonthMetrics) -> dict:
+    """Score financeiro (sem memo)."""
     ucfg: UserConfig = mx.user_config
     details: list[tuple[str, float, int]] = []
     score = 0.0
@@ -1601,25 +4229,20 @@ def compute_annual_summary(
     year: int,
 ) -> dict | None:
     """Calcula resumo anual para o strip compacto."""
-    df = filter_by_user(df_trans, user_filter)
-    if df.empty:
+    cube = _user_cube(df_trans, user_filter)
+    if cube.empty:
         return None
 
-    df_year = df[df["Data"].dt.year == year]
-    if df_year.empty:
+    totals = _cube_totals(cube)
+    totals = totals[totals.index.year == year]
+    if totals.empty:
         return None
 
-    renda = df_year[df_year["Tipo"] == CFG.TIPO_ENTRADA]["Valor"].sum()
-    gastos = df_year[
-        (df_year["Tipo"] == CFG.TIPO_SAIDA) &
-        (df_year["Categoria"] != CFG.CAT_INVESTIMENTO)
-    ]["Valor"].sum()
-    investido = df_year[
-        (df_year["Tipo"] == CFG.TIPO_SAIDA) &
-        (df_year["Categoria"] == CFG.CAT_INVESTIMENTO)
-    ]["Valor"].sum()
-    saldo = renda - gastos - investido
-    meses_ativos = df_year["Data"].dt.month.nunique()
+    renda = cents_to_brl(totals["renda"].sum())
+    gastos = cents_to_brl(totals["gastos"].sum())
+    investido = cents_to_brl(totals["investido"].sum())
+    saldo = cents_to_brl(totals["renda"].sum() - totals["gastos"].sum() - totals["investido"].sum())
+    meses_ativos = len(totals)
 
     return {
         "year": year,
@@ -1642,63 +4265,32 @@ def compute_evolution(
     months_back: int = CFG.MESES_EVOLUCAO,
 ) -> list[dict]:
     """Calcula dados de evolução mensal para gráfico."""
-    df = filter_by_user(df_trans, user_filter)
-    if df.empty:
+    cube = _user_cube(df_trans, user_filter)
+    if cube.empty:
         return []
 
-    ref_end = end_of_month(ref_year, ref_month)
-    mo, yr = ref_month, ref_year
-    for _ in range(months_back - 1):
-        mo -= 1
-        if mo == 0:
-            mo, yr = 12, yr - 1
-    start_date = datetime(yr, mo, 1)
-
-    df_range = df[(df["Data"] >= start_date) & (df["Data"] <= ref_end)].copy()
-    if df_range.empty:
+    start, end = _month_window(ref_month, ref_year, months_back)
+    cube = cube[
+        cube["period"].between(start, end) &
+        (cube["is_income"] | cube["is_expense"] | cube["is_investment"])
+    ]
+    if cube.empty:
         return []
 
-    df_range["period"] = df_range["Data"].dt.to_period("M")
-
-    df_saidas = df_range[df_range["Tipo"] == CFG.TIPO_SAIDA].copy()
-
-    def classify(cat: str) -> str:
-        if cat in CFG.NECESSIDADES:
-            return "necessidades"
-        if cat == CFG.CAT_INVESTIMENTO:
-            return "investido"
-        return "desejos"
-
-    if not df_saidas.empty:
-        df_saidas["group"] = df_saidas["Categoria"].apply(classify)
-        pivot_s = df_saidas.pivot_table(
-            values="Valor", index="period", columns="group",
-            aggfunc="sum", fill_value=0
-        )
-    else:
-        pivot_s = pd.DataFrame()
-
-    df_entradas = df_range[df_range["Tipo"] == CFG.TIPO_ENTRADA].copy()
-    if not df_entradas.empty:
-        renda_por_periodo = df_entradas.groupby(
-            df_entradas["Data"].dt.to_period("M")
-        )["Valor"].sum()
-    else:
-        renda_por_periodo = pd.Series(dtype=float)
-
-    all_periods = set()
-    if not pivot_s.empty:
-        all_periods.update(pivot_s.index)
-    if not renda_por_periodo.empty:
-        all_periods.update(renda_por_periodo.index)
+    # Saídas fora de NECESSIDADES contam como desejos (inclui categorias avulsas)
+    cents = cube["cents"]
+    is_nec = cube["group"] == "necessidades"
+    por_periodo = pd.DataFrame({
+        "necessidades": cents.where(cube["is_expense"] & is_nec, 0),
+        "desejos": cents.where(cube["is_expense"] & ~is_nec, 0),
+        "investido": cents.where(cube["is_investment"], 0),
+        "renda": cents.where(cube["is_income"], 0),
+    }).groupby(cube["period"]).sum() / 100
 
     data = []
-    for period in sorted(all_periods):
-        nec = float(pivot_s.loc[period].get("necessidades", 0)) if (not pivot_s.empty and period in pivot_s.index) else 0.0
-        des = float(pivot_s.loc[period].get("desejos", 0)) if (not pivot_s.empty and period in pivot_s.index) else 0.0
-        inv = float(pivot_s.loc[period].get("investido", 0)) if (not pivot_s.empty and period in pivot_s.index) else 0.0
-        ren = float(renda_por_periodo[period]) if period in renda_por_periodo.index else 0.0
-
+    for period, row in por_periodo.iterrows():
+        nec, des = float(row["necessidades"]), float(row["desejos"])
+        inv, ren = float(row["investido"]), float(row["renda"])
         data.append({
             "label": f"{MESES_PT[period.month]}/{period.year}",
             "necessidades": nec,
@@ -1738,47 +4330,30 @@ def compute_renda_evolution(
     months_back: int = CFG.MESES_EVOLUCAO,
 ) -> list[dict]:
     """Calcula evolução mensal de renda com breakdown por fonte."""
-    df = filter_by_user(df_trans, user_filter)
-    if df.empty:
+    cube = _user_cube(df_trans, user_filter)
+    if cube.empty:
         return []
 
-    ref_end = end_of_month(ref_year, ref_month)
-    mo, yr = ref_month, ref_year
-    for _ in range(months_back - 1):
-        mo -= 1
-        if mo == 0:
-            mo, yr = 12, yr - 1
-    start_date = datetime(yr, mo, 1)
-
-    df_range = df[
-        (df["Data"] >= start_date) &
-        (df["Data"] <= ref_end) &
-        (df["Tipo"] == CFG.TIPO_ENTRADA)
-    ].copy()
-
-    if df_range.empty:
+    start, end = _month_window(ref_month, ref_year, months_back)
+    cube = cube[cube["period"].between(start, end) & cube["is_income"]]
+    if cube.empty:
         return []
 
-    df_range["period"] = df_range["Data"].dt.to_period("M")
-
-    pivot = df_range.pivot_table(
-        values="Valor", index="period", columns="Categoria",
-        aggfunc="sum", fill_value=0,
+    pivot = cube.pivot_table(
+        values="cents", index="period", columns="Categoria",
+        aggfunc="sum", fill_value=0, observed=True,
     )
 
     data = []
     for period in sorted(pivot.index):
-        entry = {
+        row = pivot.loc[period]
+        row = row[row > 0]
+        row = row.set_axis(row.index.astype(str)).sort_index()
+        data.append({
             "label": f"{MESES_PT[period.month]}/{period.year}",
-            "total": 0.0,
-            "breakdown": {},
-        }
-        for cat in pivot.columns:
-            val = float(pivot.loc[period, cat])
-            if val > 0:
-                entry["breakdown"][cat] = val
-                entry["total"] += val
-        data.append(entry)
+            "total": cents_to_brl(row.sum()),
+            "breakdown": {cat: cents_to_brl(val) for cat, val in row.items()},
+        })
 
     return data
 
@@ -1789,31 +4364,24 @@ def compute_yoy(
     year: int,
 ) -> dict | None:
     """Compara o mesmo mês no ano atual vs ano anterior."""
-    df = filter_by_user(df_trans, user_filter)
-    if df.empty:
+    cube = _user_cube(df_trans, user_filter)
+    if cube.empty:
         return None
 
     prev_year = year - 1
+    totals = _cube_totals(cube)
 
     def _month_data(y: int) -> dict:
-        df_m = filter_by_month(df, month, y)
-        if df_m.empty:
+        period = pd.Period(year=y, month=month, freq="M")
+        if period not in totals.index:
             return {"renda": 0, "gastos": 0, "investido": 0, "saldo": 0, "tx_count": 0}
-        renda = df_m[df_m["Tipo"] == CFG.TIPO_ENTRADA]["Valor"].sum()
-        gastos = df_m[
-            (df_m["Tipo"] == CFG.TIPO_SAIDA) &
-            (df_m["Categoria"] != CFG.CAT_INVESTIMENTO)
-        ]["Valor"].sum()
-        investido = df_m[
-            (df_m["Tipo"] == CFG.TIPO_SAIDA) &
-            (df_m["Categoria"] == CFG.CAT_INVESTIMENTO)
-        ]["Valor"].sum()
+        t = totals.loc[period]
         return {
-            "renda": renda,
-            "gastos": gastos,
-            "investido": investido,
-            "saldo": renda - gastos - investido,
-            "tx_count": len(df_m),
+            "renda": cents_to_brl(t["renda"]),
+            "gastos": cents_to_brl(t["gastos"]),
+            "investido": cents_to_brl(t["investido"]),
+            "saldo": cents_to_brl(t["renda"] - t["gastos"] - t["investido"]),
+            "tx_count": int(t["n"]),
         }
 
     curr = _month_data(year)
@@ -1855,50 +4423,19 @@ def compute_patrimonio_evolution(
     if df.empty and base_pat == 0:
         return []
 
-    # Construir lista de períodos
-    periods = []
-    mo, yr = ref_month, ref_year
-    for _ in range(months_back - 1):
-        mo -= 1
-        if mo == 0:
-            mo, yr = 12, yr - 1
-    for _ in range(months_back):
-        periods.append((mo, yr))
-        mo += 1
-        if mo > 12:
-            mo, yr = 1, yr + 1
-
-    # Investimentos acumulados
-    df_inv = df[
-        (df["Tipo"] == CFG.TIPO_SAIDA) &
-        (df["Categoria"] == CFG.CAT_INVESTIMENTO)
-    ].copy() if not df.empty else pd.DataFrame()
+    ledger = investment_ledger(df_trans, user_filter)
+    start, end = _month_window(ref_month, ref_year, months_back)
 
     data = []
-    for p_mo, p_yr in periods:
-        eom = end_of_month(p_yr, p_mo)
-        if not df_inv.empty:
-            inv_acum = df_inv[df_inv["Data"] <= eom]["Valor"].sum()
-        else:
-            inv_acum = 0.0
-
-        patrimonio_total = base_pat + inv_acum
-
-        # Gastos do mês (para calcular variação)
-        df_mes = filter_by_month(df, p_mo, p_yr) if not df.empty else pd.DataFrame()
-        inv_mes = 0.0
-        if not df_mes.empty:
-            inv_mes = df_mes[
-                (df_mes["Tipo"] == CFG.TIPO_SAIDA) &
-                (df_mes["Categoria"] == CFG.CAT_INVESTIMENTO)
-            ]["Valor"].sum()
-
+    for period in pd.period_range(start, end, freq="M"):
+        inv_acum = _ledger_at(ledger, period)
+        inv_mes = inv_acum - _ledger_at(ledger, period - 1)
         data.append({
-            "label": f"{MESES_PT[p_mo]}/{p_yr}",
-            "patrimonio": patrimonio_total,
+            "label": f"{MESES_PT[period.month]}/{period.year}",
+            "patrimonio": base_pat + cents_to_brl(inv_acum),
             "base": base_pat,
-            "investido_acum": inv_acum,
-            "aporte_mes": inv_mes,
+            "investido_acum": cents_to_brl(inv_acum),
+            "aporte_mes": cents_to_brl(inv_mes),
         })
 
     return data
@@ -1916,7 +4453,7 @@ def compute_cashflow_forecast(
     Combina recorrentes ativas (baseline fixa) com média de gastos
     variáveis dos últimos 3 meses para projetar saldo futuro.
     """
-    df = filter_by_user(df_trans, user_filter)
+    totals = _cube_totals(_user_cube(df_trans, user_filter))
 
     # --- Recorrentes ativas (baseline fixa) ---
     df_rec = filter_by_user(df_recorrentes, user_filter, include_shared=True)
@@ -1946,20 +4483,13 @@ def compute_cashflow_forecast(
 
     mo, yr = ref_month, ref_year
     for _ in range(3):
-        df_m = filter_by_month(df, mo, yr)
-        if not df_m.empty:
+        period = pd.Period(year=yr, month=mo, freq="M")
+        if period in totals.index:
             months_with_data += 1
-            renda_mes = df_m[
-                df_m["Tipo"] == CFG.TIPO_ENTRADA
-            ]["Valor"].sum()
-            gastos_mes = df_m[
-                (df_m["Tipo"] == CFG.TIPO_SAIDA) &
-                (df_m["Categoria"] != CFG.CAT_INVESTIMENTO)
-            ]["Valor"].sum()
-            inv_mes = df_m[
-                (df_m["Tipo"] == CFG.TIPO_SAIDA) &
-                (df_m["Categoria"] == CFG.CAT_INVESTIMENTO)
-            ]["Valor"].sum()
+            t = totals.loc[period]
+            renda_mes = cents_to_brl(t["renda"])
+            gastos_mes = cents_to_brl(t["gastos"])
+            inv_mes = cents_to_brl(t["investido"])
             renda_var_total += max(0, renda_mes - renda_fixa)
             gastos_var_total += max(0, gastos_mes - gastos_fixos)
             inv_var_total += max(0, inv_mes - inv_fixo)
@@ -2020,10 +4550,8 @@ def compute_divisao_casal(df_month: pd.DataFrame) -> dict | None:
     if df_month.empty:
         return None
 
-    gastos = df_month[
-        (df_month["Tipo"] == CFG.TIPO_SAIDA) &
-        (df_month["Categoria"] != CFG.CAT_INVESTIMENTO)
-    ]
+    df_month = _typed(df_month)
+    gastos = df_month[df_month["is_expense"]]
     if gastos.empty:
         return None
 
@@ -2033,30 +4561,30 @@ def compute_divisao_casal(df_month: pd.DataFrame) -> dict | None:
 
     pessoa_a, pessoa_b = individuais[0], individuais[1]
 
-    a_ind = gastos[gastos["Responsavel"] == pessoa_a]["Valor"].sum()
-    b_ind = gastos[gastos["Responsavel"] == pessoa_b]["Valor"].sum()
-    casal_total = gastos[gastos["Responsavel"] == "Casal"]["Valor"].sum()
+    # Tudo em centavos; a metade do compartilhado cancela na diferença
+    por_resp = gastos.groupby("Responsavel", observed=True)["cents"].sum()
+    a_ind = int(por_resp.get(pessoa_a, 0))
+    b_ind = int(por_resp.get(pessoa_b, 0))
+    casal_total = int(por_resp.get("Casal", 0))
     total = a_ind + b_ind + casal_total
 
     if total == 0:
         return None
 
     metade = casal_total / 2
-    a_justo = a_ind + metade
-    b_justo = b_ind + metade
-    diferenca = a_justo - b_justo
+    diferenca = a_ind - b_ind
 
     return {
         "pessoas": (pessoa_a, pessoa_b),
-        "individual": {pessoa_a: a_ind, pessoa_b: b_ind},
-        "casal_compartilhado": casal_total,
-        "metade_compartilhado": metade,
-        "cota_justa": {pessoa_a: a_justo, pessoa_b: b_justo},
-        "total_geral": total,
-        "diferenca": abs(diferenca),
+        "individual": {pessoa_a: cents_to_brl(a_ind), pessoa_b: cents_to_brl(b_ind)},
+        "casal_compartilhado": cents_to_brl(casal_total),
+        "metade_compartilhado": metade / 100,
+        "cota_justa": {pessoa_a: (a_ind + metade) / 100, pessoa_b: (b_ind + metade) / 100},
+        "total_geral": cents_to_brl(total),
+        "diferenca": cents_to_brl(abs(diferenca)),
         "quem_deve": pessoa_b if diferenca > 0 else (pessoa_a if diferenca < 0 else None),
         "quem_recebe": pessoa_a if diferenca > 0 else (pessoa_b if diferenca < 0 else None),
-        "equilibrado": abs(diferenca) < 1.0,
+        "equilibrado": diferenca == 0,
     }
 
 
@@ -2066,23 +4594,19 @@ def compute_weekday_pattern(df_month: pd.DataFrame) -> dict | None:
     if df_month.empty:
         return None
 
-    despesas = df_month[
-        (df_month["Tipo"] == CFG.TIPO_SAIDA) &
-        (df_month["Categoria"] != CFG.CAT_INVESTIMENTO)
-    ].copy()
-
+    df_month = _typed(df_month)
+    despesas = df_month[df_month["is_expense"]]
     if despesas.empty:
         return None
 
-    despesas["_wd"] = despesas["Data"].dt.dayofweek
     _DIAS_PT = {0: "Seg", 1: "Ter", 2: "Qua", 3: "Qui", 4: "Sex", 5: "Sáb", 6: "Dom"}
 
-    agg = despesas.groupby("_wd")["Valor"].agg(["sum", "count"])
+    agg = despesas.groupby("weekday")["cents"].agg(["sum", "count"])
 
     result: dict = {"dias": [], "max_val": 0.0}
     for d in range(7):
         if d in agg.index:
-            val = float(agg.loc[d, "sum"])
+            val = cents_to_brl(agg.loc[d, "sum"])
             count = int(agg.loc[d, "count"])
         else:
             val, count = 0.0, 0
@@ -2104,11 +4628,11 @@ def compute_tag_summary(
     ref_year: int,
 ) -> list[dict]:
     """Análise transversal por tags nos últimos 6 meses."""
-    df = filter_by_user(df_trans, user_filter)
+    df = _typed(filter_by_user(df_trans, user_filter))
     if df.empty or "Tag" not in df.columns:
         return []
 
-    df_tagged = df[df["Tag"].str.strip() != ""].copy()
+    df_tagged = df[df["Tag"].str.strip() != ""]
     if df_tagged.empty:
         return []
 
@@ -2131,17 +4655,12 @@ def compute_tag_summary(
         tag_str = str(tag).strip()
         if not tag_str:
             continue
-        gastos = group[
-            (group["Tipo"] == CFG.TIPO_SAIDA) &
-            (group["Categoria"] != CFG.CAT_INVESTIMENTO)
-        ]["Valor"].sum()
-        entradas = group[group["Tipo"] == CFG.TIPO_ENTRADA]["Valor"].sum()
         results.append({
             "tag": tag_str,
-            "gastos": gastos,
-            "entradas": entradas,
+            "gastos": _sum_brl(group[group["is_expense"]]),
+            "entradas": _sum_brl(group[group["is_income"]]),
             "n_transacoes": len(group),
-            "n_meses": group["Data"].dt.to_period("M").nunique(),
+            "n_meses": group["period"].nunique(),
         })
 
     results.sort(key=lambda x: x["gastos"], reverse=True)
@@ -2156,10 +4675,13 @@ def compute_savings_rate(
     months_back: int = CFG.MESES_EVOLUCAO,
 ) -> list[dict]:
     """Calcula taxa de poupança mensal: (renda − gastos) / renda × 100."""
-    df = filter_by_user(df_trans, user_filter)
-    if df.empty:
+    cube = _user_cube(df_trans, user_filter)
+    if cube.empty:
         return []
 
+    totals = _cube_totals(cube)
+    renda_m, gastos_m = totals["renda"], totals["gastos"]
+
     mo, yr = ref_month, ref_year
     for _ in range(months_back - 1):
         mo -= 1
@@ -2168,20 +4690,15 @@ def compute_savings_rate(
 
     data: list[dict] = []
     for _ in range(months_back):
-        df_m = filter_by_month(df, mo, yr)
-        renda, gastos = 0.0, 0.0
-        if not df_m.empty:
-            renda = df_m[df_m["Tipo"] == CFG.TIPO_ENTRADA]["Valor"].sum()
-            gastos = df_m[
-                (df_m["Tipo"] == CFG.TIPO_SAIDA) &
-                (df_m["Categoria"] != CFG.CAT_INVESTIMENTO)
-            ]["Valor"].sum()
+        period = pd.Period(year=yr, month=mo, freq="M")
+        renda = int(renda_m.get(period, 0))
+        gastos = int(gastos_m.get(period, 0))
         rate = ((renda - gastos) / renda * 100) if renda > 0 else 0.0
         data.append({
             "label": f"{MESES_PT[mo]}/{yr}",
-            "renda": renda,
-            "gastos": gastos,
-            "poupanca": max(0, renda - gastos),
+            "renda": cents_to_brl(renda),
+            "gastos": cents_to_brl(gastos),
+            "poupanca": cents_to_brl(max(0, renda - gastos)),
             "rate": rate,
             "has_data": renda > 0,
         })
@@ -2202,33 +4719,29 @@ def compute_consistency(
 ) -> dict | None:
     """Calcula índice de consistência: em quantos meses atingiu as metas."""
     ucfg = user_config or UserConfig()
-    df = filter_by_user(df_trans, user_filter)
-    if df.empty:
+    cube = _user_cube(df_trans, user_filter)
+    if cube.empty:
         return None
 
+    totals = _cube_totals(cube)
+    renda_m, gastos_m, investido_m = totals["renda"], totals["gastos"], totals["investido"]
+
     months_aporte_ok = 0
     months_saldo_ok = 0
     months_with_data = 0
 
     mo, yr = ref_month, ref_year
     for _ in range(months_back):
-        df_m = filter_by_month(df, mo, yr)
-        if not df_m.empty:
-            renda = df_m[df_m["Tipo"] == CFG.TIPO_ENTRADA]["Valor"].sum()
-            if renda > 0:
-                months_with_data += 1
-                investido = df_m[
-                    (df_m["Tipo"] == CFG.TIPO_SAIDA) &
-                    (df_m["Categoria"] == CFG.CAT_INVESTIMENTO)
-                ]["Valor"].sum()
-                gastos = df_m[
-                    (df_m["Tipo"] == CFG.TIPO_SAIDA) &
-                    (df_m["Categoria"] != CFG.CAT_INVESTIMENTO)
-                ]["Valor"].sum()
-                if (investido / renda * 100) >= ucfg.meta_investimento:
-                    months_aporte_ok += 1
-                if (renda - gastos - investido) >= 0:
-                    months_saldo_ok += 1
+        period = pd.Period(year=yr, month=mo, freq="M")
+        renda = int(renda_m.get(period, 0))
+        if renda > 0:
+            months_with_data += 1
+            investido = int(investido_m.get(period, 0))
+            gastos = int(gastos_m.get(period, 0))
+            if (investido / renda * 100) >= ucfg.meta_investimento:
+                months_aporte_ok += 1
+            if (renda - gastos - investido) >= 0:
+                months_saldo_ok += 1
         mo -= 1
         if mo == 0:
             mo, yr = 12, yr - 1
@@ -2255,46 +4768,32 @@ def compute_anomalies(
     months_back: int = 3,
 ) -> list[dict]:
     """Detecta gastos anômalos por categoria vs média histórica (I2)."""
-    df = filter_by_user(df_trans, user_filter)
-    if df.empty:
-        return []
-
-    df_mo = filter_by_month(df, target_month, target_year)
-    if df_mo.empty:
+    cube = _user_cube(df_trans, user_filter)
+    if cube.empty:
         return []
 
-    curr_cats = df_mo[
-        (df_mo["Tipo"] == CFG.TIPO_SAIDA)
-        & (df_mo["Categoria"] != CFG.CAT_INVESTIMENTO)
-    ].groupby("Categoria")["Valor"].sum()
-
+    target = pd.Period(year=target_year, month=target_month, freq="M")
+    # Gasto por mês × categoria (soma os responsáveis)
+    por_mes = (
+        cube[cube["is_expense"]]
+        .groupby(["period", "Categoria"], observed=True)["cents"].sum()
+        .reset_index()
+    )
+    curr_cats = por_mes[por_mes["period"] == target].set_index("Categoria")["cents"] / 100
     if curr_cats.empty:
         return []
 
-    hist_totals: dict[str, list[float]] = {}
-    mo, yr = target_month, target_year
-    for _ in range(months_back):
-        mo -= 1
-        if mo == 0:
-            mo, yr = 12, yr - 1
-        df_hist = filter_by_month(df, mo, yr)
-        if not df_hist.empty:
-            cat_sums = df_hist[
-                (df_hist["Tipo"] == CFG.TIPO_SAIDA)
-                & (df_hist["Categoria"] != CFG.CAT_INVESTIMENTO)
-            ].groupby("Categoria")["Valor"].sum()
-            for cat, val in cat_sums.items():
-                hist_totals.setdefault(cat, []).append(val)
-
-    if not hist_totals:
+    hist = por_mes[por_mes["period"].between(target - months_back, target - 1)]
+    if hist.empty:
         return []
+    # Média só dos meses em que a categoria aparece
+    hist_avg = hist.groupby("Categoria", observed=True)["cents"].mean() / 100
 
     anomalies: list[dict] = []
     for cat, curr_val in curr_cats.items():
-        hist = hist_totals.get(cat, [])
-        if not hist:
+        if cat not in hist_avg.index:
             continue
-        avg = sum(hist) / len(hist)
+        avg = float(hist_avg[cat])
         if avg > 0 and curr_val > avg * threshold:
             anomalies.append({
                 "categoria": str(cat),
@@ -2315,24 +4814,18 @@ def compute_calendar_heatmap(
     if df_month.empty:
         return None
 
-    despesas = df_month[
-        (df_month["Tipo"] == CFG.TIPO_SAIDA)
-        & (df_month["Categoria"] != CFG.CAT_INVESTIMENTO)
-    ].copy()
+    df_month = _typed(df_month)
+    despesas = df_month[df_month["is_expense"]]
 
     days_in_month = calendar.monthrange(year, month)[1]
     first_weekday = date(year, month, 1).weekday()
 
-    daily: dict[int, float] = {}
-    daily_count: dict[int, int] = {}
-    if not despesas.empty:
-        despesas["_dia"] = despesas["Data"].dt.day
-        for d, grp in despesas.groupby("_dia"):
-            daily[int(d)] = grp["Valor"].sum()
-            daily_count[int(d)] = len(grp)
+    agg = despesas.groupby("day")["cents"].agg(["sum", "count"])
+    daily: dict[int, float] = {int(d): cents_to_brl(c) for d, c in agg["sum"].items()}
+    daily_count: dict[int, int] = {int(d): int(n) for d, n in agg["count"].items()}
 
     max_val = max(daily.values()) if daily else 0.0
-    total = sum(daily.values()) if daily else 0.0
+    total = cents_to_brl(agg["sum"].sum()) if daily else 0.0
     dias_com_gasto = len(daily)
     dias_sem_gasto = days_in_month - dias_com_gasto
 
@@ -2366,7 +4859,7 @@ def compute_frequent_transactions(
     months_back: int = 3,
 ) -> list[dict]:
     """Identifica transações frequentes para templates rápidos (N2)."""
-    df = filter_by_user(df_trans, user_filter)
+    df = _typed(filter_by_user(df_trans, user_filter))
     if df.empty:
         return []
 
@@ -2378,19 +4871,15 @@ def compute_frequent_transactions(
             mo, yr = 12, yr - 1
     start_date = datetime(yr, mo, 1)
 
-    df_range = df[
-        (df["Data"] >= start_date)
-        & (df["Data"] <= now)
-        & (df["Tipo"] == CFG.TIPO_SAIDA)
-        & (df["Categoria"] != CFG.CAT_INVESTIMENTO)
-    ].copy()
+    df_range = filter_by_dates(df, start_date, now)
+    df_range = df_range[df_range["is_expense"]]
 
     if df_range.empty:
         return []
 
     groups = (
-        df_range.groupby(["Descricao", "Categoria", "Responsavel"])
-        .agg(count=("Valor", "count"), avg_valor=("Valor", "mean"), last_valor=("Valor", "last"))
+        df_range.groupby(["Descricao", "Categoria", "Responsavel"], observed=True)
+        .agg(count=("cents", "count"), avg_cents=("cents", "mean"), last_cents=("cents", "last"))
         .reset_index()
     )
     groups = groups[groups["count"] >= 2].sort_values("count", ascending=False).head(n)
@@ -2401,8 +4890,8 @@ def compute_frequent_transactions(
             "cat": str(row["Categoria"]),
             "resp": str(row["Responsavel"]),
             "count": int(row["count"]),
-            "avg_valor": float(row["avg_valor"]),
-            "last_valor": float(row["last_valor"]),
+            "avg_valor": round(row["avg_cents"]) / 100,
+            "last_valor": cents_to_brl(row["last_cents"]),
         }
         for _, row in groups.iterrows()
     ]
@@ -2476,6 +4965,213 @@ def compute_meta_progress(
     return results
 
 
+# --- Dashboard ---
+
+def _stage(fn):
+    """Mede o cálculo de uma propriedade do DashboardEngine em self.timings (ms).
+
+    Tempo exclusivo: pré-requisitos resolvidos dentro do cálculo (outras
+    propriedades) são descontados e contam só na etapa deles.
+    """
+    @functools.wraps(fn)
+    def wrapper(self):
+        self._nested.append(0.0)
+        t0 = time.perf_counter()
+        try:
+            return fn(self)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            self.timings[fn.__name__] = round(ms - self._nested.pop(), 2)
+            if self._nested:
+                self._nested[-1] += ms
+    return wrapper
+
+
+class DashboardEngine:
+    """Resultados do dashboard de um mês/usuário, calculados sob demanda.
+
+    Parte do frame canônico de transações: o cubo mensal e a partição do
+    mês (mx.df_month) são montados uma vez e compartilhados por todas as
+    análises. Cada resultado é uma cached_property — só o que a página
+    renderiza é calculado — e a duração de cada etapa fica em timings.
+    """
+
+    def __init__(
+        self,
+        data: DataBundle,
+        user_filter: str,
+        sel_mo: int,
+        sel_yr: int,
+        user_config: UserConfig,
+    ) -> None:
+        self.data = data
+        self.df_trans = _typed(data.transacoes)
+        self.user = user_filter
+        self.sel_mo = sel_mo
+        self.sel_yr = sel_yr
+        self.user_config = user_config
+        self.timings: dict[str, float] = {}
+        self._nested: list[float] = []
+
+    # --- Estruturas compartilhadas ---
+
+    @functools.cached_property
+    @_stage
+    def cube(self) -> pd.DataFrame:
+        """Cubo mensal do usuário (um groupby para todas as tendências)."""
+        return _user_cube(self.df_trans, self.user)
+
+    @functools.cached_property
+    @_stage
+    def metrics(self) -> MonthMetrics:
+        """Métricas do mês (sem orçamento — use mx)."""
+        return compute_metrics(
+            self.df_trans, self.data.patrimonio, self.user,
+            self.sel_mo, self.sel_yr, self.user_config,
+        )
+
+    @functools.cached_property
+    @_stage
+    def budget(self) -> list[dict]:
+        return compute_budget(self.data.orcamentos, self.metrics.cat_breakdown, self.user)
+
+    @functools.cached_property
+    def mx(self) -> MonthMetrics:
+        """Métricas do mês com budget_data preenchido."""
+        mx = self.metrics
+        mx.budget_data = self.budget
+        return mx
+
+    # --- Mês selecionado ---
+
+    @functools.cached_property
+    @_stage
+    def projection(self) -> dict | None:
+        return compute_projection(self.mx, self.sel_mo, self.sel_yr)
+
+    @functools.cached_property
+    @_stage
+    def pendentes(self) -> pd.DataFrame:
+        return detect_pending_recorrentes(
+            self.data.recorrentes, self.df_trans, self.user, self.sel_mo, self.sel_yr,
+        )
+
+    @functools.cached_property
+    @_stage
+    def alerts(self) -> list[dict]:
+        return compute_alerts(
+            self.mx, self.sel_mo, self.sel_yr, self.projection,
+            n_pendentes=len(self.pendentes),
+        )
+
+    @functools.cached_property
+    @_stage
+    def score(self) -> dict:
+        return compute_score(self.mx)
+
+    @functools.cached_property
+    @_stage
+    def divisao_casal(self) -> dict | None:
+        return compute_divisao_casal(self.mx.df_month) if self.user == "Casal" else None
+
+    @functools.cached_property
+    @_stage
+    def weekday_pattern(self) -> dict | None:
+        return compute_weekday_pattern(self.mx.df_month)
+
+    @functools.cached_property
+    @_stage
+    def calendar_heatmap(self) -> dict | None:
+        return compute_calendar_heatmap(self.mx.df_month, self.sel_mo, self.sel_yr)
+
+    @functools.cached_property
+    @_stage
+    def tag_summary(self) -> list[dict]:
+        return compute_tag_summary(self.df_trans, self.user, self.sel_mo, self.sel_yr)
+
+    # --- Tendências (self.cube primeiro: o groupby conta na etapa 'cube') ---
+
+    @functools.cached_property
+    @_stage
+    def annual(self) -> dict | None:
+        self.cube
+        return compute_annual_summary(self.df_trans, self.user, self.sel_yr)
+
+    @functools.cached_property
+    @_stage
+    def evolution(self) -> list[dict]:
+        self.cube
+        return compute_evolution(self.df_trans, self.user, self.sel_mo, self.sel_yr)
+
+    @functools.cached_property
+    @_stage
+    def renda_evolution(self) -> list[dict]:
+        self.cube
+        return compute_renda_evolution(self.df_trans, self.user, self.sel_mo, self.sel_yr)
+
+    @functools.cached_property
+    @_stage
+    def yoy(self) -> dict | None:
+        self.cube
+        return compute_yoy(self.df_trans, self.user, self.sel_mo, self.sel_yr)
+
+    @functools.cached_property
+    @_stage
+    def savings(self) -> list[dict]:
+        self.cube
+        return compute_savings_rate(self.df_trans, self.user, self.sel_mo, self.sel_yr)
+
+    @functools.cached_property
+    @_stage
+    def consistency(self) -> dict | None:
+        self.cube
+        return compute_consistency(
+            self.df_trans, self.user, self.sel_mo, self.sel_yr,
+            user_config=self.user_config,
+        )
+
+    @functools.cached_property
+    @_stage
+    def anomalies(self) -> list[dict]:
+        self.cube
+        return compute_anomalies(self.df_trans, self.user, self.sel_mo, self.sel_yr)
+
+    @functools.cached_property
+    @_stage
+    def cashflow_forecast(self) -> list[dict] | None:
+        self.cube
+        return compute_cashflow_forecast(
+            self.df_trans, self.data.recorrentes, self.user, self.sel_mo, self.sel_yr,
+        )
+
+    @functools.cached_property
+    @_stage
+    def patrimonio(self) -> list[dict]:
+        self.cube
+        return compute_patrimonio_evolution(
+            self.df_trans, self.data.patrimonio, self.user, self.sel_mo, self.sel_yr,
+        )
+
+    # --- Demais ---
+
+    @functools.cached_property
+    @_stage
+    def frequent(self) -> list[dict]:
+        return compute_frequent_transactions(self.df_trans, self.user)
+
+    @functools.cached_property
+    @_stage
+    def metas_progress(self) -> list[dict]:
+        return compute_meta_progress(self.data.metas, self.user)
+
+    def log_timings(self, limite_ms: float = 100) -> None:
+        """Loga as etapas calculadas se o total passar de limite_ms."""
+        total = sum(self.timings.values())
+        if total > limite_ms:
+            detail = ", ".join(f"{k}={v:.0f}" for k, v in self.timings.items())
+            logger.info(f"dashboard: {total:.0f}ms ({detail})")
+
+
 # --- N1: CSV Import ---
 
 _BANK_FORMATS: dict[str, dict] = {
@@ -2616,10 +5312,92 @@ def parse_bank_csv(
     return pd.DataFrame(results) if results else None
 
 
+def stage_csv_import(df_parsed: pd.DataFrame, df_hist: pd.DataFrame) -> dict:
+    """Prepara importação em lote: valida e deduplica o extrato inteiro.
+
+    Retorna dict com 'staged' (linhas prontas), 'invalid' (com coluna
+    'Erro') e 'duplicates' (já presentes no histórico).
+    """
+    errors = validate_transactions_df(df_parsed)
+    valid_mask = errors == ""
+    df_invalid = df_parsed[~valid_mask].assign(Erro=errors[~valid_mask])
+    df_valid = df_parsed[valid_mask]
+
+    dup_mask = find_duplicates(df_valid, df_hist)
+    return {
+        "staged": df_valid[~dup_mask].reset_index(drop=True),
+        "invalid": df_invalid.reset_index(drop=True),
+        "duplicates": df_valid[dup_mask].reset_index(drop=True),
+    }
+
+
+def import_transactions(df_staged: pd.DataFrame, source: str) -> bool | None:
+    """Grava um lote já validado como uma entrada só do WAL.
+
+    O replay anexa o lote em cada aba anual (um append por aba) e só
+    confirma quando todas entraram; Ids fixos tornam o reenvio idempotente.
+    Se a entrada for descartada (PENDING_DIR/dead), abas já gravadas
+    ficam — o arquivo guarda o lote inteiro para reenvio. A auditoria é
+    registrada na confirmação. Retorna True gravado, None ainda na fila
+    (provisório) após WAL_DRAIN_WAIT, False em falha.
+    """
+    if df_staged.empty:
+        return False
+    df_rows = df_staged.reindex(columns=list(CFG.COLS_TRANSACAO))
+    df_rows["Tag"] = df_rows["Tag"].fillna("")
+    # Id fixo antes do WAL: o reenvio reconhece linhas já gravadas
+    blank = _norm_ids(df_rows["Id"]).values == ""
+    if blank.any():
+        df_rows.loc[blank, "Id"] = [generate_id() for _ in range(int(blank.sum()))]
+    audit = {
+        "action": "CSV_IMPORT", "worksheet": "Transacoes",
+        "details": f"{len(df_rows)} via {source}",
+        "usuario": st.session_state.get("auth_user", "anônimo"),
+    }
+    try:
+        entry_id = _enqueue_rows("Transacoes", df_rows, audit)
+    except Exception as e:
+        logger.error(f"import_transactions failed [{source}]: {e}")
+        return False
+    done = _get_wal().wait(entry_id)
+    if done:
+        logger.info(f"import_transactions OK [{source}]: {len(df_rows)} registros")
+    elif done is None:
+        logger.info(f"import_transactions [{source}]: {len(df_rows)} registros pendentes de sincronização")
+    else:
+        logger.error(f"import_transactions failed [{source}]: lote descartado pelo WAL")
+    return done
+
+
 # ==============================================================================
 # 8. COMPONENTES VISUAIS
 # ==============================================================================
 
+def _lazy_expander(label: str, key: str, expanded: bool = False):
+    """st.expander com estado (on_change="rerun"): expor .open ao chamador.
+
+    Com estado, o conteúdo pode ser pulado enquanto fechado (ver _is_open).
+    Streamlit antigo (sem on_change) cai no expander comum, sempre executado.
+    """
+    try:
+        return st.expander(label, expanded=expanded, key=key, on_change="rerun")
+    except TypeError:
+        return st.expander(label, expanded=expanded)
+
+
+def _lazy_tabs(labels: list[str], key: str) -> list:
+    """st.tabs com estado (on_change="rerun"): só a aba ativa tem .open True."""
+    try:
+        return st.tabs(labels, key=key, on_change="rerun")
+    except TypeError:
+        return st.tabs(labels)
+
+
+def _is_open(container) -> bool:
+    """Expander aberto / aba ativa. Sem estado (None) conta como aberto."""
+    return getattr(container, "open", None) is not False
+
+
 def render_autonomia(val: float, sobrevivencia: float, user_config: UserConfig | None = None) -> None:
     """Renderiza hero de autonomia financeira."""
     ucfg = user_config or UserConfig()
@@ -3348,6 +6126,8 @@ def render_pending_banner(
                 parts.append(f"{result['saidas']} saída{'s' if result['saidas'] > 1 else ''}")
             detail = " + ".join(parts) if parts else ""
             st.toast(f"✓ {result['count']} geradas ({detail}) — {fmt_brl(result['total'])}")
+            if result["falhas"]:
+                st.toast(f"⚠ {len(result['falhas'])} recorrente(s) não gerada(s) — veja o log")
             st.rerun()
         else:
             st.error("Falha ao gerar recorrentes")
@@ -4448,7 +7228,7 @@ def passivo_form(default_resp: str = "Casal") -> None:
 def generate_full_backup() -> BytesIO | None:
     """Gera backup completo de todas as planilhas em Excel (S1)."""
     try:
-        conn = get_conn()
+        backend = get_backend()
         buffer = BytesIO()
         sheets_to_backup = [
             "Transacoes", "Patrimonio", "Passivos", "Recorrentes",
@@ -4457,8 +7237,8 @@ def generate_full_backup() -> BytesIO | None:
         with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
             for ws_name in sheets_to_backup:
                 try:
-                    df = conn.read(worksheet=ws_name)
-                    df = df.dropna(how="all")
+                    # Transações: aba legada + todas as abas anuais
+                    df = strip_derived(load_transacoes()) if ws_name == "Transacoes" else backend.read(ws_name)
                     if "Data" in df.columns:
                         df["Data"] = pd.to_datetime(
                             df["Data"], errors="coerce"
@@ -4552,7 +7332,7 @@ def _render_historico(
     sel_yr: int,
 ) -> None:
     """Renderiza aba de histórico com busca, export e edição."""
-    df_hist = mx.df_month.copy()
+    df_hist = strip_derived(mx.df_month)
     month_label = fmt_month_year(sel_mo, sel_yr)
 
     if df_hist.empty:
@@ -4713,55 +7493,27 @@ def _render_historico(
                         if len(validation_errors) > 5:
                             st.error(f"... e mais {len(validation_errors) - 5} erro(s)")
                     else:
-                        _save_historico_mensal(edited, user, sel_mo, sel_yr)
+                        _save_historico_mensal(df_hist, edited)
         with c_discard:
             if st.button("✗ DESCARTAR", key=f"discard_hist_{user}_{sel_mo}_{sel_yr}", use_container_width=True):
                 st.rerun()
 
 
-def _save_historico_mensal(
-    edited_month: pd.DataFrame,
-    user: str,
-    sel_mo: int,
-    sel_yr: int,
-) -> None:
-    """Salva edições do histórico mensal com soft delete (S3)."""
-    st.cache_data.clear()
-    time.sleep(0.3)
-    df_full_fresh, _ = load_data()
-
-    mask_month = (
-        (df_full_fresh["Data"].dt.month == sel_mo) &
-        (df_full_fresh["Data"].dt.year == sel_yr)
-    )
-    if user != "Casal":
-        mask_user = df_full_fresh["Responsavel"] == user
-        mask_remove = mask_month & mask_user
-    else:
-        mask_remove = mask_month
-
-    df_original_month = df_full_fresh[mask_remove].copy()
-
-    # --- Detectar linhas removidas e mover para Lixeira (S3) ---
-    if not df_original_month.empty and len(edited_month) < len(df_original_month):
-        if "Id" in df_original_month.columns and "Id" in edited_month.columns:
-            orig_ids = set(df_original_month["Id"].astype(str).str.strip())
-            edit_ids = set(edited_month["Id"].astype(str).str.strip())
-            removed_ids = orig_ids - edit_ids
-            if removed_ids:
-                df_removed = df_original_month[
-                    df_original_month["Id"].astype(str).str.strip().isin(removed_ids)
-                ]
-                _move_to_lixeira(df_removed)
+def _save_historico_mensal(df_month: pd.DataFrame, edited_month: pd.DataFrame) -> None:
+    """Salva edições do histórico mensal como diff por Id, com soft delete (S3).
 
-    df_kept = df_full_fresh[~mask_remove].copy()
-    df_merged = pd.concat([df_kept, edited_month], ignore_index=True)
-    df_merged["Data"] = pd.to_datetime(df_merged["Data"], errors="coerce")
-    df_merged = df_merged.sort_values("Data").reset_index(drop=True)
+    O recorte exibido no editor é a base do diff: só as linhas inseridas,
+    alteradas ou removidas são enviadas ao backend.
+    """
+    diff = diff_rows(df_month, edited_month, list(CFG.COLS_TRANSACAO))
+    if not apply_row_diff("Transacoes", diff):
+        return
 
-    if update_sheet(df_merged, "Transacoes"):
-        st.toast("✓ Histórico atualizado")
-        st.rerun()
+    # --- Linhas removidas vão para a Lixeira (S3), só depois de saírem do histórico ---
+    if not diff["deleted"].empty and not _move_to_lixeira(diff["deleted"]):
+        st.toast(f"⚠ {len(diff['deleted'])} transações removidas não foram para a lixeira")
+    st.toast("✓ Histórico atualizado")
+    st.rerun()
 
 
 # ==============================================================================
@@ -4811,7 +7563,7 @@ def _save_filtered_sheet(
         )
     else:
         df_final = df_edited.copy()
-    return update_sheet(df_final, worksheet)
+    return update_sheet(df_final, worksheet, df_base=df_full)
 
 # ==============================================================================
 # 12. AUTENTICAÇÃO
@@ -4901,8 +7653,6 @@ def main() -> None:
         _render_login()
         return
 
-    validate_worksheets()
-
     # --- V2: Modo de exibição ---
     if "display_mode" not in st.session_state:
         st.session_state.display_mode = "expert"
@@ -4930,6 +7680,14 @@ def main() -> None:
         user = "Casal"
     with c_status:
         status_parts = [f"L&L v{CFG.VERSION} — {fmt_date(now)}"]
+        as_of = data_as_of()
+        if as_of is not None:
+            status_parts.append(f"dados de {as_of:%H:%M}")
+        _wal = wal_stats()
+        if _wal["pending"]:
+            status_parts.append(f"⏳ {_wal['rows']} pendente(s) de sincronização")
+        if connection_health()["state"] == "open":
+            status_parts.append("⚠ Sheets fora do ar — exibindo cópia local")
         if auth_user:
             status_parts.append(sanitize(auth_user))
         st.markdown(
@@ -4940,7 +7698,7 @@ def main() -> None:
         cs1, cs2, cs3 = st.columns(3)
         with cs1:
             if st.button("⟳", key="refresh_btn", help="Atualizar dados"):
-                st.cache_data.clear()
+                invalidate_cache()
                 st.rerun()
         with cs2:
             _mode_label = "◉" if st.session_state.display_mode == "expert" else "○"
@@ -5019,25 +7777,25 @@ def main() -> None:
     sel_yr = st.session_state.nav_year
 
     # --- Carregar Todos os Dados (batch) ---
-    df_config = load_config()
-    df_trans, df_assets = load_data()
-    df_recorrentes = load_recorrentes()
-    df_orcamentos = load_orcamentos()
-    df_metas = load_metas()
-    df_passivos = load_passivos()
-    df_lixeira = load_lixeira()
+    data = load_all(years=analysis_years(sel_yr))
+    validate_worksheets(data)
+    df_config = data.config
+    df_assets = data.patrimonio
+    df_recorrentes = data.recorrentes
+    df_orcamentos = data.orcamentos
+    df_metas = data.metas
+    df_passivos = data.passivos
+    df_lixeira = data.lixeira
 
     # --- Config do Usuário ---
     user_config = UserConfig.from_df(df_config, user)
 
-    # --- Métricas ---
-    mx = compute_metrics(df_trans, df_assets, user, sel_mo, sel_yr, user_config)
-
-    # --- Projeção (só mês atual) ---
-    projection = compute_projection(mx, sel_mo, sel_yr)
+    # --- Motor do dashboard (cada resultado calculado só quando lido) ---
+    eng = DashboardEngine(data, user, sel_mo, sel_yr, user_config)
+    mx = eng.mx
 
     # --- Recorrentes Pendentes ---
-    pendentes = detect_pending_recorrentes(df_recorrentes, df_trans, user, sel_mo, sel_yr)
+    pendentes = eng.pendentes
 
     # --- Auto-gerar recorrentes (se habilitado) ---
     if user_config.auto_gerar_recorrentes and not pendentes.empty:
@@ -5053,49 +7811,9 @@ def main() -> None:
                     parts.append(f"{result['saidas']} saída{'s' if result['saidas'] > 1 else ''}")
                 detail = " + ".join(parts) if parts else ""
                 st.toast(f"⟳ Auto: {result['count']} recorrentes geradas ({detail})")
+                if result["falhas"]:
+                    st.toast(f"⚠ {len(result['falhas'])} recorrente(s) não gerada(s) — veja o log")
                 st.rerun()
-    budget_data = compute_budget(df_orcamentos, mx.cat_breakdown, user)
-    mx.budget_data = budget_data
-
-    # --- Alertas ---
-    alerts = compute_alerts(mx, sel_mo, sel_yr, projection, n_pendentes=len(pendentes))
-
-    # --- Score Financeiro ---
-    score_data = compute_score(mx)
-
-    # --- Resumo Anual ---
-    annual = compute_annual_summary(df_trans, user, sel_yr)
-
-    # --- Forecast Cashflow ---
-    cashflow_forecast = compute_cashflow_forecast(
-        df_trans, df_recorrentes, user, sel_mo, sel_yr,
-    )
-
-    # --- Year-over-Year ---
-    yoy_data = compute_yoy(df_trans, user, sel_mo, sel_yr)
-
-    # --- Evolução Patrimonial ---
-    pat_evolution = compute_patrimonio_evolution(
-        df_trans, df_assets, user, sel_mo, sel_yr,
-    )
-
-    # --- Divisão Casal ---
-    divisao_casal = None
-    if user == "Casal":
-        divisao_casal = compute_divisao_casal(mx.df_month)
-
-    # --- Phase 8A: Novas análises ---
-    weekday_pattern = compute_weekday_pattern(mx.df_month)
-    tag_summary = compute_tag_summary(df_trans, user, sel_mo, sel_yr)
-    savings_data = compute_savings_rate(df_trans, user, sel_mo, sel_yr)
-    consistency = compute_consistency(
-        df_trans, user, sel_mo, sel_yr, user_config=user_config,
-    )
-
-    # --- Phase 8B: Novas análises ---
-    anomalies = compute_anomalies(df_trans, user, sel_mo, sel_yr)
-    cal_heatmap = compute_calendar_heatmap(mx.df_month, sel_mo, sel_yr)
-    frequent_tx = compute_frequent_transactions(df_trans, user)
 
     month_label = fmt_month_year(sel_mo, sel_yr)
     has_data = mx.renda > 0 or mx.lifestyle > 0 or mx.investido_mes > 0
@@ -5139,7 +7857,7 @@ def main() -> None:
 
     # ===== HEALTH + ALERTAS =====
     render_health_badge(mx.health, month_label, mx.month_tx_count)
-    render_alerts(alerts)
+    render_alerts(eng.alerts)
 
     # ===== BANNER RECORRENTES PENDENTES =====
     render_pending_banner(pendentes, user, sel_mo, sel_yr)
@@ -5148,39 +7866,46 @@ def main() -> None:
         render_empty_month(month_label)
     else:
         # ===== PROJEÇÃO (só mês atual) =====
-        render_projection(projection, mx)
+        render_projection(eng.projection, mx)
 
         # ===== ANÁLISE DETALHADA (colapsável com sub-tabs — X5, V2) =====
+        # Fechado (padrão) ou modo clean: nenhuma análise é calculada
         if st.session_state.display_mode == "expert":
-          with st.expander("📊 Análise Detalhada", expanded=False):
-            ad_score, ad_regra, ad_comp, ad_forecast = st.tabs([
-                "SCORE", "REGRA", "COMPARATIVO", "FORECAST"
-            ])
-
-            with ad_score:
-                _ad_l, _ad_r = st.columns([1, 1])
-                with _ad_l:
-                    render_score(score_data)
-                with _ad_r:
-                    render_consistency(consistency, user_config)
-
-            with ad_regra:
-                render_regra_503020(mx)
-                if user == "Casal":
-                    render_split_casal(mx.split_gastos, mx.split_renda)
-                    render_divisao_casal(divisao_casal)
-
-            with ad_comp:
-                _cmp_l, _cmp_r = st.columns([1, 1])
-                with _cmp_l:
-                    render_prev_comparison(mx, sel_mo, sel_yr)
-                with _cmp_r:
-                    render_yoy(yoy_data)
-                render_annual_strip(annual)
-                render_savings_rate(savings_data)
-
-            with ad_forecast:
-                render_cashflow_forecast(cashflow_forecast)
+          _ad = _lazy_expander("📊 Análise Detalhada", key="ad_expander")
+          with _ad:
+            if _is_open(_ad):
+                ad_score, ad_regra, ad_comp, ad_forecast = _lazy_tabs([
+                    "SCORE", "REGRA", "COMPARATIVO", "FORECAST"
+                ], key="ad_tabs")
+
+                with ad_score:
+                    if _is_open(ad_score):
+                        _ad_l, _ad_r = st.columns([1, 1])
+                        with _ad_l:
+                            render_score(eng.score)
+                        with _ad_r:
+                            render_consistency(eng.consistency, user_config)
+
+                with ad_regra:
+                    if _is_open(ad_regra):
+                        render_regra_503020(mx)
+                        if user == "Casal":
+                            render_split_casal(mx.split_gastos, mx.split_renda)
+                            render_divisao_casal(eng.divisao_casal)
+
+                with ad_comp:
+                    if _is_open(ad_comp):
+                        _cmp_l, _cmp_r = st.columns([1, 1])
+                        with _cmp_l:
+                            render_prev_comparison(mx, sel_mo, sel_yr)
+                        with _cmp_r:
+                            render_yoy(eng.yoy)
+                        render_annual_strip(eng.annual)
+                        render_savings_rate(eng.savings)
+
+                with ad_forecast:
+                    if _is_open(ad_forecast):
+                        render_cashflow_forecast(eng.cashflow_forecast)
 
     # ===== LANÇAMENTO RÁPIDO =====
     with st.expander("⚡ Lançamento Rápido"):
@@ -5276,7 +8001,7 @@ def main() -> None:
                         st.rerun()
 
         # --- Templates Rápidos (N2) ---
-        if frequent_tx:
+        if eng.frequent:
             st.markdown(
                 '<div style="font-family:JetBrains Mono,monospace;font-size:0.55rem;'
                 'color:#555;text-transform:uppercase;letter-spacing:0.15em;'
@@ -5284,8 +8009,8 @@ def main() -> None:
                 '◆ Templates Frequentes</div>',
                 unsafe_allow_html=True,
             )
-            _tpl_cols = st.columns(min(len(frequent_tx), 3))
-            for i, tpl in enumerate(frequent_tx[:3]):
+            _tpl_cols = st.columns(min(len(eng.frequent), 3))
+            for i, tpl in enumerate(eng.frequent[:3]):
                 with _tpl_cols[i]:
                     _tpl_label = f"{tpl['desc'][:18]}\n{tpl['cat']} · ~{fmt_brl(tpl['avg_valor'])}"
                     if st.button(
@@ -5310,9 +8035,11 @@ def main() -> None:
                             st.rerun()
 
     # ===== ABAS =====
-    tab_ls, tab_renda, tab_pat, tab_rec, tab_metas, tab_hist, tab_cfg = st.tabs([
+    # Abas com estado: formulários e editores rodam em todas (o estado dos
+    # widgets sobrevive à troca de aba); as análises, só na aba ativa.
+    tab_ls, tab_renda, tab_pat, tab_rec, tab_metas, tab_hist, tab_cfg = _lazy_tabs([
         "GASTOS", "RENDA", "PATRIMÔNIO", "FIXOS", "METAS", "HISTÓRICO", "CONFIG"
-    ])
+    ], key="main_tabs")
 
     with tab_ls:
         col_form, col_intel = st.columns([1, 1])
@@ -5321,8 +8048,8 @@ def main() -> None:
                 "Consumo Mensal",
                 f"Total: <strong>{fmt_brl(mx.lifestyle)}</strong>"
             )
-            if budget_data:
-                render_budget_bars(budget_data)
+            if eng.budget:
+                render_budget_bars(eng.budget)
             if mx.cat_breakdown:
                 render_cat_breakdown(mx.cat_breakdown)
             transaction_form(
@@ -5339,32 +8066,33 @@ def main() -> None:
             render_recent_context(mx.df_month, CFG.TIPO_SAIDA)
         with col_intel:
             render_intel("Intel — Gastos", mx.insight_ls)
-            evo_data = compute_evolution(df_trans, user, sel_mo, sel_yr)
-            render_evolution_chart(evo_data)
-
-            # --- Radiografia ---
-            render_top_gastos(
-                mx.top5_gastos,
-                mx.ticket_medio,
-                mx.split_gastos,
-                mx.dia_mais_caro,
-                mx.dia_mais_caro_val,
-                mx.dia_mais_caro_count,
-            )
+            if _is_open(tab_ls):
+                evo_data = eng.evolution
+                render_evolution_chart(evo_data)
+
+                # --- Radiografia ---
+                render_top_gastos(
+                    mx.top5_gastos,
+                    mx.ticket_medio,
+                    mx.split_gastos,
+                    mx.dia_mais_caro,
+                    mx.dia_mais_caro_val,
+                    mx.dia_mais_caro_count,
+                )
 
-            # --- Anomalias (I2) ---
-            if anomalies:
-                render_anomalies(anomalies)
+                # --- Anomalias (I2) ---
+                if eng.anomalies:
+                    render_anomalies(eng.anomalies)
 
-            # --- Heatmap calendário (V5) ---
-            render_calendar_heatmap(cal_heatmap)
+                # --- Heatmap calendário (V5) ---
+                render_calendar_heatmap(eng.calendar_heatmap)
 
-            # --- Padrão semanal ---
-            render_weekday_pattern(weekday_pattern)
+                # --- Padrão semanal ---
+                render_weekday_pattern(eng.weekday_pattern)
 
-            # --- Tags ---
-            if tag_summary:
-                render_tag_summary(tag_summary)
+                # --- Tags ---
+                if eng.tag_summary:
+                    render_tag_summary(eng.tag_summary)
 
             # --- Gestão de Orçamentos ---
             st.markdown("---")
@@ -5451,8 +8179,9 @@ def main() -> None:
             render_recent_context(mx.df_month, CFG.TIPO_ENTRADA)
         with col_intel:
             render_intel("Intel — Renda", mx.insight_renda)
-            renda_evo = compute_renda_evolution(df_trans, user, sel_mo, sel_yr)
-            render_renda_chart(renda_evo)
+            if _is_open(tab_renda):
+                renda_evo = eng.renda_evolution
+                render_renda_chart(renda_evo)
             if mx.renda_breakdown and len(mx.renda_breakdown) > 1:
                 principal = list(mx.renda_breakdown.keys())[0]
                 principal_val = list(mx.renda_breakdown.values())[0]
@@ -5593,7 +8322,8 @@ def main() -> None:
 
         with col_right:
             # --- Gráfico Evolução Patrimonial ---
-            render_patrimonio_chart(pat_evolution)
+            if _is_open(tab_pat):
+                render_patrimonio_chart(eng.patrimonio)
 
             render_intel(
                 "Ativos Registrados",
@@ -5686,6 +8416,8 @@ def main() -> None:
                             parts.append(f"{result['saidas']} saída{'s' if result['saidas'] > 1 else ''}")
                         detail = " + ".join(parts) if parts else ""
                         st.toast(f"✓ {result['count']} geradas ({detail}) — {fmt_brl(result['total'])}")
+                        if result["falhas"]:
+                            st.toast(f"⚠ {len(result['falhas'])} recorrente(s) não gerada(s) — veja o log")
                         st.rerun()
                     else:
                         st.error("Falha ao gerar recorrentes")
@@ -5806,11 +8538,10 @@ def main() -> None:
             "🎯 Metas Financeiras",
             "Defina objetivos, acompanhe progresso e veja projeções."
         )
-        metas_progress = compute_meta_progress(df_metas, user)
-
         col_metas_l, col_metas_r = st.columns([1, 1])
         with col_metas_l:
-            render_metas(metas_progress)
+            if _is_open(tab_metas):
+                render_metas(eng.metas_progress)
         with col_metas_r:
             render_intel("Nova Meta", "Defina um objetivo financeiro com prazo")
             meta_form(default_resp=user)
@@ -5890,73 +8621,76 @@ def main() -> None:
             if csv_file is not None:
                 df_parsed = parse_bank_csv(csv_file, csv_bank, csv_resp)
                 if df_parsed is not None and not df_parsed.empty:
-                    n_dup = 0
-                    if not mx.df_month.empty:
-                        for _, _pr in df_parsed.iterrows():
-                            if check_duplicate(
-                                mx.df_month,
-                                str(_pr["Descricao"]),
-                                float(_pr["Valor"]),
-                                _pr["Data"],
-                            ):
-                                n_dup += 1
-
-                    _n_ent = len(
-                        df_parsed[df_parsed["Tipo"] == CFG.TIPO_ENTRADA]
-                    )
-                    _n_sai = len(
-                        df_parsed[df_parsed["Tipo"] == CFG.TIPO_SAIDA]
+                    # Duplicatas conferidas nos anos do arquivo, não na janela do mês
+                    df_known = with_pending(
+                        load_transacoes(_years_of(df_parsed).unique()), "Transacoes"
                     )
+                    stage = stage_csv_import(df_parsed, df_known)
+                    df_staged = stage["staged"]
+                    df_invalid = stage["invalid"]
+                    df_dups = stage["duplicates"]
+
+                    include_dups = False
+                    if not df_dups.empty:
+                        include_dups = st.checkbox(
+                            f"Importar também {len(df_dups)} possíveis duplicatas",
+                            value=False, key="csv_include_dups",
+                        )
+                    if include_dups:
+                        df_staged = pd.concat([df_staged, df_dups], ignore_index=True)
+
+                    _n_ent = int((df_staged["Tipo"] == CFG.TIPO_ENTRADA).sum())
+                    _n_sai = int((df_staged["Tipo"] == CFG.TIPO_SAIDA).sum())
                     _dup_warn = (
-                        f"<br>⚠ {n_dup} possíveis duplicatas"
-                        if n_dup > 0
+                        f"<br>⚠ {len(df_dups)} possíveis duplicatas"
+                        f"{' (incluídas)' if include_dups else ' (ignoradas)'}"
+                        if not df_dups.empty
+                        else ""
+                    )
+                    _inv_warn = (
+                        f"<br>✗ {len(df_invalid)} linhas inválidas (ignoradas)"
+                        if not df_invalid.empty
                         else ""
                     )
 
                     st.markdown(
                         f'<div class="intel-box">'
                         f'<div class="intel-title">'
-                        f'Preview — {len(df_parsed)} transações</div>'
+                        f'Preview — {len(df_staged)} de {len(df_parsed)} transações</div>'
                         f'<div class="intel-body">'
                         f'Entradas: {_n_ent} · Saídas: {_n_sai}'
-                        f'{_dup_warn}</div></div>',
+                        f'{_dup_warn}{_inv_warn}</div></div>',
                         unsafe_allow_html=True,
                     )
 
                     st.dataframe(
-                        df_parsed[
+                        df_staged[
                             ["Data", "Descricao", "Valor", "Categoria", "Tipo"]
                         ].head(20),
                         use_container_width=True,
                         hide_index=True,
                     )
+                    if not df_invalid.empty:
+                        st.dataframe(
+                            df_invalid[["Data", "Descricao", "Valor", "Erro"]].head(10),
+                            use_container_width=True,
+                            hide_index=True,
+                        )
 
-                    if st.button(
-                        f"IMPORTAR {len(df_parsed)} TRANSAÇÕES",
+                    if not df_staged.empty and st.button(
+                        f"IMPORTAR {len(df_staged)} TRANSAÇÕES",
                         key="csv_import_btn",
                         use_container_width=True,
                     ):
-                        imported = 0
-                        for _, _row_csv in df_parsed.iterrows():
-                            entry = _row_csv.to_dict()
-                            ok, _ = validate_transaction(entry)
-                            if ok and save_entry(
-                                entry,
-                                "Transacoes",
-                                skip_audit=True,
-                                skip_rate_limit=True,
-                            ):
-                                imported += 1
-                        if imported > 0:
-                            _log_audit(
-                                "CSV_IMPORT",
-                                "Transacoes",
-                                f"{imported} via {csv_bank}",
-                            )
-                            st.toast(f"✓ {imported} transações importadas")
+                        imported = import_transactions(df_staged, csv_bank)
+                        if imported:
+                            st.toast(f"✓ {len(df_staged)} transações importadas")
+                            st.rerun()
+                        elif imported is None:
+                            st.toast(f"⟳ {len(df_staged)} transações na fila de sincronização")
                             st.rerun()
                         else:
-                            st.error("Nenhuma transação importada")
+                            st.error("Falha na importação — nenhuma transação foi gravada")
                 else:
                     if csv_file is not None:
                         st.warning(
@@ -6190,6 +8924,50 @@ def main() -> None:
                     )
                 else:
                     st.error("Falha ao gerar backup")
+            _audit = audit_stats()
+            st.caption(
+                f"Audit log: {_audit['flushed']} gravados · {_audit['pending']} pendentes · "
+                f"{_audit['dropped']} descartados"
+            )
+            _wal = wal_stats()
+            _wal_msg = f"Sincronização: {_wal['pending']} envios pendentes ({_wal['rows']} linhas)"
+            if _wal["last_error"]:
+                _wal_msg += f" · último erro: {sanitize(_wal['last_error'])}"
+            st.caption(_wal_msg)
+            _quota = quota_stats()
+            st.caption(" · ".join(
+                f"API {kind}: {q['budget']}/{CFG.QUOTA_BURST} fichas ({q['per_min']}/min) · "
+                f"{q['throttled']} aguardaram · {q['rejected']} recusadas"
+                for kind, q in _quota.items()
+            ))
+            _health = connection_health()
+            if _health["p50_ms"] is not None:
+                _lat = " · ".join(
+                    f"{p} {_health[f'{p}_ms']:.0f}ms" for p in ("p50", "p95", "p99")
+                )
+                st.caption(
+                    f"Conexão: {'🟢 ok' if _health['state'] == 'closed' else '🔴 fora do ar'} · {_lat} · "
+                    f"{_health['errors']} erros · {_health['rejected']} recusadas"
+                )
+
+            # --- Abas anuais de transações ---
+            _legacy_n = len(_transacoes_loader("Transacoes")())
+            if _legacy_n:
+                st.markdown("---")
+                render_intel(
+                    "🗂 Transações por Ano",
+                    f"{_legacy_n} transações ainda estão na aba única \"Transacoes\". "
+                    "Movê-las para abas anuais (Transacoes_AAAA) deixa o carregamento "
+                    "proporcional aos anos exibidos, não ao histórico inteiro."
+                )
+                if st.button("MIGRAR PARA ABAS ANUAIS", key="shard_migrate_btn", use_container_width=True):
+                    with st.spinner("Migrando..."):
+                        migrated = migrate_transacoes_to_shards()
+                    if migrated is None:
+                        st.error("Migração interrompida — tente novamente (é seguro repetir)")
+                    else:
+                        st.toast(f"✓ {migrated} transações migradas")
+                        st.rerun()
 
             # --- Modo de exibição (V2) ---
             st.markdown("---")
@@ -6218,6 +8996,8 @@ def main() -> None:
                     st.session_state.display_mode = "clean"
                     st.rerun()
 
+    eng.log_timings()
+
 
 # ==============================================================================
 # BOOT
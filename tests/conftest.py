@@ -0,0 +1,43 @@
+import dataclasses
+import logging
+import sys
+import warnings
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+warnings.filterwarnings("ignore")
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+import app_homolog as app  # noqa: E402
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    """SQLiteBackend em diretório temporário, com WAL e snapshots isolados."""
+    be = app.SQLiteBackend(tmp_path / "dados.db")
+    monkeypatch.setattr(app, "get_backend", lambda: be)
+    monkeypatch.setattr(app, "CFG", dataclasses.replace(
+        app.CFG,
+        PENDING_DIR=str(tmp_path / "pending"),
+        SNAPSHOT_DIR=str(tmp_path / "snapshots"),
+        WAL_BACKOFF_BASE=0.01,
+    ))
+    monkeypatch.setattr(app, "_log_audit", lambda *args, **kwargs: None)
+    monkeypatch.setattr(app, "_check_rate_limit", lambda *args, **kwargs: True)
+    app._get_wal.clear()
+    app._get_swr_store.clear()
+    yield be
+    app._get_wal.clear()
+    app._get_swr_store.clear()
+
+
+def transacao(id_: str, data: str, valor: float = 10.0, **extra) -> dict:
+    row = {
+        "Id": id_, "Data": data, "Descricao": f"d{id_}", "Valor": valor,
+        "Categoria": "Lazer", "Tipo": "Saída", "Responsavel": "Casal",
+        "Origem": "Manual", "Tag": "",
+    }
+    row.update(extra)
+    return row
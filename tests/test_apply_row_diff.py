@@ -0,0 +1,71 @@
+import functools
+
+import pandas as pd
+
+import app_homolog as app
+from conftest import transacao
+
+COLS = list(app.CFG.COLS_TRANSACAO)
+
+
+def stored_ids(backend, worksheet: str) -> list[str]:
+    return sorted(app._norm_ids(backend.read(worksheet)["Id"]))
+
+
+def test_apply_row_diff_on_plain_sheet(backend):
+    cols = list(app.CFG.COLS_METAS)
+    meta = lambda id_, nome: {"Id": id_, "Nome": nome, "ValorAlvo": 100, "ValorAtual": 0,
+                              "Prazo": "2026-12-31", "Responsavel": "Casal", "Ativo": "TRUE"}
+    backend.replace("Metas", pd.DataFrame([meta("a", "Viagem"), meta("b", "Carro")], columns=cols))
+    before = backend.read("Metas")
+    after = pd.DataFrame([meta("a", "Viagem longa"), meta("c", "Casa")], columns=cols)
+
+    assert app.apply_row_diff("Metas", app.diff_rows(before, after, cols))
+
+    df = backend.read("Metas")
+    assert stored_ids(backend, "Metas") == ["a", "c"]
+    assert df.loc[app._norm_ids(df["Id"]).eq("a").values, "Nome"].iloc[0] == "Viagem longa"
+
+
+def test_apply_row_diff_routes_transacoes_to_yearly_shards(backend):
+    legacy = pd.DataFrame([transacao("a", "2025-06-01"), transacao("b", "2025-07-01")], columns=COLS)
+    backend.replace("Transacoes", legacy)
+    before = legacy.copy()
+    after = pd.DataFrame([
+        transacao("a", "2026-01-10", 5.0),  # editada com mudança de ano
+        transacao("b", "2025-07-01"),
+        transacao("n", "2026-02-01"),
+    ], columns=COLS)
+
+    assert app.apply_row_diff("Transacoes", app.diff_rows(before, after, COLS))
+
+    assert stored_ids(backend, "Transacoes") == ["b"]
+    assert stored_ids(backend, "Transacoes_2026") == ["a", "n"]
+
+
+def test_apply_row_diff_finds_shards_without_revision_index(backend):
+    # Índice de revisões perdido não pode esconder a aba anual (duplicaria a linha)
+    backend.append("Transacoes_2024", pd.DataFrame([transacao("a", "2024-03-01")], columns=COLS))
+    with backend._connect() as con:
+        con.execute(f"DELETE FROM {backend._q(app.CFG.REVISION_SHEET)}")
+    before = pd.DataFrame([transacao("a", "2024-03-01")], columns=COLS)
+    after = pd.DataFrame([transacao("a", "2024-03-01", 42.0)], columns=COLS)
+
+    assert app.apply_row_diff("Transacoes", app.diff_rows(before, after, COLS))
+
+    df = backend.read("Transacoes_2024")
+    assert app._norm_ids(df["Id"]).tolist() == ["a"]
+    assert float(df["Valor"].iloc[0]) == 42.0
+
+
+def test_apply_row_diff_refuses_while_wal_has_pending_rows(backend, monkeypatch):
+    monkeypatch.setattr(backend, "append", lambda *args: (_ for _ in ()).throw(ConnectionError("offline")))
+    app._enqueue_rows("Transacoes", pd.DataFrame([transacao("p", "2026-01-01")], columns=COLS))
+    before = pd.DataFrame(columns=COLS)
+    after = pd.DataFrame([transacao("x", "2026-01-02")], columns=COLS)
+
+    wal = app._get_wal()
+    monkeypatch.setattr(wal, "drain", functools.partial(wal.drain, timeout=0.2))
+
+    assert app.apply_row_diff("Transacoes", app.diff_rows(before, after, COLS)) is False
+    assert "Transacoes_2026" not in backend.worksheets()
@@ -0,0 +1,83 @@
+import pandas as pd
+
+import app_homolog as app
+from conftest import transacao
+
+COLS = list(app.CFG.COLS_TRANSACAO)
+
+
+def frame(*rows) -> pd.DataFrame:
+    return pd.DataFrame(list(rows), columns=COLS)
+
+
+def ids(df: pd.DataFrame) -> list[str]:
+    return sorted(app._norm_ids(df["Id"]))
+
+
+def test_diff_rows_insert_update_delete():
+    before = frame(transacao("a", "2026-01-01"), transacao("b", "2026-01-02"))
+    after = frame(transacao("a", "2026-01-01", 20.0), transacao("c", "2026-01-03"))
+
+    diff = app.diff_rows(before, after, COLS)
+
+    assert ids(diff["inserted"]) == ["c"]
+    assert ids(diff["updated"]) == ["a"]
+    assert ids(diff["deleted"]) == ["b"]
+
+
+def test_diff_rows_blank_id_is_insert_with_new_id():
+    before = frame(transacao("a", "2026-01-01"))
+    after = frame(transacao("a", "2026-01-01"), transacao("", "2026-01-05"))
+
+    diff = app.diff_rows(before, after, COLS)
+
+    assert len(diff["inserted"]) == 1
+    assert app._norm_ids(diff["inserted"]["Id"]).ne("").all()
+    assert diff["updated"].empty and diff["deleted"].empty
+
+
+def test_diff_rows_ignores_number_formatting():
+    before = frame(transacao("a", "2026-01-01", "10"))
+    after = frame(transacao("a", "2026-01-01", 10.0))
+
+    assert app.diff_rows(before, after, COLS)["updated"].empty
+
+
+def test_merge_three_way_by_id():
+    base = frame(transacao("a", "2026-01-01"), transacao("b", "2026-01-02"))
+    ours = frame(transacao("a", "2026-01-01", 99.0), transacao("n", "2026-01-09"))
+    theirs = frame(
+        transacao("a", "2026-01-01", 50.0),
+        transacao("b", "2026-01-02"),
+        transacao("t", "2026-01-07"),
+    )
+
+    merged = app.merge_three_way(base, ours, theirs)
+
+    assert ids(merged) == ["a", "n", "t"]  # b removido por nós, t inserido por eles
+    valor_a = merged.loc[app._norm_ids(merged["Id"]).eq("a").values, "Valor"].iloc[0]
+    assert float(valor_a) == 99.0  # conflito na mesma linha: a nossa vence
+
+
+def test_merge_three_way_without_id_is_multiset():
+    cols = list(app.CFG.COLS_PATRIMONIO)
+    carro = {"Item": "Carro", "Valor": 100.0, "Responsavel": "Casal"}
+    casa = {"Item": "Casa", "Valor": 900.0, "Responsavel": "Casal"}
+    moto = {"Item": "Moto", "Valor": 50.0, "Responsavel": "Luan"}
+    base = pd.DataFrame([carro, carro, casa], columns=cols)
+    ours = pd.DataFrame([carro, casa, moto], columns=cols)  # removemos um carro, criamos a moto
+    theirs = pd.DataFrame([carro, carro, casa, casa], columns=cols)  # eles duplicaram a casa
+
+    merged = app.merge_three_way(base, ours, theirs)
+
+    assert sorted(merged["Item"]) == ["Carro", "Casa", "Casa", "Moto"]
+
+
+def test_merge_three_way_with_empty_theirs_keeps_only_ours_inserts():
+    # Documenta por que update_sheet não mescla com uma releitura que falhou
+    base = frame(transacao("a", "2026-01-01"))
+    ours = frame(transacao("a", "2026-01-01"), transacao("n", "2026-01-02"))
+
+    merged = app.merge_three_way(base, ours, frame())
+
+    assert ids(merged) == ["n"]
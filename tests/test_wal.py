@@ -0,0 +1,79 @@
+import pandas as pd
+
+import app_homolog as app
+from conftest import transacao
+
+COLS = list(app.CFG.COLS_TRANSACAO)
+
+
+class _Rejected(Exception):
+    """Erro de lógica (4xx): não é indisponibilidade."""
+
+    class response:
+        status_code = 400
+
+
+def stored_ids(backend, worksheet: str) -> list[str]:
+    return sorted(app._norm_ids(backend.read(worksheet)["Id"]))
+
+
+def test_replay_writes_and_removes_entry(backend, tmp_path):
+    wal = app._get_wal()
+    entry_id = wal.enqueue("Transacoes_2026", pd.DataFrame([transacao("a", "2026-01-01")], columns=COLS))
+
+    assert wal.wait(entry_id) is True
+    assert stored_ids(backend, "Transacoes_2026") == ["a"]
+    assert not list((tmp_path / "pending").glob("*.json"))
+
+
+def test_lost_response_does_not_duplicate(backend, monkeypatch):
+    append = backend.append
+    calls = []
+
+    def lossy(worksheet, df_rows):
+        calls.append(len(df_rows))
+        append(worksheet, df_rows)
+        if len(calls) == 1:
+            raise ConnectionError("resposta perdida")
+
+    monkeypatch.setattr(backend, "append", lossy)
+    wal = app._get_wal()
+    entry_id = wal.enqueue("Transacoes_2026", pd.DataFrame(
+        [transacao("a", "2026-01-01"), transacao("b", "2026-01-02")], columns=COLS,
+    ))
+
+    assert wal.wait(entry_id) is True
+    assert stored_ids(backend, "Transacoes_2026") == ["a", "b"]
+    assert calls == [2]  # o reenvio viu os Ids gravados e não anexou de novo
+
+
+def test_transaction_batch_is_one_entry_across_years(backend):
+    df = pd.DataFrame([transacao("a", "2025-12-30"), transacao("b", "2026-01-02")], columns=COLS)
+
+    entry_id = app._enqueue_rows("Transacoes", df)
+
+    assert [e["id"] for e in app._get_wal().pending()] in ([entry_id], [])
+    assert app._get_wal().wait(entry_id) is True
+    assert stored_ids(backend, "Transacoes_2025") == ["a"]
+    assert stored_ids(backend, "Transacoes_2026") == ["b"]
+
+
+def test_persistent_failure_goes_to_dead_letter(backend, monkeypatch, tmp_path):
+    monkeypatch.setattr(app, "CFG", app.replace(app.CFG, WAL_MAX_FAILURES=2))
+    monkeypatch.setattr(backend, "append", lambda *args: (_ for _ in ()).throw(_Rejected("schema")))
+    wal = app._get_wal()
+    entry_id = wal.enqueue("Metas", pd.DataFrame([{"Id": "m1", "Nome": "x"}]))
+
+    assert wal.wait(entry_id) is False
+    assert wal.pending() == []
+    assert (tmp_path / "pending" / "dead" / f"{entry_id}.json").exists()
+
+
+def test_outage_is_retried_not_dead_lettered(backend, monkeypatch):
+    monkeypatch.setattr(app, "CFG", app.replace(app.CFG, WAL_MAX_FAILURES=1))
+    monkeypatch.setattr(backend, "append", lambda *args: (_ for _ in ()).throw(ConnectionError("offline")))
+    wal = app._get_wal()
+    entry_id = wal.enqueue("Metas", pd.DataFrame([{"Id": "m1", "Nome": "x"}]))
+
+    assert wal.wait(entry_id, timeout=0.3) is None
+    assert [e["id"] for e in wal.pending()] == [entry_id]